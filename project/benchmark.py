@@ -0,0 +1,306 @@
+import argparse
+import gc
+import json
+import os
+import platform
+import shutil
+import statistics
+import subprocess
+import tempfile
+import time
+import tracemalloc
+import warnings
+from datetime import datetime
+from typing import Callable, List, Optional
+
+import matplotlib
+import numpy as np
+import pandas as pd
+
+from processor import DataAnalyzer
+
+# Числовые столбцы по образцу gym_members_exercise_tracking.csv: (имя, среднее, ст. отклонение, знаков после запятой).
+# Каждая группа из пяти столбцов зависит от общего скрытого фактора с весом rho, поэтому есть и сильно,
+# и слабо коррелированные пары (как Session_Duration и Calories_Burned в исходном наборе)
+_NUMERIC_TEMPLATES = [
+    ("Age", 38.7, 12.2, 0, 0.0),
+    ("Weight (kg)", 73.9, 21.2, 1, 0.3),
+    ("Height (m)", 1.72, 0.13, 2, 0.2),
+    ("Max_BPM", 179.9, 11.5, 0, 0.0),
+    ("Avg_BPM", 143.8, 14.3, 0, 0.4),
+    ("Resting_BPM", 62.2, 7.3, 0, 0.1),
+    ("Session_Duration (hours)", 1.26, 0.34, 2, 0.95),
+    ("Calories_Burned", 905.4, 272.6, 0, 0.95),
+    ("Fat_Percentage", 25.0, 6.3, 1, -0.8),
+    ("Water_Intake (liters)", 2.63, 0.6, 1, 0.5),
+    ("BMI", 24.9, 6.7, 2, 0.3),
+]
+
+# Категориальные: как Gender, Workout_Type (число категорий задаётся) и Experience_Level (порядковый 1..3)
+_CATEGORICAL_TEMPLATES = ["Gender", "Workout_Type", "Experience_Level"]
+
+METHODS = [
+    "load_file",
+    "build_correlation_matrix",
+    "build_scatter_charts",
+    "build_histogram_charts",
+    "build_pie_charts",
+    "analyze_dataset",
+]
+
+_DEFAULT_ROWS = [1_000, 10_000, 100_000, 1_000_000, 10_000_000]
+_DEFAULT_COLS = [10, 100, 2_000]
+_DEFAULT_CARDINALITY = [4, 1_000]
+_GENERATE_CHUNK_ROWS = 500_000
+
+
+def column_layout(n_cols: int) -> List[tuple]:
+    """
+    Столбцы синтетической таблицы: каждый пятый категориальный, как в исходном наборе (3 из 15).
+    Повторяющиеся шаблоны получают номер в имени
+    """
+    layout = []
+    n_categorical = max(1, n_cols // 5)
+    for i in range(n_cols - n_categorical):
+        name, mean, std, decimals, rho = _NUMERIC_TEMPLATES[i % len(_NUMERIC_TEMPLATES)]
+        suffix = f"_{i // len(_NUMERIC_TEMPLATES)}" if i >= len(_NUMERIC_TEMPLATES) else ""
+        layout.append(("numeric", name + suffix, (mean, std, decimals, rho, i // len(_NUMERIC_TEMPLATES))))
+    for i in range(n_categorical):
+        name = _CATEGORICAL_TEMPLATES[i % len(_CATEGORICAL_TEMPLATES)]
+        suffix = f"_{i // len(_CATEGORICAL_TEMPLATES)}" if i >= len(_CATEGORICAL_TEMPLATES) else ""
+        layout.append(("categorical", name + suffix, name))
+    return layout
+
+
+def generate_chunk(layout: List[tuple], n_rows: int, cardinality: int, rng: np.random.Generator) -> pd.DataFrame:
+    factors = {}
+    columns = {}
+    for kind, name, spec in layout:
+        if kind == "numeric":
+            mean, std, decimals, rho, group = spec
+            if group not in factors:
+                factors[group] = rng.standard_normal(n_rows)
+            noise = rng.standard_normal(n_rows)
+            values = mean + std * (rho * factors[group] + np.sqrt(1 - rho * rho) * noise)
+            columns[name] = np.round(values, decimals) if decimals else np.round(values).astype(np.int64)
+        elif spec == "Gender":
+            columns[name] = np.where(rng.random(n_rows) < 0.52, "Male", "Female")
+        elif spec == "Workout_Type":
+            # Неравномерные частоты, как у реальных категорий
+            codes = np.minimum(rng.zipf(1.3, n_rows) - 1, cardinality - 1)
+            columns[name] = np.char.add("Type_", codes.astype(str))
+        else:
+            columns[name] = rng.choice([1, 2, 3], size=n_rows, p=[0.38, 0.43, 0.19])
+    return pd.DataFrame(columns)
+
+
+def dataset_path(data_dir: str, n_rows: int, n_cols: int, cardinality: int, seed: int) -> str:
+    """
+    Синтетический CSV (создаётся один раз и переиспользуется между запусками, чтобы сравнивать коммиты
+    на одних и тех же данных)
+    """
+    path = os.path.join(data_dir, f"synthetic_r{n_rows}_c{n_cols}_k{cardinality}_s{seed}.csv")
+    if os.path.exists(path):
+        return path
+
+    os.makedirs(data_dir, exist_ok=True)
+    layout = column_layout(n_cols)
+    rng = np.random.default_rng(seed)
+    tmp_path = path + ".tmp"
+    for start in range(0, n_rows, _GENERATE_CHUNK_ROWS):
+        chunk = generate_chunk(layout, min(_GENERATE_CHUNK_ROWS, n_rows - start), cardinality, rng)
+        chunk.to_csv(tmp_path, mode="w" if start == 0 else "a", header=start == 0, index=False)
+    os.replace(tmp_path, path)
+    return path
+
+
+# Сколько графиков построит метод (порядковые Experience_Level уже посчитаны категориальными)
+def expected_charts(method: str, n_cols: int) -> int:
+    n_categorical = max(1, n_cols // 5)
+    n_numeric = n_cols - n_categorical
+    if method == "build_histogram_charts":
+        return n_numeric * n_categorical + n_categorical * (n_categorical - 1)
+    if method == "build_pie_charts":
+        return n_categorical
+    return 0
+
+
+def measure(run: Callable[[], bool], repeat: int, profile_memory: bool) -> dict:
+    """
+    Время repeat запусков без трассировки памяти и, отдельным запуском под tracemalloc,
+    пиковый объём выделенной памяти (numpy и pandas регистрируют свои выделения в tracemalloc)
+    """
+    seconds, ok = [], True
+    for _ in range(repeat):
+        gc.collect()
+        started = time.perf_counter()
+        ok = bool(run()) and ok
+        seconds.append(time.perf_counter() - started)
+
+    result = {
+        "ok": ok,
+        "seconds": [round(value, 6) for value in seconds],
+        "best": round(min(seconds), 6),
+        "median": round(statistics.median(seconds), 6),
+        "peak_mb": None,
+    }
+    if profile_memory:
+        gc.collect()
+        tracemalloc.start()
+        try:
+            run()
+            result["peak_mb"] = round(tracemalloc.get_traced_memory()[1] / 2 ** 20, 3)
+        finally:
+            tracemalloc.stop()
+    return result
+
+
+def bench_dataset(path: str, n_cols: int, args) -> List[dict]:
+    output_root = tempfile.mkdtemp(prefix="dv_bench_")
+    results = []
+
+    # Каждый запуск пишет в свою папку, чтобы не мерить перезапись файлов
+    def fresh_output() -> str:
+        return tempfile.mkdtemp(dir=output_root)
+
+    def loaded() -> DataAnalyzer:
+        processor = DataAnalyzer(workers=args.workers, use_cache=False)
+        if not processor.load_file(path):
+            raise RuntimeError(processor.last_error or f"Не удалось загрузить {path}")
+        return processor
+
+    processor = None
+    try:
+        processor = loaded()
+        runners = {
+            "load_file": lambda: loaded() is not None,
+            "build_correlation_matrix": lambda: processor.build_correlation_matrix(fresh_output()),
+            "build_scatter_charts": lambda: processor.build_scatter_charts(
+                fresh_output(), threshold=args.threshold, max_charts=args.max_scatter),
+            "build_histogram_charts": lambda: processor.build_histogram_charts(fresh_output(), bins=args.bins),
+            "build_pie_charts": lambda: processor.build_pie_charts(fresh_output()),
+            "analyze_dataset": lambda: processor.analyze_dataset(fresh_output()),
+        }
+
+        for method in args.methods:
+            # Каждый метод меряется сам по себе: общие статистики, посчитанные предыдущими, сбрасываются
+            def run(method=method):
+                processor.stats.reset()
+                return runners[method]()
+
+            entry = {"method": method}
+            charts = expected_charts(method, n_cols)
+            if charts > args.max_charts_per_run:
+                entry.update({"skipped": f"{charts} графиков больше --max-charts-per-run"})
+            else:
+                entry.update(measure(run, args.repeat, not args.no_memory))
+            results.append(entry)
+    finally:
+        if processor is not None:
+            processor.shutdown_render_pool()
+        shutil.rmtree(output_root, ignore_errors=True)
+    return results
+
+
+def environment() -> dict:
+    try:
+        commit = subprocess.run(["git", "rev-parse", "HEAD"], capture_output=True, text=True,
+                                cwd=os.path.dirname(os.path.abspath(__file__)), check=True).stdout.strip()
+    except Exception:
+        commit = None
+    return {
+        "timestamp": datetime.now().isoformat(timespec="seconds"),
+        "commit": commit,
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "cpu_count": os.cpu_count(),
+        "numpy": np.__version__,
+        "pandas": pd.__version__,
+        "matplotlib": matplotlib.__version__,
+    }
+
+
+def compare(results: List[dict], baseline_path: str, tolerance: float) -> List[dict]:
+    """
+    Сравнение медиан с прошлым прогоном: записи, ставшие медленнее больше чем в tolerance раз
+    """
+    with open(baseline_path, encoding="utf-8") as f:
+        baseline = json.load(f)
+
+    def key(entry):
+        return entry["rows"], entry["cols"], entry["cardinality"], entry["method"]
+
+    previous = {key(entry): entry for entry in baseline["results"] if "median" in entry}
+    regressions = []
+    for entry in results:
+        old = previous.get(key(entry))
+        if old is None or "median" not in entry or old["median"] <= 0:
+            continue
+        ratio = entry["median"] / old["median"]
+        if ratio > tolerance:
+            regressions.append({"rows": entry["rows"], "cols": entry["cols"], "cardinality": entry["cardinality"],
+                                "method": entry["method"], "ratio": round(ratio, 3)})
+    return regressions
+
+
+def build_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(
+        description="Замеры времени и памяти методов DataAnalyzer на синтетических данных по образцу "
+                    "gym_members_exercise_tracking.csv. Результаты пишутся в JSON для сравнения между коммитами")
+    parser.add_argument("--rows", type=int, nargs="+", default=_DEFAULT_ROWS)
+    parser.add_argument("--cols", type=int, nargs="+", default=_DEFAULT_COLS)
+    parser.add_argument("--cardinality", type=int, nargs="+", default=_DEFAULT_CARDINALITY,
+                        help="число категорий в столбцах типа Workout_Type")
+    parser.add_argument("--methods", nargs="+", choices=METHODS, default=METHODS)
+    parser.add_argument("--repeat", type=int, default=3)
+    # 1e8 - чтобы по умолчанию мерились 1e7 строк × 10 столбцов, а широкие таблицы с миллионами строк нет
+    parser.add_argument("--max-cells", type=float, default=1e8,
+                        help="пропускать таблицы, где строк × столбцов больше")
+    parser.add_argument("--max-charts-per-run", type=int, default=500,
+                        help="не мерить построение графиков, если их будет больше")
+    parser.add_argument("--threshold", type=float, default=0.6)
+    parser.add_argument("--max-scatter", type=int, default=50)
+    parser.add_argument("--bins", type=int, default=15)
+    parser.add_argument("--workers", type=int, default=1, help="процессов отрисовки графиков")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--no-memory", action="store_true", help="не мерить пиковую память")
+    parser.add_argument("--data-dir", default=os.path.join(tempfile.gettempdir(), "data_vizualizer_bench"),
+                        help="куда сохранять сгенерированные CSV")
+    parser.add_argument("-o", "--output", default=None, help="JSON с результатами")
+    parser.add_argument("--baseline", default=None, help="JSON прошлого прогона для сравнения")
+    parser.add_argument("--tolerance", type=float, default=1.2,
+                        help="во сколько раз медленнее считать регрессией")
+    return parser
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    args = build_parser().parse_args(argv)
+    # Предупреждения tight_layout на графиках с сотнями категорий только засоряют вывод
+    warnings.filterwarnings("ignore", category=UserWarning)
+    report = {"environment": environment(), "results": [], "skipped": []}
+
+    for n_rows in args.rows:
+        for n_cols in args.cols:
+            for cardinality in args.cardinality:
+                current = {"rows": n_rows, "cols": n_cols, "cardinality": cardinality}
+                if n_rows * n_cols > args.max_cells:
+                    report["skipped"].append({**current, "reason": "больше --max-cells"})
+                    continue
+
+                path = dataset_path(args.data_dir, n_rows, n_cols, cardinality, args.seed)
+                for entry in bench_dataset(path, n_cols, args):
+                    report["results"].append({**current, **entry})
+                    print(json.dumps(report["results"][-1], ensure_ascii=False), flush=True)
+
+    output = args.output or f"benchmark_{datetime.now().strftime('%Y%m%d_%H%M%S')}.json"
+    if args.baseline:
+        report["regressions"] = compare(report["results"], args.baseline, args.tolerance)
+    with open(output, "w", encoding="utf-8") as f:
+        json.dump(report, f, ensure_ascii=False, indent=2)
+    print(f"Результаты: {output}")
+
+    return 1 if report.get("regressions") else 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,247 @@
+import io
+import os
+import threading
+import time
+from typing import Dict, List, NamedTuple
+
+import matplotlib
+import numpy as np
+from matplotlib.axes import Axes
+from matplotlib.backends.backend_agg import FigureCanvasAgg
+from matplotlib.backends.backend_pdf import PdfPages
+from matplotlib.colors import LogNorm
+from matplotlib.figure import Figure
+from matplotlib.gridspec import SubplotSpec
+
+
+EXPORT_FORMATS = ("png", "svg", "pdf", "webp")
+
+
+class ExportOptions(NamedTuple):
+    """
+    Как сохранять графики: формат, dpi и уровень сжатия PNG (0-9).
+    По умолчанию поля фигуры заданы заранее (ChartRenderer._LAYOUTS); tight_bbox=True - обрезка полей
+    через bbox_inches='tight', которая требует лишнего прохода отрисовки при каждом сохранении.
+    bundle=True - все графики одного построения в один многостраничный PDF вместо отдельных файлов
+    """
+    format: str = "png"
+    dpi: int = 150
+    compression: int = 6
+    tight_bbox: bool = False
+    bundle: bool = False
+
+    # Многостраничным бывает только PDF
+    def resolved(self) -> "ExportOptions":
+        return self._replace(format="pdf") if self.bundle else self
+
+    def savefig_kwargs(self) -> dict:
+        kwargs = {"dpi": self.dpi}
+        if self.tight_bbox:
+            kwargs["bbox_inches"] = 'tight'
+        return kwargs
+
+
+class ChartJob(NamedTuple):
+    """
+    Задание на отрисовку одного графика. Содержит только готовые данные (numpy-массивы, списки),
+    поэтому его можно передать в другой процесс без DataFrame целиком.
+    note - пометка второй строкой заголовка (например, что график построен по выборке)
+    """
+    kind: str
+    save_path: str
+    params: dict
+    export: ExportOptions = ExportOptions()
+    note: str = ""
+
+
+class ChartRenderer:
+    """
+    Рисует графики без pyplot: у каждого вида графика своя Figure с холстом Agg, которая
+    переиспользуется - перед следующим графиком оси очищаются, а не создаются заново.
+    Экземпляр не потокобезопасен, поэтому у каждого потока свой (см. get_renderer)
+    """
+
+    _FIGSIZES = {
+        "scatter": (8, 6),
+        "density": (8, 6),
+        "pie": (8, 6),
+        "histogram": (10, 6),
+        "bar": (10, 6),
+    }
+
+    # Заранее подобранные поля вместо tight_layout/bbox_inches='tight': место справа под легенду
+    # и снизу под повёрнутые подписи
+    _LAYOUTS = {
+        "histogram": {"right": 0.78},
+        "bar": {"right": 0.78, "bottom": 0.22},
+    }
+
+    # Виды графиков, которым в режиме tight_bbox нужен tight_layout (легенда за пределами осей)
+    _TIGHT_LAYOUT_KINDS = ("histogram", "bar")
+
+    _DEFAULT_SUBPLOT_PARAMS = {
+        name: matplotlib.rcParams[f"figure.subplot.{name}"]
+        for name in ("left", "right", "bottom", "top", "wspace", "hspace")
+    }
+
+    def __init__(self):
+        self._axes: Dict[str, Axes] = {}
+        self._subplotspecs: Dict[str, SubplotSpec] = {}
+        self.colors = matplotlib.colormaps["Set1"].colors
+
+    def _axes_for(self, kind: str) -> Axes:
+        ax = self._axes.get(kind)
+        if ax is None:
+            figure = Figure(figsize=self._FIGSIZES[kind])
+            FigureCanvasAgg(figure)
+            ax = figure.add_subplot()
+            self._axes[kind] = ax
+            self._subplotspecs[kind] = ax.get_subplotspec()
+        else:
+            # Дополнительные оси (шкала цвета) и сдвиг осей от tight_layout остались от предыдущего графика.
+            # Шкала цвета забирает место у осей, заменяя их subplotspec, поэтому исходный возвращается
+            for extra_ax in ax.figure.axes:
+                if extra_ax is not ax:
+                    extra_ax.remove()
+            ax.clear()
+            ax.set_subplotspec(self._subplotspecs[kind])
+            ax.figure.subplots_adjust(**self._DEFAULT_SUBPLOT_PARAMS)
+        return ax
+
+    def render(self, job: ChartJob) -> Dict[str, float]:
+        """
+        Рисует и сохраняет график, возвращает время отрисовки и сохранения в секундах
+        """
+        export = job.export
+        started = time.perf_counter()
+        figure = self._draw(job, export.tight_bbox)
+        drawn = time.perf_counter()
+        kwargs = export.savefig_kwargs()
+        if export.format == "png":
+            kwargs["pil_kwargs"] = {"compress_level": export.compression}
+        # Через временный файл: прерванная запись не оставляет обрезанный график, а os.replace заменяет
+        # прежний файл целиком, а не пишет в него (это могла быть жёсткая ссылка из старых версий кэша)
+        tmp_path = f"{job.save_path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        try:
+            figure.savefig(tmp_path, format=export.format, **kwargs)
+            os.replace(tmp_path, job.save_path)
+        finally:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+        return {"draw_seconds": drawn - started, "save_seconds": time.perf_counter() - drawn}
+
+    def render_page(self, job: ChartJob, pdf: PdfPages) -> Dict[str, float]:
+        """
+        Рисует график страницей открытого многостраничного PDF
+        """
+        started = time.perf_counter()
+        figure = self._draw(job, job.export.tight_bbox)
+        drawn = time.perf_counter()
+        pdf.savefig(figure, **job.export.savefig_kwargs())
+        return {"draw_seconds": drawn - started, "save_seconds": time.perf_counter() - drawn}
+
+    def render_png(self, job: ChartJob, dpi: int) -> bytes:
+        """
+        PNG графика в памяти (для предпросмотра), поля заданы заранее
+        """
+        buffer = io.BytesIO()
+        self._draw(job, tight=False).savefig(buffer, format='png', dpi=dpi)
+        return buffer.getvalue()
+
+    def _draw(self, job: ChartJob, tight: bool) -> Figure:
+        ax = self._axes_for(job.kind)
+        if not tight:
+            ax.figure.subplots_adjust(**self._LAYOUTS.get(job.kind, {}))
+        getattr(self, f"_draw_{job.kind}")(ax, **job.params)
+        if job.note:
+            ax.set_title(f"{ax.get_title()}\n({job.note})")
+        if tight and job.kind in self._TIGHT_LAYOUT_KINDS:
+            ax.figure.tight_layout()
+        return ax.figure
+
+    def _draw_scatter(self, ax: Axes, x: np.ndarray, y: np.ndarray, x_col: str, y_col: str, corr: float) -> None:
+        ax.scatter(x, y, alpha=0.6, color='blue')
+        ax.set_title(f'Scatter Plot: {x_col} vs {y_col} (cor={corr:.2f})')
+        ax.set_xlabel(x_col)
+        ax.set_ylabel(y_col)
+        ax.grid(True, linestyle='--', alpha=0.7)
+
+    def _draw_density(self, ax: Axes, counts: np.ndarray, x_edges: np.ndarray, y_edges: np.ndarray,
+                      x_col: str, y_col: str, corr: float) -> None:
+        extent = (x_edges[0], x_edges[-1], y_edges[0], y_edges[-1])
+        image = ax.imshow(counts.T, origin='lower', extent=extent, aspect='auto',
+                          cmap='viridis', norm=LogNorm(vmin=1), interpolation='nearest')
+        ax.figure.colorbar(image, ax=ax, label='Число точек')
+        ax.set_title(f'Scatter Plot: {x_col} vs {y_col} (cor={corr:.2f}, плотность)')
+        ax.set_xlabel(x_col)
+        ax.set_ylabel(y_col)
+        ax.grid(True, linestyle='--', alpha=0.7)
+
+    def _draw_pie(self, ax: Axes, values: np.ndarray, labels: List[str], col: str) -> None:
+        ax.pie(values, labels=labels, autopct='%1.1f%%', startangle=90)
+        ax.set_title(f'Распределение: {col}')
+
+    def _draw_histogram(self, ax: Axes, counts: np.ndarray, edges: np.ndarray, labels: List[str],
+                        num_col: str, group_col: str) -> None:
+        """
+        Рисует уже посчитанные частоты (строка counts на категорию) по общим границам edges,
+        сами значения в matplotlib не передаются
+        """
+        widths = np.diff(edges)
+
+        for i, (label, group_counts) in enumerate(zip(labels, counts)):
+            if group_counts.sum() == 0:
+                continue
+            ax.bar(
+                edges[:-1],
+                group_counts,
+                width=widths,
+                align='edge',
+                alpha=0.7,
+                label=label,
+                color=self.colors[i % len(self.colors)],
+                edgecolor='black'
+            )
+
+        ax.set_xlabel(num_col)
+        ax.set_ylabel('Частота')
+        ax.set_title(f'Распределение {num_col} по {group_col}')
+        ax.legend(title=group_col, bbox_to_anchor=(1.05, 1), loc='upper left')
+        ax.grid(True, linestyle='--', alpha=0.6)
+
+    def _draw_bar(self, ax: Axes, index: List[str], columns: List[str], proportions: np.ndarray,
+                  target_col: str, group_col: str) -> None:
+        x = range(len(index))
+        width = 0.8 / len(columns)
+
+        for i, group_val in enumerate(columns):
+            positions = [x_i + i * width for x_i in x]
+            ax.bar(positions, proportions[:, i], width=width, label=group_val,
+                   color=self.colors[i % len(self.colors)], edgecolor='black', alpha=0.7)
+
+        ax.set_xticks([x_i + width * (len(columns) - 1) / 2 for x_i in x], index, rotation=45, ha='right')
+        ax.set_ylabel('Доля')
+        ax.set_title(f'Распределение {target_col} по {group_col}')
+        ax.legend(title=group_col, bbox_to_anchor=(1.05, 1), loc='upper left')
+        ax.grid(axis='y', linestyle='--', alpha=0.6)
+
+
+_thread_renderers = threading.local()
+
+
+# Свой ChartRenderer (и свои фигуры) у каждого потока, поэтому потоки рисуют одновременно без блокировок
+def get_renderer() -> ChartRenderer:
+    renderer = getattr(_thread_renderers, "renderer", None)
+    if renderer is None:
+        renderer = ChartRenderer()
+        _thread_renderers.renderer = renderer
+    return renderer
+
+
+# Точка входа для процесса-исполнителя; функция модульного уровня, чтобы её можно было сериализовать
+def render_job(job: ChartJob) -> Dict[str, float]:
+    return get_renderer().render(job)
+
+
+def render_page(job: ChartJob, pdf: PdfPages) -> Dict[str, float]:
+    return get_renderer().render_page(job, pdf)
@@ -0,0 +1,230 @@
+import argparse
+import glob
+import json
+import multiprocessing
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from typing import List, Optional, Tuple
+
+from charts import EXPORT_FORMATS, ExportOptions
+from processor import DataAnalyzer
+
+ACTIONS = ("correlation", "scatter", "pie", "histogram", "analyze", "report")
+
+# report - один HTML-файл с теми же графиками, по умолчанию не строится
+_DEFAULT_ACTIONS = ("correlation", "scatter", "pie", "histogram", "analyze")
+
+# Эти действия требуют строк таблицы, при потоковой загрузке их нет (кроме приближённого анализа)
+_ROW_ACTIONS = ("scatter", "analyze")
+
+# Эти действия по выборке не выполняются: матрица корреляции и анализ датасета должны быть точными
+_EXACT_ACTIONS = ("correlation", "analyze")
+
+
+def build_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(
+        prog="data_vizualizer",
+        description="Пакетная обработка файлов без графического интерфейса. "
+                    "Без аргументов запускается обычное окно приложения")
+    parser.add_argument("inputs", nargs="+",
+                        help="файлы xlsx/xls/csv или шаблоны (например, 'exports/*.csv')")
+    parser.add_argument("-o", "--output", required=True,
+                        help="выходная папка; для каждого файла создаётся своя подпапка")
+    parser.add_argument("-a", "--actions", nargs="+", choices=ACTIONS, default=list(_DEFAULT_ACTIONS),
+                        help="что построить (по умолчанию всё, кроме report - HTML-отчёта "
+                             "со всеми графиками в одном файле)")
+    parser.add_argument("-j", "--jobs", type=int, default=min(4, os.cpu_count() or 1),
+                        help="сколько файлов обрабатывать одновременно")
+    parser.add_argument("--threshold", type=float, default=0.6,
+                        help="порог |cor| для scatter-графиков")
+    parser.add_argument("--max-charts", type=int, default=0,
+                        help="не больше стольких scatter-графиков, 0 - все")
+    parser.add_argument("--bins", type=int, default=15, help="число корзин гистограмм")
+    parser.add_argument("--report-points", type=int, default=2000, metavar="N",
+                        help="не больше стольких точек на scatter-график в HTML-отчёте")
+    parser.add_argument("--approximate", action="store_true",
+                        help="приближённый анализ датасета для больших таблиц")
+    parser.add_argument("--streaming", action="store_true",
+                        help="потоковая загрузка CSV (без scatter-графиков, анализ датасета - только с --approximate)")
+    parser.add_argument("--sample", type=int, default=None, metavar="N",
+                        help="строить графики по случайной выборке из N строк (быстрый обзор больших файлов; "
+                             "матрица корреляции и анализ датасета при этом пропускаются)")
+    parser.add_argument("--stratify", default=None, metavar="COLUMN",
+                        help="выборка поровну по значениям этого категориального столбца")
+    parser.add_argument("--ordinal", action="append", default=[], metavar="COLUMN=VALUE:LABEL,...",
+                        type=parse_ordinal,
+                        help="порядковый столбец: значения по порядку и их подписи, например "
+                             "'Level=1:Beginner,2:Medium,3:Expert'; можно повторять, не совмещается с --streaming")
+    parser.add_argument("--sheet", default=None, help="лист Excel (по умолчанию первый)")
+    parser.add_argument("--columns", nargs="+", default=None, help="читать только эти столбцы")
+    parser.add_argument("--compact", action="store_true",
+                        help="сжать типы данных после загрузки (в summary попадёт отчёт о памяти)")
+    parser.add_argument("--format", choices=EXPORT_FORMATS, default="png", help="формат файлов графиков")
+    parser.add_argument("--dpi", type=int, default=150, help="разрешение графиков")
+    parser.add_argument("--png-compression", type=int, choices=range(10), default=6, metavar="0-9",
+                        help="уровень сжатия PNG: 0 - быстрее и больше файл, 9 - наоборот")
+    parser.add_argument("--tight-bbox", action="store_true",
+                        help="обрезать поля графиков по содержимому (медленнее)")
+    parser.add_argument("--bundle", action="store_true",
+                        help="все графики одного вида в один многостраничный PDF")
+    parser.add_argument("--no-cache", action="store_true", help="не использовать дисковый кэш")
+    return parser
+
+
+def parse_ordinal(text: str) -> Tuple[str, dict]:
+    column, sep, pairs = text.rpartition("=")
+    if not sep or not column or not pairs:
+        raise argparse.ArgumentTypeError(f"ожидается COLUMN=VALUE:LABEL,...: {text}")
+    mapping = {}
+    for pair in pairs.split(","):
+        value, sep, label = pair.partition(":")
+        if not sep:
+            raise argparse.ArgumentTypeError(f"ожидается VALUE:LABEL: {pair}")
+        # Целые значения в CSV читаются как числа
+        value = value.strip()
+        mapping[int(value) if value.lstrip("-").isdigit() else value] = label.strip()
+    return column, mapping
+
+
+def expand_inputs(patterns: List[str]) -> List[str]:
+    """
+    Раскрывает шаблоны (в Windows оболочка этого не делает), убирая повторы с сохранением порядка
+    """
+    files = []
+    for pattern in patterns:
+        matches = sorted(glob.glob(pattern)) if glob.has_magic(pattern) else [pattern]
+        for path in matches:
+            if os.path.isfile(path) and path not in files:
+                files.append(path)
+    return files
+
+
+def output_folders(files: List[str], output_root: str) -> List[str]:
+    # Подпапка по имени файла; одинаковые имена из разных папок получают суффикс
+    folders, used = [], set()
+    for path in files:
+        name = DataAnalyzer.sanitize_filename(os.path.splitext(os.path.basename(path))[0])
+        candidate, n = name, 1
+        while candidate in used:
+            n += 1
+            candidate = f"{name}_{n}"
+        used.add(candidate)
+        folders.append(os.path.join(output_root, candidate))
+    return folders
+
+
+def process_file(file_path: str, output_folder: str, options: dict) -> dict:
+    """
+    Обрабатывает один файл и пишет summary.json в его папку. Выполняется в процессе пула,
+    поэтому графики рисуются в этом же процессе (workers=1), без вложенного пула
+    """
+    started = time.perf_counter()
+    summary = {"file": os.path.abspath(file_path), "output": os.path.abspath(output_folder),
+               "ok": False, "results": {}, "error": None}
+    os.makedirs(output_folder, exist_ok=True)
+
+    processor = DataAnalyzer(workers=1, use_cache=not options["no_cache"])
+    for column, mapping in options["ordinals"]:
+        processor.set_ordinal_mapping(column, mapping, [column])
+    try:
+        # Лист задаётся только для книг Excel, в одном запуске могут быть и CSV
+        sheet = options["sheet"] if not file_path.lower().endswith('.csv') else None
+        if not processor.load_file(file_path, streaming=options["streaming"], compact=options["compact"],
+                                   sheet=sheet, columns=options["columns"],
+                                   sample_size=options["sample"], stratify=options["stratify"]):
+            summary["error"] = processor.last_error or "Не удалось загрузить файл."
+        elif processor.is_empty():
+            summary["error"] = "Таблица пустая или некорректная."
+        else:
+            if processor.sample_info is not None:
+                summary["sample"] = processor.sample_info
+            if processor.memory_report is not None:
+                summary["memory"] = {key: processor.memory_report[key] for key in ("before_bytes", "after_bytes")}
+            for action in options["actions"]:
+                if processor.data is None and action in _ROW_ACTIONS \
+                        and not (action == "analyze" and options["approximate"]) \
+                        or processor.sample_info is not None and action in _EXACT_ACTIONS:
+                    summary["results"][action] = "skipped"
+                    continue
+                ok = run_action(processor, action, output_folder, options)
+                summary["results"][action] = "ok" if ok else "failed"
+            summary["ok"] = "failed" not in summary["results"].values()
+    except Exception as e:
+        summary["error"] = str(e)
+
+    summary["seconds"] = round(time.perf_counter() - started, 3)
+    with open(os.path.join(output_folder, "summary.json"), "w", encoding="utf-8") as f:
+        json.dump(summary, f, ensure_ascii=False, indent=2)
+    return summary
+
+
+def run_action(processor: DataAnalyzer, action: str, output_folder: str, options: dict) -> bool:
+    if action == "correlation":
+        return processor.build_correlation_matrix(output_folder)
+    if action == "scatter":
+        return processor.build_scatter_charts(output_folder, threshold=options["threshold"],
+                                              max_charts=options["max_charts"] or None, export=options["export"])
+    if action == "pie":
+        return processor.build_pie_charts(output_folder, export=options["export"])
+    if action == "histogram":
+        return processor.build_histogram_charts(output_folder, bins=options["bins"], export=options["export"])
+    if action == "report":
+        return processor.build_html_report(output_folder, threshold=options["threshold"],
+                                           max_charts=options["max_charts"] or None, bins=options["bins"],
+                                           max_points=options["report_points"])
+    return processor.analyze_dataset(output_folder, approximate=options["approximate"])
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    """
+    Возвращает код выхода: 0 - все файлы обработаны, 1 - были ошибки, 2 - нет входных файлов.
+    Итог по каждому файлу печатается одной JSON-строкой по мере готовности
+    """
+    args = build_parser().parse_args(argv)
+    files = expand_inputs(args.inputs)
+    if not files:
+        print(json.dumps({"error": "Входные файлы не найдены."}, ensure_ascii=False), file=sys.stderr)
+        return 2
+
+    options = {
+        "actions": args.actions,
+        "threshold": args.threshold,
+        "max_charts": args.max_charts,
+        "bins": args.bins,
+        "report_points": args.report_points,
+        "approximate": args.approximate,
+        "streaming": args.streaming,
+        "compact": args.compact,
+        "sheet": args.sheet,
+        "columns": args.columns,
+        "sample": args.sample,
+        "ordinals": args.ordinal,
+        "stratify": args.stratify,
+        "no_cache": args.no_cache,
+        "export": ExportOptions(format=args.format, dpi=args.dpi, compression=args.png_compression,
+                                tight_bbox=args.tight_bbox, bundle=args.bundle),
+    }
+    folders = output_folders(files, args.output)
+
+    failed = 0
+    executor = ProcessPoolExecutor(max_workers=max(1, min(args.jobs, len(files))),
+                                   mp_context=multiprocessing.get_context("spawn"))
+    try:
+        futures = {executor.submit(process_file, path, folder, options): path
+                   for path, folder in zip(files, folders)}
+        for future in as_completed(futures):
+            try:
+                summary = future.result()
+            except Exception as e:
+                # Процесс-исполнитель упал (например, не хватило памяти)
+                summary = {"file": os.path.abspath(futures[future]), "ok": False, "error": str(e)}
+            failed += not summary["ok"]
+            print(json.dumps(summary, ensure_ascii=False), flush=True)
+    except KeyboardInterrupt:
+        executor.shutdown(wait=False, cancel_futures=True)
+        return 130
+    executor.shutdown()
+
+    return 1 if failed else 0
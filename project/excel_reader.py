@@ -0,0 +1,152 @@
+import datetime
+import importlib.util
+from operator import itemgetter
+from typing import List, Optional
+
+import numpy as np
+import pandas as pd
+
+# Движок calamine (Rust) читает книгу в разы быстрее openpyxl; pandas поддерживает его с версии 2.2
+HAS_CALAMINE = importlib.util.find_spec("python_calamine") is not None
+
+_OPENPYXL_SUFFIXES = ('.xlsx', '.xlsm')
+
+
+def list_sheets(file_path: str) -> List[str]:
+    if HAS_CALAMINE:
+        from python_calamine import CalamineWorkbook
+        return list(CalamineWorkbook.from_path(file_path).sheet_names)
+
+    if file_path.lower().endswith(_OPENPYXL_SUFFIXES):
+        import openpyxl
+        workbook = openpyxl.load_workbook(file_path, read_only=True)
+        try:
+            return list(workbook.sheetnames)
+        finally:
+            workbook.close()
+
+    with pd.ExcelFile(file_path) as excel_file:
+        return list(excel_file.sheet_names)
+
+
+def read_excel(file_path: str, sheet: Optional[str] = None, columns: Optional[List[str]] = None) -> pd.DataFrame:
+    """
+    Читает лист sheet (по умолчанию первый) и только столбцы columns (по умолчанию все).
+    calamine, если установлен; иначе для xlsx - потоковое чтение openpyxl в режиме read_only,
+    для xls - pd.read_excel с движком по умолчанию.
+    С выбором столбцов openpyxl не разбирает ячейки вне их диапазона. calamine всегда разбирает строку
+    листа целиком (в Rust), но в Python и в таблицу попадают только выбранные ячейки
+    """
+    sheet_name = 0 if sheet is None else sheet
+
+    if HAS_CALAMINE:
+        if columns is not None:
+            return _read_calamine(file_path, sheet, columns)
+        return pd.read_excel(file_path, sheet_name=sheet_name, engine="calamine")
+    if file_path.lower().endswith(_OPENPYXL_SUFFIXES):
+        return _read_openpyxl(file_path, sheet, columns)
+    return pd.read_excel(file_path, sheet_name=sheet_name, usecols=columns)
+
+
+def _read_openpyxl(file_path: str, sheet: Optional[str], columns: Optional[List[str]]) -> pd.DataFrame:
+    import openpyxl
+
+    workbook = openpyxl.load_workbook(file_path, read_only=True, data_only=True)
+    try:
+        worksheet = workbook[sheet] if sheet is not None else workbook.worksheets[0]
+        rows = worksheet.iter_rows(values_only=True)
+        header = _column_names(next(rows, ()))
+
+        if columns is None:
+            indices = list(range(len(header)))
+        else:
+            missing = [col for col in columns if col not in header]
+            if missing:
+                raise ValueError(f"Нет столбцов: {', '.join(map(str, missing))}")
+            indices = sorted(header.index(col) for col in columns)
+
+        # Ячейки вне диапазона выбранных столбцов не разбираются
+        if indices:
+            first, last = indices[0], indices[-1]
+            rows = worksheet.iter_rows(min_row=2, min_col=first + 1, max_col=last + 1, values_only=True)
+            pick = itemgetter(*[i - first for i in indices])
+            if len(indices) == 1:
+                values = [(pick(row),) for row in rows]
+            else:
+                values = [pick(row) for row in rows]
+        else:
+            values = []
+    finally:
+        workbook.close()
+
+    # Пустые строки в конце листа (оформление без данных) pandas тоже отбрасывает
+    while values and all(value is None for value in values[-1]):
+        values.pop()
+
+    data = pd.DataFrame(values, columns=[header[i] for i in indices])
+    return _integral_floats_to_int(data)
+
+
+def _read_calamine(file_path: str, sheet: Optional[str], columns: List[str]) -> pd.DataFrame:
+    from python_calamine import CalamineWorkbook
+
+    workbook = CalamineWorkbook.from_path(file_path)
+    worksheet = workbook.get_sheet_by_name(sheet) if sheet is not None else workbook.get_sheet_by_index(0)
+    rows = iter(worksheet.iter_rows())
+    # Пустые ячейки calamine отдаёт как ""
+    header = _column_names(tuple(None if value == "" else value for value in next(rows, ())))
+
+    missing = [col for col in columns if col not in header]
+    if missing:
+        raise ValueError(f"Нет столбцов: {', '.join(map(str, missing))}")
+    indices = sorted(header.index(col) for col in columns)
+
+    values, filled = [], 0
+    for row in rows:
+        values.append(tuple(_calamine_cell(row[i]) if i < len(row) else None for i in indices))
+        # Пустые строки в конце листа (оформление без данных) pandas отбрасывает, если пуста вся строка,
+        # а не только выбранные столбцы
+        if any(value != "" for value in row):
+            filled = len(values)
+    del values[filled:]
+
+    data = pd.DataFrame(values, columns=[header[i] for i in indices])
+    return _integral_floats_to_int(data)
+
+
+# Значение ячейки как у pd.read_excel(engine="calamine"): целые числа - int, даты - Timestamp, "" - пропуск
+def _calamine_cell(value):
+    if value == "":
+        return None
+    if isinstance(value, float) and value.is_integer():
+        return int(value)
+    if isinstance(value, datetime.date) and not isinstance(value, datetime.datetime):
+        return pd.Timestamp(value)
+    return value
+
+
+def _column_names(header_row: tuple) -> List[str]:
+    """
+    Имена столбцов как у pd.read_excel: пустые - "Unnamed: i", повторы - с суффиксом ".1", ".2"
+    """
+    names, seen = [], {}
+    for i, value in enumerate(header_row):
+        name = f"Unnamed: {i}" if value is None else value
+        if name in seen:
+            seen[name] += 1
+            name = f"{name}.{seen[name]}"
+        else:
+            seen[name] = 0
+        names.append(name)
+    return names
+
+
+# Excel хранит все числа как float; pd.read_excel делает столбец целым, если все значения целые и нет пропусков
+def _integral_floats_to_int(data: pd.DataFrame) -> pd.DataFrame:
+    for col in data.columns:
+        values = data[col]
+        if values.dtype == np.float64 and len(values) > 0:
+            array = values.to_numpy()
+            if not np.isnan(array).any() and np.abs(array).max() < 2 ** 53 and np.array_equal(array, np.trunc(array)):
+                data[col] = array.astype(np.int64)
+    return data
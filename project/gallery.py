@@ -0,0 +1,248 @@
+import base64
+import queue
+import tkinter as tk
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from tkinter import filedialog
+
+
+class ThumbnailCache:
+    """
+    LRU-кэш миниатюр (PNG-байты) с ограничением суммарного размера: при переполнении
+    выбрасываются давно не показанные. Используется только из главного потока Tk
+    """
+
+    def __init__(self, max_bytes: int):
+        self.max_bytes = max_bytes
+        self.size = 0
+        self._items: "OrderedDict[tuple, bytes]" = OrderedDict()
+
+    def get(self, key: tuple):
+        data = self._items.get(key)
+        if data is not None:
+            self._items.move_to_end(key)
+        return data
+
+    def put(self, key: tuple, data: bytes) -> None:
+        old = self._items.pop(key, None)
+        if old is not None:
+            self.size -= len(old)
+        self._items[key] = data
+        self.size += len(data)
+        while self.size > self.max_bytes and len(self._items) > 1:
+            _, dropped = self._items.popitem(last=False)
+            self.size -= len(dropped)
+
+
+class ChartGallery:
+    """
+    Окно предпросмотра графиков. previews - список (подпись, функция -> ChartJob) из
+    DataAnalyzer.chart_previews. Миниатюры рисуются в фоновом потоке с низким dpi и только для
+    видимых ячеек; если ячейка ушла из виду раньше, чем до неё дошла очередь, она не рисуется.
+    В полном разрешении график рисуется, только когда его открывают или сохраняют
+    """
+
+    # Ячейка сетки (ширина, высота) и высота подписи, пикселей
+    _CELL = (260, 190)
+    _CAPTION = 24
+    _THUMB_DPI = 24
+    _FULL_DPI = 150
+    _POLL_MS = 50
+    _INVALID_CHARS = '<>:;"|!?*\\/'
+
+    def __init__(self, master, title, previews, cache: ThumbnailCache, cache_key: tuple):
+        self.previews = previews
+        self.cache = cache
+        self.cache_key = cache_key
+        self.columns = 1
+        self.closed = False
+
+        self._images = {}  # индекс -> (PhotoImage, id на холсте) для видимых миниатюр
+        self._wanted = frozenset()  # видимые индексы; читается и из фонового потока
+        self._pending = set()
+        self._results: "queue.Queue" = queue.Queue()
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="gallery")
+
+        self.window = tk.Toplevel(master)
+        self.window.title(title)
+        self.window.geometry("820x620")
+        self.window.protocol("WM_DELETE_WINDOW", self.close)
+
+        self.status = tk.Label(self.window, text=f"Графиков: {len(previews)}. Щелчок по миниатюре открывает график",
+                               anchor='w')
+        self.status.pack(side='bottom', fill='x')
+
+        self.scrollbar = tk.Scrollbar(self.window, orient='vertical')
+        self.scrollbar.pack(side='right', fill='y')
+        self.canvas = tk.Canvas(self.window, bg='white', yscrollincrement=20,
+                                yscrollcommand=self._on_yscroll)
+        self.canvas.pack(side='left', fill='both', expand=True)
+        self.scrollbar.configure(command=self.canvas.yview)
+
+        self.canvas.bind("<Configure>", lambda event: self._layout())
+        self.canvas.bind("<Button-1>", self._on_click)
+        self.canvas.bind("<MouseWheel>", lambda event: self.canvas.yview_scroll(-event.delta // 120, 'units'))
+        self.canvas.bind("<Button-4>", lambda event: self.canvas.yview_scroll(-3, 'units'))
+        self.canvas.bind("<Button-5>", lambda event: self.canvas.yview_scroll(3, 'units'))
+
+        self.window.after(self._POLL_MS, self._poll)
+
+    def close(self):
+        self.closed = True
+        self._wanted = frozenset()
+        self._executor.shutdown(wait=False, cancel_futures=True)
+        self.window.destroy()
+
+    # Сетка и миниатюры
+
+    def _cell_origin(self, index):
+        row, col = divmod(index, self.columns)
+        return col * self._CELL[0], row * self._CELL[1]
+
+    def _layout(self):
+        width, height = self._CELL
+        self.columns = max(1, self.canvas.winfo_width() // width)
+        self.canvas.delete('all')
+        self._images.clear()
+
+        for index, (caption, _) in enumerate(self.previews):
+            x, y = self._cell_origin(index)
+            self.canvas.create_rectangle(x + 5, y + 5, x + width - 5, y + height - self._CAPTION,
+                                         outline='#cccccc', tags=f"cell{index}")
+            self.canvas.create_text(x + width // 2, y + height - self._CAPTION // 2, text=caption,
+                                    width=width - 10, font=('Helvetica', 8))
+
+        rows = (len(self.previews) + self.columns - 1) // self.columns
+        self.canvas.configure(scrollregion=(0, 0, self.columns * width, rows * height))
+        self._refresh()
+
+    def _on_yscroll(self, first, last):
+        self.scrollbar.set(first, last)
+        self._refresh()
+
+    def _visible(self):
+        top = int(self.canvas.canvasy(0))
+        bottom = int(self.canvas.canvasy(self.canvas.winfo_height()))
+        first = max(0, top // self._CELL[1]) * self.columns
+        last = (bottom // self._CELL[1] + 1) * self.columns
+        return range(first, min(last, len(self.previews)))
+
+    def _refresh(self):
+        if self.closed:
+            return
+        visible = self._visible()
+        self._wanted = frozenset(visible)
+
+        # Картинки ушедших из виду ячеек не держим, их PNG остаются в кэше
+        for index in [index for index in self._images if index not in self._wanted]:
+            self.canvas.delete(self._images.pop(index)[1])
+
+        for index in visible:
+            if index in self._images or index in self._pending:
+                continue
+            data = self.cache.get(self._key(index))
+            if data is not None:
+                self._show_thumbnail(index, data)
+            else:
+                self._pending.add(index)
+                self._executor.submit(self._render_thumbnail, index)
+
+    def _key(self, index):
+        return self.cache_key + (self.previews[index][0],)
+
+    def _show_thumbnail(self, index, data):
+        image = tk.PhotoImage(data=base64.b64encode(data))
+        x, y = self._cell_origin(index)
+        item = self.canvas.create_image(x + self._CELL[0] // 2, y + (self._CELL[1] - self._CAPTION) // 2 + 2,
+                                        image=image)
+        self._images[index] = (image, item)
+
+    # Фоновый поток: результаты возвращаются через очередь, виджеты трогает только главный поток
+
+    def _render_thumbnail(self, index):
+        if index not in self._wanted:
+            self._results.put(("skipped", index, None))
+            return
+        self._render(index, "thumbnail", lambda renderer, job: renderer.render_png(job, self._THUMB_DPI))
+
+    def _render(self, index, kind, draw):
+        try:
+            from charts import get_renderer
+            job = self.previews[index][1]()
+            self._results.put((kind, index, draw(get_renderer(), job)))
+        except Exception as e:
+            self._results.put(("error", index, str(e)))
+
+    def _poll(self):
+        if self.closed:
+            return
+        while True:
+            try:
+                kind, index, payload = self._results.get_nowait()
+            except queue.Empty:
+                break
+
+            if kind == "thumbnail":
+                self._pending.discard(index)
+                self.cache.put(self._key(index), payload)
+                if index in self._wanted and index not in self._images:
+                    self._show_thumbnail(index, payload)
+            elif kind == "skipped":
+                # Ячейка могла снова стать видимой, пока запрос ждал очереди
+                self._pending.discard(index)
+                if index in self._wanted:
+                    self._refresh()
+            elif kind == "full":
+                self._open_viewer(index, payload)
+            elif kind == "saved":
+                self.status.configure(text=f"Сохранено: {payload}")
+            else:
+                self._pending.discard(index)
+                self.status.configure(text=f"{self.previews[index][0]}: ошибка - {payload}")
+        self.window.after(self._POLL_MS, self._poll)
+
+    # Полное разрешение
+
+    def _on_click(self, event):
+        col = int(self.canvas.canvasx(event.x)) // self._CELL[0]
+        row = int(self.canvas.canvasy(event.y)) // self._CELL[1]
+        index = row * self.columns + col
+        if col < self.columns and index < len(self.previews):
+            self.status.configure(text=f"Открывается: {self.previews[index][0]}")
+            self._executor.submit(self._render, index, "full",
+                                  lambda renderer, job: renderer.render_png(job, self._FULL_DPI))
+
+    def _open_viewer(self, index, data):
+        caption = self.previews[index][0]
+        self.status.configure(text=caption)
+
+        viewer = tk.Toplevel(self.window)
+        viewer.title(caption)
+        viewer.geometry("900x700")
+
+        buttons = tk.Frame(viewer)
+        buttons.pack(side='bottom', fill='x')
+        tk.Button(buttons, text="Сохранить...", command=lambda: self._export(index)).pack(side='right', padx=10, pady=5)
+
+        image = tk.PhotoImage(data=base64.b64encode(data))
+        x_scroll = tk.Scrollbar(viewer, orient='horizontal')
+        x_scroll.pack(side='bottom', fill='x')
+        y_scroll = tk.Scrollbar(viewer, orient='vertical')
+        y_scroll.pack(side='right', fill='y')
+        canvas = tk.Canvas(viewer, bg='white', scrollregion=(0, 0, image.width(), image.height()),
+                           xscrollcommand=x_scroll.set, yscrollcommand=y_scroll.set)
+        canvas.pack(side='left', fill='both', expand=True)
+        x_scroll.configure(command=canvas.xview)
+        y_scroll.configure(command=canvas.yview)
+        canvas.create_image(0, 0, image=image, anchor='nw')
+        canvas.image = image  # иначе PhotoImage удалит сборщик мусора
+
+    def _export(self, index):
+        caption = self.previews[index][0]
+        name = "".join("_" if char in self._INVALID_CHARS else char for char in caption)
+        path = filedialog.asksaveasfilename(parent=self.window, defaultextension=".png",
+                                            filetypes=[("PNG", "*.png")], initialfile=f"{name}.png")
+        if path:
+            self.status.configure(text=f"Сохраняется: {caption}")
+            self._executor.submit(self._render, index, "saved",
+                                  lambda renderer, job: renderer.render(job._replace(save_path=path)) and path)
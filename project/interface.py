@@ -1,16 +1,39 @@
 import os
 import threading
 import tkinter as tk
-from tkinter import filedialog, messagebox
+from tkinter import filedialog, messagebox, ttk
+
+from gallery import ChartGallery, ThumbnailCache
+from jobs import DatasetSnapshots, JobQueue
 
 
 class GUInterface:
-    def __init__(self, processor):
+
+    # Сколько заданий выполняется одновременно, остальные ждут в очереди
+    _JOB_WORKERS = 2
+    # Период опроса событий заданий, мс
+    _POLL_MS = 100
+    # Как charts.EXPORT_FORMATS; charts здесь не импортируется, чтобы окно не ждало matplotlib
+    _EXPORT_FORMATS = ("png", "svg", "pdf", "webp")
+    # Предел памяти под миниатюры галереи (PNG), общий для всех окон предпросмотра
+    _THUMBNAIL_CACHE_BYTES = 32 * 2 ** 20
+
+    _JOB_STATUS = {
+        "queued": "в очереди",
+        "running": "выполняется",
+        "done": "готово",
+        "failed": "ошибка",
+        "canceled": "отменено",
+    }
+
+    def __init__(self, processor=None, warmup=None):
         
-        self.processor = processor
+        # Без готового processor он берётся из warmup при первом действии: окно не ждёт импорта pandas и matplotlib
+        self._processor = processor
+        self.warmup = warmup
         self.root = tk.Tk()
         self.root.title("Data Vizualizer")
-        self.root.geometry("700x600") # ширина*высота
+        self.root.geometry("760x860") # ширина*высота
         self.root.resizable(True, True)
         self.common_font = ('Helvetica', 10, 'bold')
 
@@ -24,14 +47,38 @@ class GUInterface:
         }
 
         self.scatter_threshold = tk.DoubleVar(value=0.6)
+        self.scatter_max_charts = tk.IntVar(value=0)  # 0 - без ограничения
         self.histogram_bins = tk.IntVar(value=15)
-
-        # Потоки
-        self.processing_window = None
-        self.thread = None
+        self.render_workers = tk.IntVar(value=1)
+        self.export_format = tk.StringVar(value="png")
+        self.export_dpi = tk.IntVar(value=150)
+        self.export_bundle = tk.BooleanVar(value=False)
+        self.export_compression = tk.IntVar(value=6)
+        self.export_tight_bbox = tk.BooleanVar(value=False)
+        # Выборка только для графиков и предпросмотра; матрица корреляции и анализ всегда по всей таблице
+        self.sample_enabled = tk.BooleanVar(value=False)
+        self.sample_size = tk.IntVar(value=100_000)
+        self.sample_stratify = tk.StringVar()  # пусто - равномерная выборка
+        self.approximate_analysis = tk.BooleanVar(value=False)
+        self.streaming_load = tk.BooleanVar(value=False)
+        self.compact_dtypes = tk.BooleanVar(value=False)
+        self.excel_sheet = tk.StringVar()
+        self.selected_columns = tk.StringVar()  # через запятую, пусто - все столбцы
+
+        # Задания: одна очередь, у каждого задания свой снимок данных
+        self.job_queue = JobQueue(max_workers=self._JOB_WORKERS)
+        self._snapshots = None
+        self._snapshots_lock = threading.Lock()
+        self.thumbnails = ThumbnailCache(self._THUMBNAIL_CACHE_BYTES)
 
         self.create_widgets()
+        self.root.protocol("WM_DELETE_WINDOW", self._on_close)
 
+    @property
+    def processor(self):
+        if self._processor is None:
+            self._processor = self.warmup.processor()
+        return self._processor
 
     def create_widgets(self):
         main_frame = tk.Frame(self.root)
@@ -49,6 +96,19 @@ class GUInterface:
         tk.Button(main_frame, text="Выбрать...", command=self.browse_input_file,
                   bg='#c5a9db', font=self.common_font, width=25).pack(pady=5)
 
+        source_frame = tk.Frame(main_frame)
+        source_frame.pack(pady=5)
+        tk.Label(source_frame, text="Лист Excel:", font=self.common_font).grid(row=0, column=0, sticky='e')
+        self.sheet_combobox = ttk.Combobox(source_frame, textvariable=self.excel_sheet, state='disabled', width=20)
+        self.sheet_combobox.grid(row=0, column=1, padx=5)
+        tk.Label(source_frame, text="Столбцы (через запятую):", font=self.common_font).grid(row=0, column=2, sticky='e')
+        tk.Entry(source_frame, textvariable=self.selected_columns, width=25).grid(row=0, column=3, padx=5)
+
+        tk.Checkbutton(main_frame, text="Потоковое чтение CSV (без загрузки таблицы в память, без scatter, анализ только приближённый)",
+                       variable=self.streaming_load, font=self.common_font).pack(pady=5)
+        tk.Checkbutton(main_frame, text="Сжать типы данных после загрузки (меньше памяти для больших таблиц)",
+                       variable=self.compact_dtypes, font=self.common_font).pack(pady=5)
+
         # Выбор выходной папки
         tk.Label(main_frame, text="Выбранная выходная папка:",
                  font=self.common_font).pack(anchor='center', pady=(20, 5))
@@ -72,6 +132,9 @@ class GUInterface:
         tk.Label(graph_frame, text="|cor| >", font=self.common_font).grid(row=1, column=1, sticky='w')
         tk.Scale(graph_frame, from_=0.0, to=1.0, resolution=0.01, variable=self.scatter_threshold, 
                         orient='horizontal', length=150).grid(row=1, column=2)
+        tk.Label(graph_frame, text="не больше (0 - все):", font=self.common_font).grid(row=1, column=3, sticky='w', padx=5)
+        tk.Spinbox(graph_frame, from_=0, to=10000, textvariable=self.scatter_max_charts,
+                   width=6, font=self.common_font).grid(row=1, column=4, sticky='w')
 
         tk.Checkbutton(graph_frame, text="Круговые диаграммы", 
                        variable=self.graph_types["pie"], 
@@ -84,6 +147,36 @@ class GUInterface:
         tk.Scale(graph_frame, from_=1, to=50, variable=self.histogram_bins, 
                         orient='horizontal', length=150).grid(row=3, column=2)
 
+        tk.Label(graph_frame, text="Число процессов для отрисовки графиков:",
+                 font=self.common_font).grid(row=4, column=0, sticky='w', padx=5, pady=5)
+        tk.Spinbox(graph_frame, from_=1, to=os.cpu_count() or 1, textvariable=self.render_workers,
+                   width=5, font=self.common_font).grid(row=4, column=1, sticky='w')
+
+        tk.Label(graph_frame, text="Формат файлов графиков:",
+                 font=self.common_font).grid(row=5, column=0, sticky='w', padx=5, pady=5)
+        ttk.Combobox(graph_frame, textvariable=self.export_format, values=self._EXPORT_FORMATS,
+                     state='readonly', width=6).grid(row=5, column=1, sticky='w')
+        tk.Label(graph_frame, text="dpi:", font=self.common_font).grid(row=5, column=2, sticky='e')
+        tk.Spinbox(graph_frame, from_=50, to=600, increment=50, textvariable=self.export_dpi,
+                   width=5, font=self.common_font).grid(row=5, column=3, sticky='w', padx=5)
+        tk.Checkbutton(graph_frame, text="Все графики вида в один PDF",
+                       variable=self.export_bundle,
+                       font=self.common_font).grid(row=6, column=0, sticky='w', padx=5, pady=5)
+        tk.Label(graph_frame, text="сжатие PNG (0-9):", font=self.common_font).grid(row=6, column=1, sticky='e')
+        tk.Spinbox(graph_frame, from_=0, to=9, textvariable=self.export_compression,
+                   width=3, font=self.common_font).grid(row=6, column=2, sticky='w', padx=5)
+        tk.Checkbutton(graph_frame, text="Обрезать поля (медленнее)",
+                       variable=self.export_tight_bbox,
+                       font=self.common_font).grid(row=6, column=3, columnspan=2, sticky='w')
+
+        tk.Checkbutton(graph_frame, text="Графики по случайной выборке строк:",
+                       variable=self.sample_enabled,
+                       font=self.common_font).grid(row=7, column=0, sticky='w', padx=5, pady=5)
+        tk.Spinbox(graph_frame, from_=1000, to=10_000_000, increment=10_000, textvariable=self.sample_size,
+                   width=9, font=self.common_font).grid(row=7, column=1, sticky='w')
+        tk.Label(graph_frame, text="поровну по:", font=self.common_font).grid(row=7, column=2, sticky='e')
+        tk.Entry(graph_frame, textvariable=self.sample_stratify, width=15).grid(row=7, column=3, sticky='w', padx=5)
+
         # Кнопки действий
         button_frame = tk.Frame(main_frame)
         button_frame.pack(pady=20)
@@ -101,6 +194,20 @@ class GUInterface:
                 command=self.analyze_dataset, bg='#8cc98b',
                 font=self.common_font, width=20, height=button_height).pack(side='left', padx=10)
 
+        tk.Checkbutton(main_frame, text="Приближённый анализ датасета (для очень больших таблиц)",
+                       variable=self.approximate_analysis,
+                       font=self.common_font).pack(anchor='e', padx=10)
+
+        tk.Button(main_frame, text="Предпросмотр графиков",
+                  command=self.open_gallery, bg='#8cb4c9',
+                  font=self.common_font, width=30).pack(pady=5)
+
+        tk.Button(main_frame, text="HTML-отчёт (все графики в одном файле)",
+                  command=self.build_report, bg='#8cb4c9',
+                  font=self.common_font, width=40).pack(pady=5)
+
+        self._create_jobs_panel(main_frame)
+
 
     # Выбор входного файла
     def browse_input_file(self):
@@ -114,6 +221,30 @@ class GUInterface:
         )
         if file_path:
             self.xlsx_path.set(file_path)
+            self._update_sheet_list(file_path)
+
+    # Листы выбранной книги Excel; для CSV выбор листа недоступен. Книга открывается в задании,
+    # список попадает в выпадающий список из _poll_jobs
+    def _update_sheet_list(self, file_path):
+        self._show_sheets(file_path, [])
+        if file_path.lower().endswith(('.xlsx', '.xls', '.xlsm')):
+            self.job_queue.submit(f"Листы книги: {os.path.basename(file_path)}",
+                                  lambda job: self._list_sheets_job(job, file_path))
+
+    def _list_sheets_job(self, job, file_path):
+        try:
+            from excel_reader import list_sheets
+            sheets = list_sheets(file_path)
+        except Exception:
+            sheets = []
+        return "sheets", (file_path, sheets)
+
+    def _show_sheets(self, file_path, sheets):
+        # Пока книга читалась, могли выбрать другой файл
+        if file_path != self.xlsx_path.get():
+            return
+        self.sheet_combobox.configure(values=sheets, state='readonly' if sheets else 'disabled')
+        self.excel_sheet.set(sheets[0] if sheets else "")
 
     def browse_output_folder(self):
         folder_path = filedialog.askdirectory(title="Выберите папку для сохранения")
@@ -121,59 +252,168 @@ class GUInterface:
             self.output_folder.set(folder_path)
 
 
-    # Диалоговые окна и обработка ошибок
-    
-    def show_processing_dialog(self, message):
-        dialog = tk.Toplevel(self.root)
-        dialog.title("Процесс выполнения")
-        dialog.geometry("450x150")
-        dialog.transient(self.root)
-        dialog.grab_set()
-        dialog.resizable(False, False)
-
-        tk.Label(dialog, text=message, wraplength=400, font=self.common_font).pack(pady=20)
-        tk.Button(dialog, text="СТОП", command=lambda: self.cancel_process(dialog),
-                  bg='#bd7b7b', font=self.common_font, width=12).pack(pady=10)
-
-        self.processing_window = dialog
+    # Очередь заданий и ход выполнения
+
+    def _create_jobs_panel(self, parent):
+        tk.Label(parent, text="Задания:", font=self.common_font).pack(anchor='w', pady=(10, 5))
+        self.jobs_view = ttk.Treeview(parent, columns=("title", "status"), show='headings', height=4)
+        self.jobs_view.heading("title", text="Задание")
+        self.jobs_view.heading("status", text="Состояние")
+        self.jobs_view.column("title", width=330)
+        self.jobs_view.column("status", width=300)
+        self.jobs_view.pack(fill='x')
+
+        self.progress_bar = ttk.Progressbar(parent, mode='determinate')
+        self.progress_bar.pack(fill='x', pady=5)
+
+        stop_frame = tk.Frame(parent)
+        stop_frame.pack(pady=5)
+        tk.Button(stop_frame, text="СТОП (выбранные)", command=self.cancel_selected_jobs,
+                  bg='#bd7b7b', font=self.common_font, width=18).pack(side='left', padx=10)
+        tk.Button(stop_frame, text="СТОП (все)", command=self.job_queue.cancel_all,
+                  bg='#bd7b7b', font=self.common_font, width=18).pack(side='left', padx=10)
+
+    def cancel_selected_jobs(self):
+        for item in self.jobs_view.selection():
+            job = self.job_queue.jobs.get(int(item))
+            if job is not None:
+                job.cancel()
+
+    # События заданий забираются из очереди опросом в главном потоке, виджеты трогает только он
+    def _poll_jobs(self):
+        for kind, job, payload in self.job_queue.poll():
+            if kind == "queued":
+                self.jobs_view.insert('', 0, iid=str(job.id), values=(job.title, self._JOB_STATUS[job.status]))
+            elif kind == "progress":
+                self._show_job_progress(job, payload)
+            else:
+                self._set_job_status(job, self._JOB_STATUS[job.status])
+                if kind == "finished":
+                    self._report_job_result(job)
+        self.root.after(self._POLL_MS, self._poll_jobs)
+
+    def _set_job_status(self, job, text):
+        if self.jobs_view.exists(str(job.id)):
+            self.jobs_view.set(str(job.id), "status", text)
+
+    def _show_job_progress(self, job, event):
+        if event["event"] == "memory":
+            self._set_job_status(job, event["text"])
+            return
 
-    def cancel_process(self, dialog):
-        if self.thread and self.thread.is_alive():
-            self.processor.cancel()
-            dialog.destroy()
-            messagebox.showinfo("Отмена", "Процесс был отменён пользователем.")
+        total = event.get("total")
+        if event["event"] == "stage_start":
+            self.progress_bar.configure(maximum=total or 1, value=0)
+            self._set_job_status(job, f"{event['stage']}: 0/{total or '?'}")
+        elif event["event"] == "chart_finish":
+            if self.warmup is not None:
+                self.warmup.mark("first_chart")
+            self.progress_bar.configure(maximum=total or max(event["done"], 1), value=event["done"])
+            text = f"{event['stage']}: {event['done']}/{total or '?'}"
+            if event["eta"] is not None:
+                text += f", осталось ~{event['eta']:.0f} с"
+            self._set_job_status(job, text)
+
+    def _report_job_result(self, job):
+        if job.status == "canceled":
+            messagebox.showinfo("Отмена", f"{job.title}: процесс был отменён пользователем.")
+        elif job.status == "failed":
+            messagebox.showerror("Ошибка", f"Произошла ошибка: {job.error}")
         else:
-            dialog.destroy()
-
-    def _show_error_on_main_thread(self, message):
-        self.root.after(0, lambda msg=message: messagebox.showerror("Ошибка", msg))
-
-    def _show_info_on_main_thread(self, message):
-        self.root.after(0, lambda msg=message: messagebox.showinfo("Успех", msg))
-
-    def _show_warning_on_main_thread(self, message):
-        self.root.after(0, lambda msg=message: messagebox.showwarning("Предупреждение", msg))
+            level, message = job.result
+            if level == "sheets":
+                self._show_sheets(*message)
+            elif level == "gallery":
+                ChartGallery(self.root, *message)
+            elif level == "info":
+                messagebox.showinfo("Успех", message)
+            else:
+                messagebox.showerror("Ошибка", message)
 
-    def _validate_inputs(self):
+    def _validate_inputs(self, need_output=True):
 
         if not self.xlsx_path.get():
-            self._show_warning_on_main_thread("Не выбран входной файл!")
+            messagebox.showwarning("Предупреждение", "Не выбран входной файл!")
             return False
 
         if not os.path.exists(self.xlsx_path.get()):
-            self._show_error_on_main_thread("Файл не найден!")
+            messagebox.showerror("Ошибка", "Файл не найден!")
             return False
 
-        if not self.output_folder.get():
-            self._show_warning_on_main_thread("Не выбрана выходная папка!")
+        if need_output and not self.output_folder.get():
+            messagebox.showwarning("Предупреждение", "Не выбрана выходная папка!")
             return False
 
         return True    
 
-    def _close_processing_dialog(self):
-        if self.processing_window:
-            self.processing_window.destroy()
-            self.processing_window = None
+    # Настройки читаются в главном потоке при нажатии кнопки; задание работает с этой копией
+    def _settings(self):
+        columns = [col.strip() for col in self.selected_columns.get().split(",") if col.strip()]
+        return {
+            "input": self.xlsx_path.get(),
+            "output": self.output_folder.get(),
+            "load": {
+                "streaming": self.streaming_load.get(),
+                "compact": self.compact_dtypes.get(),
+                "sheet": self.excel_sheet.get() or None,
+                "columns": columns or None,
+            },
+            "graphs": [name for name, var in self.graph_types.items() if var.get()],
+            "threshold": self.scatter_threshold.get(),
+            "max_charts": self.scatter_max_charts.get() or None,
+            "bins": self.histogram_bins.get(),
+            "workers": self.render_workers.get(),
+            "sample": {
+                "sample_size": self.sample_size.get(),
+                "stratify": self.sample_stratify.get().strip() or None,
+            } if self.sample_enabled.get() else {},
+            "export": {
+                "format": self.export_format.get(),
+                "dpi": self.export_dpi.get(),
+                "bundle": self.export_bundle.get(),
+                "compression": min(9, max(0, self.export_compression.get())),
+                "tight_bbox": self.export_tight_bbox.get(),
+            },
+            "approximate": self.approximate_analysis.get(),
+        }
+
+    @property
+    def snapshots(self):
+        with self._snapshots_lock:
+            if self._snapshots is None:
+                self._snapshots = DatasetSnapshots(self.processor)
+            return self._snapshots
+
+    def _load_data(self, job, settings, sampled=False):
+        """
+        Снимок данных для задания (в потоке задания). Возвращает (снимок, None) или (None, текст ошибки).
+        sampled - задание строит только графики, ему подходит выборка, если она включена
+        """
+        load_options = dict(settings["load"], **settings["sample"]) if sampled else settings["load"]
+        analyzer = self.snapshots.load(job, settings["input"], **load_options)
+        if job.cancel_requested:
+            raise KeyboardInterrupt("Отмена пользователем")
+
+        if not analyzer.has_data():
+            message = "Не удалось загрузить данные."
+            if analyzer.last_error:
+                message += f"\n{analyzer.last_error}"
+            return None, message
+        if analyzer.is_empty():
+            return None, "Таблица пустая или некорректная."
+
+        report = analyzer.memory_report
+        if report:
+            job.report({"event": "memory", "text": f"Память: {report['before_bytes'] / 2 ** 20:.1f} МБ -> "
+                                                    f"{report['after_bytes'] / 2 ** 20:.1f} МБ"})
+        analyzer.workers = settings["workers"]
+        analyzer.progress_callback = job.report
+        return analyzer, None
+
+    def _submit(self, title, func):
+        settings = self._settings()
+        name = os.path.basename(settings["input"])
+        self.job_queue.submit(f"{title}: {name}", lambda job: func(job, settings))
 
 
     # Выполнение действий button
@@ -181,133 +421,130 @@ class GUInterface:
     def build_correlation(self):
         if not self._validate_inputs():
             return
-        self.thread = threading.Thread(target=self._build_correlation_thread)
-        self.thread.start()
+        self._submit("Матрица корреляции", self._build_correlation_job)
         
-    def _build_correlation_thread(self):
-        try:
-
-            self.processor.reset()
+    def _build_correlation_job(self, job, settings):
+        analyzer, error = self._load_data(job, settings)
+        if analyzer is None:
+            return "error", error
 
-            self.show_processing_dialog("Построение матрицы корреляции...")
-
-            if not self.processor.load_file(self.xlsx_path.get()):
-                self._show_error_on_main_thread("Не удалось загрузить данные.")
-                return
-
-            if self.processor.data.empty:
-                self._show_error_on_main_thread("Таблица пустая или некорректная.")
-                return
-
-            success = self.processor.build_correlation_matrix(self.output_folder.get())
-            if success:
-                self._show_info_on_main_thread(f"Матрица корреляции сохранена в:\n{self.output_folder.get()}")
-            else:
-                self._show_error_on_main_thread("Не удалось построить матрицу корреляции.")
-        except Exception as e:
-            self._show_error_on_main_thread(f"Произошла ошибка: {e}")
-        finally:
-            self._close_processing_dialog()
+        if analyzer.build_correlation_matrix(settings["output"]):
+            return "info", f"Матрица корреляции сохранена в:\n{settings['output']}"
+        return "error", "Не удалось построить матрицу корреляции."
 
 
     def build_graphs(self):
         selected = sum(self.graph_types[typ].get() for typ in self.graph_types)
         if selected == 0:
-            self._show_warning_on_main_thread("Не выбран ни один тип графика!")
+            messagebox.showwarning("Предупреждение", "Не выбран ни один тип графика!")
             return
 
         if not self._validate_inputs():
             return
 
-        self.thread = threading.Thread(target=self._build_graphs_thread)
-        self.thread.start()
+        graph_names = {"scatter": "scatter-графики", "pie": "круговые диаграммы", "histogram": "гистограммы"}
+        title = ", ".join(graph_names[name] for name, var in self.graph_types.items() if var.get())
+        self._submit(title.capitalize(), self._build_graphs_job)
 
-    def _build_graphs_thread(self):   
-        try:
+    def _build_graphs_job(self, job, settings):
+        analyzer, error = self._load_data(job, settings, sampled=True)
+        if analyzer is None:
+            return "error", error
 
-            self.processor.reset()
-
-            graph_list = []
-            for name, var in self.graph_types.items():
-                if var.get():
-                    if name == "scatter":
-                        graph_list.append("scatter-графики")
-                    elif name == "pie":
-                        graph_list.append("круговые диаграммы")
-                    elif name == "histogram":
-                        graph_list.append("гистограммы")
-                    else:
-                        graph_list.append("bliat gde i")
-            msg = f"Построение графиков: {', '.join(graph_list)}..."
-            self.show_processing_dialog(msg)
-
-            if not self.processor.load_file(self.xlsx_path.get()):
-                self._show_error_on_main_thread("Не удалось загрузить данные.")
-                return
-
-            if self.processor.data.empty:
-                self._show_error_on_main_thread("Таблица пустая или некорректная.")
-                return
-
-            results = {}
-
-            for name, var in self.graph_types.items():
-                if var.get():
-                    method = getattr(self.processor, f"build_{name}_charts")
-                    if name == "scatter":
-                        results[name] = method(self.output_folder.get(), threshold=self.scatter_threshold.get())
-                    elif name == "pie":
-                        results[name] = method(self.output_folder.get())
-                    elif name == "histogram":
-                        results[name] = method(self.output_folder.get(), bins=self.histogram_bins.get())
-                    else:
-                        results[name] = method(self.output_folder.get())  # Отработает eсли будут другие без параметров. Можно заменить на pass или на вызов ошибки. Сейчас сюда нельзя попасть
-            
-            # отмена
-            if all(not success for success in results.values()):
-                return
-            success_count = sum(results.values())
-            
-            if success_count > 0:
-                self._show_info_on_main_thread(f"Графики успешно построены и сохранены в:\n{self.output_folder.get()}")
-            else:
-                self._show_error_on_main_thread("Не удалось построить ни одного графика.")
-        
-        except Exception as e:
-            self._show_error_on_main_thread(f"Произошла ошибка: {e}") 
+        from charts import ExportOptions
+        export = ExportOptions(**settings["export"])
+
+        results = {}
+        try:
+            for name in settings["graphs"]:
+                if job.cancel_requested:
+                    break
+                method = getattr(analyzer, f"build_{name}_charts")
+                if name == "scatter":
+                    results[name] = method(settings["output"], threshold=settings["threshold"],
+                                           max_charts=settings["max_charts"], export=export)
+                elif name == "histogram":
+                    results[name] = method(settings["output"], bins=settings["bins"], export=export)
+                else:
+                    results[name] = method(settings["output"], export=export)
         finally:
-            self._close_processing_dialog()
+            # Один пул процессов на все виды графиков задания
+            analyzer.shutdown_render_pool()
+
+        if any(results.values()):
+            return "info", f"Графики успешно построены и сохранены в:\n{settings['output']}"
+        return "error", "Не удалось построить ни одного графика."
 
 
     def analyze_dataset(self):
         if not self._validate_inputs():
             return
+        self._submit("Анализ датасета", self._analyze_dataset_job)
 
-        self.thread = threading.Thread(target=self._analyze_dataset_thread)
-        self.thread.start()
+    def _analyze_dataset_job(self, job, settings):
+        analyzer, error = self._load_data(job, settings)
+        if analyzer is None:
+            return "error", error
 
-    def _analyze_dataset_thread(self):
-        try:
+        if analyzer.analyze_dataset(settings["output"], approximate=settings["approximate"]):
+            return "info", f"Анализ датасета сохранён:\n{settings['output']}"
+        return "error", "Не удалось проанализировать датасет."
 
-            self.processor.reset()
-            self.show_processing_dialog("Анализ датасета...")
+    def open_gallery(self):
+        if not any(var.get() for var in self.graph_types.values()):
+            messagebox.showwarning("Предупреждение", "Не выбран ни один тип графика!")
+            return
 
-            if not self.processor.load_file(self.xlsx_path.get()):
-                self._show_error_on_main_thread("Не удалось загрузить данные.")
-                return
+        if not self._validate_inputs(need_output=False):
+            return
+        self._submit("Предпросмотр графиков", self._gallery_job)
+
+    def _gallery_job(self, job, settings):
+        analyzer, error = self._load_data(job, settings, sampled=True)
+        if analyzer is None:
+            return "error", error
+
+        previews = analyzer.chart_previews(settings["graphs"], threshold=settings["threshold"],
+                                           max_charts=settings["max_charts"], bins=settings["bins"])
+        if not previews:
+            return "error", "Нет графиков для предпросмотра."
+
+        # Миниатюры в общем кэше узнаются по файлу, параметрам загрузки и построения
+        stat = os.stat(settings["input"])
+        cache_key = (os.path.abspath(settings["input"]), stat.st_mtime_ns, repr(settings["load"]), repr(settings["sample"]),
+                     settings["threshold"], settings["max_charts"], settings["bins"])
+        title = f"Предпросмотр: {os.path.basename(settings['input'])}"
+        return "gallery", (title, previews, self.thumbnails, cache_key)
+
+    def build_report(self):
+        if not self._validate_inputs():
+            return
+        self._submit("HTML-отчёт", self._build_report_job)
 
-            success = self.processor.analyze_dataset(self.output_folder.get())
+    def _build_report_job(self, job, settings):
+        analyzer, error = self._load_data(job, settings, sampled=True)
+        if analyzer is None:
+            return "error", error
 
-            if success:
-                self._show_info_on_main_thread(f"Анализ датасета сохранён:\n{self.output_folder.get()}")
-            else:
-                self._show_error_on_main_thread("Не удалось проанализировать датасет.")
+        # Графики по выборке, а матрица корреляции - по всей таблице
+        full = None
+        if settings["sample"]:
+            full, error = self._load_data(job, settings)
+            if full is None:
+                return "error", error
 
-        except Exception as e:
-            self._show_error_on_main_thread(f"Произошла ошибка: {e}")
-        finally:
-            self._close_processing_dialog()
+        if analyzer.build_html_report(settings["output"], graphs=settings["graphs"], threshold=settings["threshold"],
+                                      max_charts=settings["max_charts"], bins=settings["bins"], full=full):
+            return "info", f"HTML-отчёт сохранён в:\n{settings['output']}"
+        return "error", "Не удалось построить HTML-отчёт."
+
+    def _on_close(self):
+        self.job_queue.shutdown()
+        self.root.destroy()
 
     # Запуск
     def run(self):
+        if self.warmup is not None:
+            self.root.after_idle(lambda: self.warmup.mark("window"))
+        self.root.after(self._POLL_MS, self._poll_jobs)
         self.root.mainloop()
@@ -0,0 +1,152 @@
+import itertools
+import os
+import queue
+import threading
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Dict, List, Optional, Tuple
+
+
+class Job:
+    """
+    Задание очереди: функция func(job), выполняемая в потоке-исполнителе, и её состояние.
+    status: queued, running, done, failed, canceled. Из потока задания о ходе работы сообщает report
+    """
+
+    def __init__(self, job_id: int, title: str, func: Callable[["Job"], object], events: "queue.Queue"):
+        self.id = job_id
+        self.title = title
+        self.func = func
+        self.status = "queued"
+        self.result = None
+        self.error: Optional[BaseException] = None
+        self.cancel_requested = False
+        self._events = events
+        self._cancel_callbacks: List[Callable[[], None]] = []
+        self._lock = threading.Lock()
+
+    def report(self, payload: dict) -> None:
+        self._events.put(("progress", self, payload))
+
+    # Что вызвать при отмене (например, DataAnalyzer.cancel); если отмена уже была - вызывается сразу
+    def on_cancel(self, callback: Callable[[], None]) -> None:
+        with self._lock:
+            if not self.cancel_requested:
+                self._cancel_callbacks.append(callback)
+                return
+        callback()
+
+    def cancel(self) -> None:
+        with self._lock:
+            self.cancel_requested = True
+            callbacks, self._cancel_callbacks = self._cancel_callbacks, []
+        for callback in callbacks:
+            callback()
+
+
+class JobQueue:
+    """
+    Очередь заданий интерфейса: задания выполняются в пуле из max_workers потоков, лишние ждут.
+    События (queued, started, progress, finished) копятся в потокобезопасной очереди и забираются
+    из главного потока Tk через poll (опрос по root.after), поэтому виджеты трогает только главный поток
+    """
+
+    def __init__(self, max_workers: int = 1):
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="job")
+        self._events: "queue.Queue" = queue.Queue()
+        self._ids = itertools.count(1)
+        self.jobs: "OrderedDict[int, Job]" = OrderedDict()
+
+    def submit(self, title: str, func: Callable[[Job], object]) -> Job:
+        job = Job(next(self._ids), title, func, self._events)
+        self.jobs[job.id] = job
+        self._events.put(("queued", job, None))
+        self._executor.submit(self._run, job)
+        return job
+
+    def _run(self, job: Job) -> None:
+        if not job.cancel_requested:
+            job.status = "running"
+            self._events.put(("started", job, None))
+            try:
+                job.result = job.func(job)
+            except KeyboardInterrupt:
+                pass
+            except Exception as e:
+                job.error = e
+
+        if job.cancel_requested:
+            job.status = "canceled"
+        elif job.error is not None:
+            job.status = "failed"
+        else:
+            job.status = "done"
+        self._events.put(("finished", job, None))
+
+    def poll(self) -> List[Tuple[str, Job, Optional[dict]]]:
+        events = []
+        while True:
+            try:
+                events.append(self._events.get_nowait())
+            except queue.Empty:
+                return events
+
+    def active(self) -> List[Job]:
+        return [job for job in self.jobs.values() if job.status in ("queued", "running")]
+
+    def cancel_all(self) -> None:
+        for job in self.active():
+            job.cancel()
+
+    def shutdown(self) -> None:
+        self.cancel_all()
+        self._executor.shutdown(wait=False, cancel_futures=True)
+
+
+class DatasetSnapshots:
+    """
+    Загруженные наборы данных, общие для заданий. Каждое задание получает свой snapshot() DataAnalyzer:
+    таблица, агрегаты и кэши статистик общие и после загрузки только читаются, а флаг отмены,
+    число процессов и обработчик хода работы у каждого задания свои.
+    Ключ - путь, размер и время изменения файла и параметры загрузки; хранятся последние keep наборов
+    """
+
+    def __init__(self, prototype, keep: int = 2):
+        self.prototype = prototype
+        self.keep = keep
+        self._loaded: "OrderedDict[tuple, object]" = OrderedDict()
+        self._key_locks: Dict[tuple, threading.Lock] = {}
+        self._lock = threading.Lock()
+
+    def load(self, job: Job, file_path: str, **load_options):
+        """
+        Снимок набора данных для задания. Если загрузить не удалось, возвращается снимок с last_error
+        """
+        stat = os.stat(file_path)
+        key = (os.path.abspath(file_path), stat.st_size, stat.st_mtime_ns,
+               tuple(sorted((name, repr(value)) for name, value in load_options.items())))
+
+        # Загрузка под замком своего ключа: два задания по одному файлу не читают его дважды,
+        # а задания по другим файлам не ждут. Общий замок - только на словари
+        with self._lock:
+            key_lock = self._key_locks.setdefault(key, threading.Lock())
+        with key_lock:
+            with self._lock:
+                loaded = self._loaded.get(key)
+            if loaded is None:
+                loaded = self.prototype.snapshot(fresh=True)
+                job.on_cancel(loaded.cancel)
+                if not loaded.load_file(file_path, **load_options):
+                    with self._lock:
+                        self._key_locks.pop(key, None)
+                    return loaded
+            with self._lock:
+                self._loaded[key] = loaded
+                self._loaded.move_to_end(key)
+                while len(self._loaded) > self.keep:
+                    evicted, _ = self._loaded.popitem(last=False)
+                    self._key_locks.pop(evicted, None)
+
+        analyzer = loaded.snapshot()
+        job.on_cancel(analyzer.cancel)
+        return analyzer
@@ -0,0 +1,196 @@
+import hashlib
+import json
+import os
+from typing import Callable, Iterable, Optional
+
+import pandas as pd
+
+try:
+    import pyarrow  # noqa: F401  (нужен pandas для формата Feather)
+    _HAS_ARROW = True
+except ImportError:
+    _HAS_ARROW = False
+
+
+class LoadCache:
+    """
+    Дисковый кэш загруженных таблиц. Хранит DataFrame уже после convert_int_columns_to_categorical
+    в бинарном колоночном формате (Feather, если установлен pyarrow, иначе pickle).
+    Запись привязана к пути файла и параметрам загрузки, актуальность проверяется по размеру,
+    времени изменения и хэшу содержимого. Суммарный размер записей не больше max_bytes:
+    при записи новой удаляются давно не использованные
+    """
+
+    # Увеличивать при изменении логики загрузки/преобразования, чтобы старые записи не использовались
+    _VERSION = 1
+    _HASH_CHUNK = 1024 * 1024
+    _MAX_BYTES = 4 * 1024 ** 3
+
+    def __init__(self, cache_dir: Optional[str] = None, max_bytes: int = _MAX_BYTES):
+        if cache_dir is None:
+            cache_dir = os.path.join(os.path.expanduser("~"), ".data_vizualizer_cache")
+        self.cache_dir = cache_dir
+        self.max_bytes = max_bytes
+
+    def _entry_base(self, file_path: str, options: Optional[dict]) -> str:
+        key = json.dumps({
+            "path": os.path.abspath(file_path),
+            "options": options or {},
+            "version": self._VERSION,
+        }, sort_keys=True, default=str)
+        return os.path.join(self.cache_dir, hashlib.sha1(key.encode("utf-8")).hexdigest())
+
+    @classmethod
+    def file_hash(cls, file_path: str) -> str:
+        digest = hashlib.blake2b(digest_size=20)
+        with open(file_path, "rb") as f:
+            for chunk in iter(lambda: f.read(cls._HASH_CHUNK), b""):
+                digest.update(chunk)
+        return digest.hexdigest()
+
+    def get(self, file_path: str, options: Optional[dict] = None) -> Optional[pd.DataFrame]:
+        base = self._entry_base(file_path, options)
+        try:
+            with open(base + ".json", encoding="utf-8") as f:
+                meta = json.load(f)
+
+            stat = os.stat(file_path)
+            if meta["size"] != stat.st_size:
+                return None
+
+            # Время изменения поменялось (копирование, touch) - сверяем содержимое по хэшу
+            if meta["mtime_ns"] != stat.st_mtime_ns:
+                if self.file_hash(file_path) != meta["hash"]:
+                    return None
+                meta["mtime_ns"] = stat.st_mtime_ns
+                self._write_meta(base, meta)
+
+            if meta["format"] == "feather":
+                data = pd.read_feather(base + ".feather")
+            else:
+                data = pd.read_pickle(base + ".pkl")
+            self._touch(base + ".json")
+            return data
+
+        except Exception:
+            # Нет записи или она повреждена - просто читаем исходный файл
+            return None
+
+    def put(self, file_path: str, data: pd.DataFrame, options: Optional[dict] = None) -> None:
+        base = self._entry_base(file_path, options)
+        try:
+            os.makedirs(self.cache_dir, exist_ok=True)
+            stat = os.stat(file_path)
+            meta = {
+                "source": os.path.abspath(file_path),
+                "size": stat.st_size,
+                "mtime_ns": stat.st_mtime_ns,
+                "hash": self.file_hash(file_path),
+            }
+
+            meta["format"] = "pickle"
+            if _HAS_ARROW:
+                try:
+                    # Feather требует строковые имена столбцов и однородные типы в object-столбцах
+                    self._atomic_write(base + ".feather", lambda path: data.to_feather(path))
+                    meta["format"] = "feather"
+                except Exception:
+                    pass
+            if meta["format"] == "pickle":
+                self._atomic_write(base + ".pkl", lambda path: data.to_pickle(path))
+
+            self._write_meta(base, meta)
+            self.prune(keep=base)
+
+        except Exception:
+            # Кэш - только ускорение, ошибка записи не должна мешать загрузке
+            pass
+
+    # Файл схемы таблицы (TableSchema) для file_path; вытесняется вместе с остальными записями
+    def schema_path(self, file_path: str) -> str:
+        os.makedirs(self.cache_dir, exist_ok=True)
+        return self._entry_base(file_path, {"kind": "schema"}) + ".schema.json"
+
+    # Произвольное состояние, привязанное к файлу (например, агрегаты потоковой загрузки).
+    # Актуальность проверяет сам объект, здесь только хранение
+    def get_object(self, file_path: str, kind: str):
+        path = self._entry_base(file_path, {"kind": kind}) + ".state.pkl"
+        try:
+            obj = pd.read_pickle(path)
+            self._touch(path)
+            return obj
+        except Exception:
+            return None
+
+    def put_object(self, file_path: str, kind: str, obj) -> None:
+        try:
+            os.makedirs(self.cache_dir, exist_ok=True)
+            path = self._entry_base(file_path, {"kind": kind}) + ".state.pkl"
+            self._atomic_write(path, lambda tmp_path: pd.to_pickle(obj, tmp_path))
+            self.prune(keep=path[:-len(".state.pkl")])
+        except Exception:
+            pass
+
+    def prune(self, keep: Optional[str] = None) -> None:
+        """
+        Удаляет давно не использованные записи, пока кэш больше max_bytes. Запись - файлы с общим
+        именем до первой точки (таблица и её .json); keep - только что записанная, её не трогаем
+        """
+        names = [entry.path for entry in os.scandir(self.cache_dir) if entry.is_file()]
+        keep_key = os.path.basename(keep) if keep is not None else None
+        prune_lru(names, self.max_bytes, lambda path: os.path.basename(path).split(".")[0], keep_key)
+
+    @staticmethod
+    def _touch(path: str) -> None:
+        # Время изменения служит временем последнего использования для prune
+        try:
+            os.utime(path)
+        except OSError:
+            pass
+
+    @staticmethod
+    def _atomic_write(path: str, writer) -> None:
+        tmp_path = path + ".tmp"
+        writer(tmp_path)
+        os.replace(tmp_path, path)
+
+    def _write_meta(self, base: str, meta: dict) -> None:
+        self._atomic_write(base + ".json", lambda path: self._dump_json(path, meta))
+
+    @staticmethod
+    def _dump_json(path: str, meta: dict) -> None:
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump(meta, f)
+
+
+def prune_lru(paths: Iterable[str], max_bytes: int, entry_key: Callable[[str], str],
+              keep: Optional[str] = None) -> None:
+    """
+    Удаляет записи кэша (группы файлов с одним entry_key) в порядке давности использования - по самому
+    позднему времени изменения их файлов, - пока суммарный размер больше max_bytes.
+    Недописанные .tmp-файлы не учитываются и не удаляются
+    """
+    entries = {}
+    for path in paths:
+        if path.endswith(".tmp"):
+            continue
+        try:
+            stat = os.stat(path)
+        except OSError:
+            continue
+        key = entry_key(path)
+        size, used, files = entries.get(key, (0, 0.0, []))
+        entries[key] = (size + stat.st_size, max(used, stat.st_mtime), files + [path])
+
+    total = sum(size for size, _, _ in entries.values())
+    for key, (size, _, files) in sorted(entries.items(), key=lambda item: item[1][1]):
+        if total <= max_bytes:
+            break
+        if key == keep:
+            continue
+        for path in files:
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+        total -= size
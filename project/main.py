@@ -1,12 +1,33 @@
-from interface import GUInterface
-from processor import DataAnalyzer
+import json
+import multiprocessing
+import os
+import sys
+import time
 
 
 def main():
-    processor = DataAnalyzer()
-    app = GUInterface(processor)
+    started = time.perf_counter()
+
+    # Нужно для пула процессов отрисовки в собранном pyinstaller .exe
+    multiprocessing.freeze_support()
+
+    # С аргументами - пакетная обработка без окна, Tk при этом не импортируется
+    if len(sys.argv) > 1:
+        import cli
+        sys.exit(cli.main(sys.argv[1:]))
+
+    # Окно появляется сразу, pandas и matplotlib импортируются в фоне
+    from interface import GUInterface
+    from warmup import Warmup
+
+    warmup = Warmup(started).start()
+    app = GUInterface(warmup=warmup)
     app.run()
 
+    # DATA_VIZUALIZER_TIMINGS=1 - вывести время до появления окна, готовности библиотек и первого графика
+    if os.environ.get("DATA_VIZUALIZER_TIMINGS"):
+        print(json.dumps(warmup.timings), file=sys.stderr)
+
 
 if __name__ == "__main__":
     main()
\ No newline at end of file
@@ -0,0 +1,113 @@
+import hashlib
+import json
+import os
+import shutil
+import threading
+from typing import Any, List, Optional
+
+import matplotlib
+import numpy as np
+
+from charts import ChartJob
+from load_cache import prune_lru
+
+
+class OutputCache:
+    """
+    Кэш готовых графиков по содержимому. Ключ задания - хэш его вида и всех параметров
+    (сами данные столбцов или уже посчитанные частоты, подписи, порог/корзины через отобранные данные),
+    поэтому график с тем же ключом выглядел бы так же и заново не рисуется:
+    файл копируется из кэша. И в кэш, и из него кладутся копии, а не жёсткие ссылки: график в папке
+    пользователя могут отредактировать на месте, и кэш при этом меняться не должен.
+    Суммарный размер не больше max_bytes, давно не использованные графики удаляются
+    """
+
+    # Увеличивать при изменении отрисовки (ChartRenderer), чтобы старые картинки не использовались
+    _VERSION = 2
+    _MAX_BYTES = 1024 ** 3
+    MANIFEST_NAME = "manifest.json"
+
+    def __init__(self, cache_dir: str, max_bytes: int = _MAX_BYTES):
+        self.cache_dir = cache_dir
+        self.max_bytes = max_bytes
+        # Обход всего кэша - не на каждый график: сначала при первой записи, потом каждые ~10% max_bytes
+        self._unpruned_bytes: Optional[int] = None
+
+    @classmethod
+    def job_key(cls, job: ChartJob) -> str:
+        digest = hashlib.blake2b(digest_size=20)
+        digest.update(f"{cls._VERSION}|{matplotlib.__version__}|{job.kind}|{job.export!r}|{job.note}".encode("utf-8"))
+        for name in sorted(job.params):
+            digest.update(f"|{name}=".encode("utf-8"))
+            cls._hash_value(digest, job.params[name])
+        return digest.hexdigest()
+
+    @staticmethod
+    def _hash_value(digest, value: Any) -> None:
+        if isinstance(value, np.ndarray) and value.dtype != object:
+            digest.update(f"{value.dtype.str}{value.shape}".encode("utf-8"))
+            digest.update(np.ascontiguousarray(value).tobytes())
+        else:
+            if isinstance(value, np.ndarray):
+                value = value.tolist()
+            digest.update(repr(value).encode("utf-8"))
+
+    def _entry_path(self, key: str, save_path: str) -> str:
+        return os.path.join(self.cache_dir, key[:2], key + os.path.splitext(save_path)[1])
+
+    def fetch(self, key: str, save_path: str) -> bool:
+        """
+        Кладёт сохранённый график в save_path. False - такого графика в кэше нет
+        """
+        entry = self._entry_path(key, save_path)
+        if not os.path.exists(entry):
+            return False
+        try:
+            self._copy(entry, save_path)
+            os.utime(entry)
+            return True
+        except OSError:
+            return False
+
+    def store(self, key: str, save_path: str) -> None:
+        try:
+            entry = self._entry_path(key, save_path)
+            os.makedirs(os.path.dirname(entry), exist_ok=True)
+            self._copy(save_path, entry)
+            if self._unpruned_bytes is not None:
+                self._unpruned_bytes += os.path.getsize(entry)
+            if self._unpruned_bytes is None or self._unpruned_bytes > self.max_bytes // 10:
+                self.prune()
+        except OSError:
+            # Кэш - только ускорение, ошибка записи не должна мешать построению графиков
+            pass
+
+    def prune(self) -> None:
+        self._unpruned_bytes = 0
+        paths = [os.path.join(root, name) for root, _, names in os.walk(self.cache_dir) for name in names]
+        prune_lru(paths, self.max_bytes, lambda path: path)
+
+    @staticmethod
+    def _copy(source: str, target: str) -> None:
+        # Своё имя временного файла у каждого потока: два задания могут писать один график одновременно
+        tmp_path = f"{target}.{os.getpid()}.{threading.get_ident()}.tmp"
+        try:
+            shutil.copy2(source, tmp_path)
+            os.replace(tmp_path, target)
+        finally:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+
+
+# Манифест папки с графиками: какой файл взят из кэша, а какой нарисован заново
+def write_manifest(folder: str, entries: List[dict], options: Optional[dict] = None) -> str:
+    path = os.path.join(folder, OutputCache.MANIFEST_NAME)
+    manifest = {
+        "options": options or {},
+        "reused": sum(entry["status"] == "reused" for entry in entries),
+        "rendered": sum(entry["status"] == "rendered" for entry in entries),
+        "charts": entries,
+    }
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(manifest, f, ensure_ascii=False, indent=2)
+    return path
@@ -1,12 +1,31 @@
+import copy
+import json
+import multiprocessing
 import os
+import threading
+import time
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from concurrent.futures.process import BrokenProcessPool
 from contextlib import contextmanager
 from datetime import datetime
-from typing import List, Optional
+from typing import Any, Callable, Dict, Hashable, Iterable, List, Optional, Tuple
 
-import matplotlib.pyplot as plt
+import numpy as np
 import openpyxl
 import pandas as pd
 
+from matplotlib.backends.backend_pdf import PdfPages
+
+from charts import ChartJob, ExportOptions, render_job, render_page
+from excel_reader import read_excel
+from load_cache import LoadCache
+from output_cache import OutputCache, write_manifest
+from report import counts, numbers, write_html_report
+from schema import TableSchema
+from sketches import ColumnSketch, RowSample
+from stats import CategoryIndex, StatsCache, bin_indices, find_correlated_pairs, grouped_histogram
+from streaming import StreamingAggregates
+
 
 class DataAnalyzer:
     
@@ -31,65 +50,413 @@ class DataAnalyzer:
         ("left_bracket_right_parenthesis", -1.0, -0.8): "0080FF", 
     }
 
-    def __init__(self):
-        self.data: Optional[pd.DataFrame] = None
-        self.is_canceled: bool = False
+    # Значения целочисленных столбцов, которые convert_int_columns_to_categorical переводит в категории
+    # (отображение по умолчанию в ordinal_mappings)
+    _ORDINAL_MAPPING = {
+        1: "Beginner",
+        2: "Medium",
+        3: "Expert",
+    }
 
+    # Начиная с этого числа ячеек матрица корреляции окрашивается правилами условного форматирования
+    _CONDITIONAL_FORMAT_CELLS = 250_000
 
-    def load_file(self, file_path: str) -> bool:
-        
+    # Сетка (по x, по y) карты плотности для scatter-графиков на больших таблицах
+    _DENSITY_GRID = (240, 180)
+
+    # Размер блока (строк) при потоковой загрузке CSV
+    _STREAM_CHUNK_ROWS = 200_000
+
+    # Строковый столбец переводится в category при compact_dtypes, если уникальных значений не больше этой доли строк
+    _CATEGORY_MAX_RATIO = 0.5
+
+    # Меньше стольких графиков рисуются в текущем процессе даже при workers > 1
+    _POOL_MIN_JOBS = 24
+
+    # Параметры приближённого анализа датасета
+    _APPROX_CHUNK_ROWS = 1_000_000
+    _APPROX_SAMPLE_SIZE = 100_000
+    _APPROX_EXAMPLES = 20
+    # При потоковой загрузке выборки всех числовых столбцов вместе - не больше стольких значений
+    _APPROX_STREAM_SAMPLE_VALUES = 10_000_000
+
+    def __init__(self, workers: int = 1, use_cache: bool = True, cache_dir: Optional[str] = None):
+        self.data: Optional[pd.DataFrame] = None
+        self.is_canceled: bool = False
+        # Число процессов для отрисовки графиков, 1 - рисовать в текущем потоке
+        self.workers: int = workers
+        # Пул процессов отрисовки создаётся при первом большом построении и живёт до shutdown_render_pool
+        self._render_pool: Optional[ProcessPoolExecutor] = None
+        self._render_pool_workers = 0
+        self.load_cache: Optional[LoadCache] = LoadCache(cache_dir) if use_cache else None
+        # Готовые графики по ключу содержимого, рядом с кэшем загрузки
+        self.output_cache: Optional[OutputCache] = \
+            OutputCache(os.path.join(self.load_cache.cache_dir, "charts")) if use_cache else None
+        self.stats = StatsCache()
+        # Агрегаты потоковой загрузки CSV; при них self.data не загружается
+        self.aggregates: Optional[StreamingAggregates] = None
+        # Снимки (snapshot) делят агрегаты; их дополнение после загрузки (второй проход гистограмм) - под замком
+        self._aggregates_lock = threading.Lock()
+        self.source_path: Optional[str] = None
+        self.last_error: Optional[str] = None
+        # Память до и после compact_dtypes для последней загрузки (None, если сжатие не запрашивалось)
+        self.memory_report: Optional[dict] = None
+        # Порядковые отображения по имени ({значение: подпись}): целочисленный столбец, значения которого -
+        # ровно ключи отображения, становится упорядоченной категорией. column_ordinals - столбцы
+        # с отображением, заданным явно (подходит и для строковых значений)
+        self.ordinal_mappings: Dict[str, Dict[Any, str]] = {"experience_level": dict(self._ORDINAL_MAPPING)}
+        self.column_ordinals: Dict[str, str] = {}
+        # Схема загруженной таблицы: роли столбцов и порядковые отображения
+        self.schema: Optional[TableSchema] = None
+        # Если загружена выборка: {"rows": строк в файле, "size": строк в выборке, "stratify": столбец}
+        self.sample_info: Optional[dict] = None
+        # Получает события хода построения графиков (см. _emit_progress)
+        self.progress_callback: Optional[Callable[[dict], None]] = None
+
+
+    def load_file(self, file_path: str, streaming: bool = False, compact: bool = False,
+                  sheet: Optional[str] = None, columns: Optional[List[str]] = None,
+                  sample_size: Optional[int] = None, stratify: Optional[str] = None) -> bool:
+        """
+        Загружает таблицу. sheet - лист Excel (по умолчанию первый), columns - читать только эти столбцы
+        (для CSV и Excel; потоковая загрузка читает все).
+        sample_size - вместо всей таблицы загрузить равномерную выборку стольких строк (CSV читается блоками,
+        целиком в памяти не бывает), stratify - поровну строк на каждое значение этого столбца.
+        Выборка нужна для быстрых обзорных графиков, в их заголовках это отмечается
+        """
         try:
-            if file_path.lower().endswith('.csv'):
-                self.data = pd.read_csv(file_path)
-            elif file_path.lower().endswith(('.xlsx', '.xls')):
-                self.data = pd.read_excel(file_path)
-            else:
+            self.last_error = None
+            self.memory_report = None
+            self.sample_info = None
+            if not file_path.lower().endswith(('.csv', '.xlsx', '.xls')):
                 raise ValueError("Неподдерживаемый формат файла.")
-            # print(f"Данные успешно загружены: {file_path}")
-            
-            self.convert_int_columns_to_categorical()
-
+            if streaming and sample_size:
+                raise ValueError("Выборка и потоковая загрузка не совмещаются.")
+            # Потоковые агрегаты распознают только отображение по умолчанию
+            if streaming and self._custom_ordinals():
+                raise ValueError("Свои порядковые отображения не поддерживаются потоковой загрузкой.")
+
+            source_key = self._source_key(file_path)
+            # Лист, набор столбцов и выборка - часть ключа: для кэша это другая таблица
+            options = {"sheet": sheet, "columns": list(columns) if columns else None} \
+                if sheet is not None or columns else None
+            if sample_size:
+                options = dict(options or {}, sample=sample_size, stratify=stratify)
+            # Свои отображения дают другие категории; ключ кэша по умолчанию прежний
+            if self._custom_ordinals():
+                options = dict(options or {}, ordinals=[self.ordinal_mappings, self.column_ordinals])
+            previous_path = self.source_path
+            self.source_path = file_path
+
+            # Потоковый режим: таблица читается блоками, в памяти остаются только агрегаты
+            if streaming:
+                if not file_path.lower().endswith('.csv'):
+                    raise ValueError("Потоковая загрузка поддерживается только для CSV.")
+                self.data = None
+                # Пока агрегаты дополняются, они не считаются загруженными: при ошибке или отмене
+                # частично обновлённое состояние не используется
+                current, self.aggregates = self.aggregates, None
+                self.aggregates = self._load_aggregates(file_path, current, previous_path)
+                self.stats.reset(("streaming",) + source_key)
+                return True
+
+            self.aggregates = None
+            self.schema = None
+
+            # Схема из кэша загрузки: типы известны до чтения, определять их не нужно
+            table = "" if sheet is None else str(sheet)
+            schema_path = self.load_cache.schema_path(file_path) if self.load_cache is not None else None
+            schema = TableSchema.load(schema_path, file_path, table, self.ordinal_mappings, self.column_ordinals) \
+                if schema_path is not None else None
+
+            # Повторная загрузка того же файла берётся из кэша уже с преобразованными столбцами
+            cached = self.load_cache.get(file_path, options) if self.load_cache is not None else None
+            if cached is not None:
+                self.data = cached
+                # Порядковые столбцы в кэше уже категории, схема нужна только для ролей
+                self.schema = schema if schema is not None and schema.covers(cached.columns) else \
+                    TableSchema.infer(cached, self.ordinal_mappings, self.column_ordinals)
+            else:
+                self.data = self._read_table(file_path, sheet, columns, sample_size, stratify, schema)
+                # print(f"Данные успешно загружены: {file_path}")
+
+                if schema is not None:
+                    schema = schema.without(schema.stale_columns(self.data))
+                if schema is None or not schema.covers(self.data.columns):
+                    schema = TableSchema.infer(self.data, self.ordinal_mappings, self.column_ordinals, known=schema)
+                    # Выборка или часть столбцов - не вся таблица: по ним нельзя решать, порядковый ли столбец
+                    if schema_path is not None and not sample_size and not columns:
+                        schema.save(schema_path, file_path, table, self.column_ordinals)
+                self.schema = schema
+                schema.apply(self.data)
+
+                if self.load_cache is not None:
+                    self.load_cache.put(file_path, self.data, options)
+
+            # Сведения о выборке хранятся в attrs таблицы, поэтому есть и у взятой из кэша
+            self.sample_info = self.data.attrs.get("sample")
+
+            # В кэше исходные типы: сжатие дешевле чтения файла, и отчёт о памяти есть при каждой загрузке
+            if compact:
+                self.memory_report = self.compact_dtypes()
+
+            self.stats.reset(source_key + (compact, json.dumps(options, default=str)))
             return True
         
+        except KeyboardInterrupt:
+            # print("Загрузка прервана пользователем.")
+            return False
         except Exception as e:
             # print(f"Ошибка загрузки файла: {e}")
+            self.last_error = str(e)
             return False
 
+    def _custom_ordinals(self) -> bool:
+        return bool(self.column_ordinals) or self.ordinal_mappings != {"experience_level": self._ORDINAL_MAPPING}
+
+    def _read_table(self, file_path: str, sheet: Optional[str], columns: Optional[List[str]],
+                    sample_size: Optional[int], stratify: Optional[str],
+                    schema: Optional[TableSchema]) -> pd.DataFrame:
+        dtypes = schema.read_dtypes() if schema is not None else None
+        try:
+            if sample_size:
+                return self._read_sample(file_path, sheet, columns, sample_size, stratify, dtypes)
+            if file_path.lower().endswith('.csv'):
+                return pd.read_csv(file_path, usecols=columns or None, dtype=dtypes)
+            return read_excel(file_path, sheet=sheet, columns=columns or None)
+        except (TypeError, ValueError):
+            # Типы из схемы не подошли (файл подменили с тем же размером и временем) - читаем без них
+            if dtypes is None:
+                raise
+            return self._read_table(file_path, sheet, columns, sample_size, stratify, None)
+
+    def _read_sample(self, file_path: str, sheet: Optional[str], columns: Optional[List[str]],
+                     sample_size: int, stratify: Optional[str], dtypes: Optional[dict] = None) -> pd.DataFrame:
+        sample = RowSample(sample_size, stratify=stratify)
+        if file_path.lower().endswith('.csv'):
+            chunks = pd.read_csv(file_path, usecols=columns or None, dtype=dtypes, chunksize=self._STREAM_CHUNK_ROWS)
+        else:
+            # Книгу Excel блоками не прочитать: выборка берётся из прочитанного листа
+            chunks = [read_excel(file_path, sheet=sheet, columns=columns or None)]
+
+        for chunk in chunks:
+            if self.is_canceled:
+                raise KeyboardInterrupt("Отмена пользователем")
+            sample.update(chunk)
+
+        data = sample.result()
+        data.attrs["sample"] = {"rows": sample.rows_seen, "size": len(data), "stratify": stratify}
+        return data
+
+    def sample_note(self) -> str:
+        """
+        Пометка для заголовков графиков, построенных по выборке; пустая строка для полной таблицы
+        """
+        if not self.sample_info:
+            return ""
+        note = f"выборка {self.sample_info['size']:,} из {self.sample_info['rows']:,} строк".replace(",", " ")
+        if self.sample_info["stratify"]:
+            note += f", по {self.sample_info['stratify']}"
+        return note
+
+    def _load_aggregates(self, file_path: str, current: Optional[StreamingAggregates],
+                         previous_path: Optional[str]) -> StreamingAggregates:
+        """
+        Инкрементальная потоковая загрузка: если для файла уже есть агрегаты (в памяти или на диске)
+        и файл с тех пор только дописывался, читаются лишь новые строки. Иначе файл читается целиком
+        """
+        aggregates = None
+        if current is not None and previous_path is not None \
+                and os.path.abspath(previous_path) == os.path.abspath(file_path):
+            aggregates = current
+        elif self.load_cache is not None:
+            aggregates = self.load_cache.get_object(file_path, "streaming")
+
+        if aggregates is not None and aggregates.ordinal_mapping == self._ORDINAL_MAPPING \
+                and aggregates.can_append_from(file_path):
+            new_rows = aggregates.update_from_csv(file_path, is_canceled=lambda: self.is_canceled)
+            if new_rows == 0:
+                return aggregates
+        else:
+            aggregates = StreamingAggregates.from_csv(
+                file_path, self._ORDINAL_MAPPING, self._STREAM_CHUNK_ROWS, is_canceled=lambda: self.is_canceled)
+
+        if self.load_cache is not None:
+            self.load_cache.put_object(file_path, "streaming", aggregates)
+        return aggregates
+
+    # Статистики сбрасываются только если файл изменился, повторная загрузка того же файла их сохраняет
+    @staticmethod
+    def _source_key(file_path: str) -> Hashable:
+        stat = os.stat(file_path)
+        return (os.path.abspath(file_path), stat.st_size, stat.st_mtime_ns)
+
+    # Данные загружены: таблицей в памяти или агрегатами потоковой загрузки
+    def has_data(self) -> bool:
+        return self.data is not None or self.aggregates is not None
+
+    def is_empty(self) -> bool:
+        if self.data is not None:
+            return self.data.empty
+        return self.aggregates is None or self.aggregates.n_rows == 0
+
     def get_numeric_columns(self)-> List[str]:
         if self.data is None:
-            return []
-        return self.data.select_dtypes(include=['int64', 'float64']).columns.tolist()
+            return list(self.aggregates.numeric_columns) if self.aggregates is not None else []
+        # Роли определены схемой при загрузке; compact_dtypes их не меняет
+        if self.schema is not None:
+            return self.schema.columns_with_role("numeric", self.data.columns)
+        # Любая ширина и nullable-типы (Int8, Float32...), в том числе после compact_dtypes; bool не числовой
+        return self.data.select_dtypes(include='number').columns.tolist()
 
     def get_categorical_columns(self)-> List[str]:
         if self.data is None:
-            return []
-        return self.data.select_dtypes(include=['object', 'category']).columns.tolist()
+            return list(self.aggregates.categorical_columns) if self.aggregates is not None else []
+        if self.schema is not None:
+            return self.schema.columns_with_role("categorical", self.data.columns)
+        return self.data.select_dtypes(include=['object', 'category', 'string']).columns.tolist()
     
+    # Производные статистики: считаются один раз на загруженный набор данных и общие для всех построений.
+    # В потоковом режиме берутся из агрегатов
+
+    def correlation_matrix(self, numeric_cols: List[str]) -> pd.DataFrame:
+        if self.data is None:
+            return self.aggregates.correlation(numeric_cols)
+        return self.stats.get(("corr", tuple(numeric_cols)), lambda: self.data[numeric_cols].corr())
+
+    # Коды всех категориальных столбцов: строится один раз на загрузку, при первом обращении
+    def category_index(self) -> CategoryIndex:
+        cat_cols = tuple(self.get_categorical_columns())
+        return self.stats.get(("category_index", cat_cols), lambda: CategoryIndex(self.data, cat_cols))
+
+    def value_counts(self, col: str) -> pd.Series:
+        """
+        Частоты значений. Запоминаются только для категориальных столбцов (их немного, они нужны и
+        круговым диаграммам, и анализу датасета); у числовых почти все значения уникальны, и кэш
+        занимал бы больше самой таблицы, поэтому их частоты считаются заново и не хранятся
+        """
+        if self.data is None:
+            return self.aggregates.value_counts(col)
+
+        index = self.category_index()
+        if col not in index:
+            return self.data[col].value_counts()
+        return self.stats.get(("value_counts", col), lambda: index.value_counts(col))
+
+    def crosstab(self, target_col: str, group_col: str) -> pd.DataFrame:
+        if self.data is None:
+            return self.aggregates.crosstab(target_col, group_col)
+
+        # Таблицы A×B и B×A совпадают с точностью до транспонирования, храним одну
+        columns = list(self.data.columns)
+        if columns.index(target_col) > columns.index(group_col):
+            return self.crosstab(group_col, target_col).T
+
+        def compute():
+            index = self.category_index()
+            if target_col in index and group_col in index:
+                return index.crosstab(target_col, group_col)
+            return pd.crosstab(self.data[target_col], self.data[group_col])
+        return self.stats.get(("crosstab", target_col, group_col), compute)
+
+    # Целочисленные коды категорий (-1 для пропусков) и сами категории в порядке первого появления
+    def category_codes(self, col: str) -> Tuple[np.ndarray, List[Any]]:
+        def compute():
+            index = self.category_index()
+            if col in index:
+                return index.codes(col)
+            codes, uniques = pd.factorize(self.data[col])
+            return codes, list(uniques)
+        return self.stats.get(("category_codes", col), compute)
+
+    def histogram_counts(self, num_col: str, group_col: str, bins: int) -> Tuple[np.ndarray, np.ndarray, List[Any]]:
+        """
+        Частоты num_col по категориям group_col (матрица категории × корзины), общие границы корзин
+        и подписи категорий
+        """
+        if self.data is None:
+            # Задания на одном наборе ждут, пока первое досчитает и сохранит частоты, а не считают их заново
+            with self._aggregates_lock:
+                if not self.aggregates.has_histograms(bins):
+                    self.aggregates.histograms(self.source_path, bins, is_canceled=lambda: self.is_canceled)
+                    # Сохраняем вместе с агрегатами, чтобы после дописывания строк досчитывать только их
+                    if self.load_cache is not None:
+                        self.load_cache.put_object(self.source_path, "streaming", self.aggregates)
+                counts = self.aggregates.histograms(self.source_path, bins)
+            edges = self.aggregates.histogram_edges(num_col, bins)
+            return counts[(num_col, group_col)], edges, self.aggregates.category_labels(group_col)
+
+        # Границы корзин и номер корзины каждой строки - один раз на числовой столбец
+        def compute_bins():
+            values = self.data[num_col].to_numpy(dtype=np.float64, na_value=np.nan)
+            edges = np.histogram_bin_edges(values[~np.isnan(values)], bins=bins)
+            return edges, bin_indices(values, edges)
+
+        edges, bin_idx = self.stats.get(("histogram_bins", num_col, bins), compute_bins)
+        codes, categories = self.category_codes(group_col)
+        return grouped_histogram(codes, len(categories), bin_idx, len(edges) - 1), edges, categories
+
     def convert_int_columns_to_categorical(self):
         """
-        Автоматически преобразует значения [1, 2, 3] в категориальные: "Beginner", "Medium", "Expert". Нужно для столбца Experience_Level
+        Автоматически преобразует значения [1, 2, 3] в категориальные: "Beginner", "Medium", "Expert". Нужно для столбца Experience_Level.
+        Как и другие отображения из ordinal_mappings и column_ordinals, определяется схемой (TableSchema.infer)
         """
         if self.data is None:
             return
 
-        numeric_cols = self.get_numeric_columns()
-
-        for col in numeric_cols:
+        self.schema = TableSchema.infer(self.data, self.ordinal_mappings, self.column_ordinals)
+        self.schema.apply(self.data)
 
-            if not pd.api.types.is_integer_dtype(self.data[col]):
-                continue
+    def set_ordinal_mapping(self, name: str, mapping: Dict[Any, str], columns: Iterable[str] = ()) -> None:
+        """
+        Добавляет порядковое отображение {значение: подпись} (порядок категорий - порядок ключей).
+        Столбцы columns получают его явно, остальные целочисленные - если их значения ровно ключи.
+        Действует со следующей загрузки
+        """
+        self.ordinal_mappings[name] = dict(mapping)
+        for col in columns:
+            self.column_ordinals[col] = name
 
-            unique_vals = sorted(self.data[col].dropna().unique())
 
-            if set(unique_vals) == {1, 2, 3} and len(unique_vals) == 3:
-                mapping = { 
-                    1: "Beginner", 
-                    2: "Medium", 
-                    3: "Expert" 
-                    }
-                self.data[col] = pd.Categorical(self.data[col].map(mapping),
-                                                categories=["Beginner", "Medium", "Expert"], ordered=True )
-        
+    def compact_dtypes(self) -> dict:
+        """
+        Сжимает типы загруженной таблицы без потери значений: целые - до наименьшей знаковой ширины,
+        float64 - до float32, только если все значения представимы точно, строковые столбцы
+        с долей уникальных не больше _CATEGORY_MAX_RATIO - в category.
+        Возвращает отчёт: память (байт) до и после по каждому изменённому столбцу и итог
+        """
+        before = self.data.memory_usage(index=False, deep=True)
+        changed = []
+
+        for col in self.data.columns:
+            series = self.data[col]
+            compacted = None
+
+            if pd.api.types.is_integer_dtype(series) and not isinstance(series.dtype, pd.CategoricalDtype):
+                compacted = pd.to_numeric(series, downcast='integer')
+            elif series.dtype == np.float64:
+                values = series.to_numpy()
+                narrow = values.astype(np.float32)
+                if np.array_equal(narrow.astype(np.float64), values, equal_nan=True):
+                    compacted = pd.Series(narrow, index=series.index, name=col)
+            elif series.dtype == object and len(series) > 0:
+                if series.nunique(dropna=True) <= self._CATEGORY_MAX_RATIO * len(series):
+                    compacted = series.astype('category')
+
+            if compacted is not None and compacted.dtype != series.dtype:
+                self.data[col] = compacted
+                changed.append((col, str(series.dtype), str(compacted.dtype)))
+
+        after = self.data.memory_usage(index=False, deep=True)
+        return {
+            "before_bytes": int(before.sum()),
+            "after_bytes": int(after.sum()),
+            "columns": [
+                {"column": str(col), "before_dtype": old, "after_dtype": new,
+                 "before_bytes": int(before[col]), "after_bytes": int(after[col])}
+                for col, old, new in changed
+            ],
+        }
 
     # Заменяет недопустимые символы для файловых имён
     @staticmethod
@@ -112,67 +479,128 @@ class DataAnalyzer:
 
         return sanitized
 
-    def build_correlation_matrix(self, output_folder: str) -> bool:
-        if self.data is None:
+    def build_correlation_matrix(self, output_folder: str, conditional_formatting: Optional[bool] = None) -> bool:
+        if not self.has_data():
             return False
 
         numeric_cols = self.get_numeric_columns()
         if len(numeric_cols) < 2:
             return False
 
-        corr_matrix = self.data[numeric_cols].corr()
+        corr_matrix = self.correlation_matrix(numeric_cols)
 
-        color_map = DataAnalyzer._CORRELATION_COLOR_MAP
+        output_path = os.path.join(output_folder, f"correlation_table_{datetime.now().strftime('%Y%m%d_%H%M%S')}.xlsx")
 
-        def get_correlation_color(r):
+        if conditional_formatting is None:
+            conditional_formatting = corr_matrix.size > self._CONDITIONAL_FORMAT_CELLS
 
-            for key, hex_color in color_map.items():
-                key_type, min_val, max_val = key
+        self._write_correlation_workbook(corr_matrix, output_path, conditional_formatting)
 
-                if key_type == "point": # точки 1, 0, -1
-                    if r == min_val:
-                        return hex_color
+        return True
 
+    @classmethod
+    def correlation_color_buckets(cls, values: np.ndarray) -> Tuple[np.ndarray, List[str]]:
+        """
+        Раскладывает всю матрицу по интервалам _CORRELATION_COLOR_MAP за несколько векторных проходов.
+        Возвращает матрицу номеров цветов и палитру; последний цвет палитры "000000" - для NaN
+        """
+        palette = list(cls._CORRELATION_COLOR_MAP.values()) + ["000000"]  # "000000" не должно случиться
+        buckets = np.full(values.shape, len(palette) - 1, dtype=np.int16)
+        unassigned = np.ones(values.shape, dtype=bool)
+
+        with np.errstate(invalid="ignore"):
+            # Правила проверяются в порядке словаря, как и раньше: сначала точки 1, 0, -1
+            for bucket, (key_type, min_val, max_val) in enumerate(cls._CORRELATION_COLOR_MAP):
+                if key_type == "point":
+                    mask = values == min_val
                 elif key_type == "left_parenthesis_right_bracket":  # (min, max]
-                    if min_val < r <= max_val:
-                        return hex_color
-
-                elif key_type == "left_bracket_right_parenthesis":  # [min, max)
-                    if min_val <= r < max_val:
-                        return hex_color
-
-            return "000000"  # не должно случиться
+                    mask = (values > min_val) & (values <= max_val)
+                else:  # "left_bracket_right_parenthesis", [min, max)
+                    mask = (values >= min_val) & (values < max_val)
 
-        colors_grid = []
-        for row in corr_matrix.values:
-            row_colors = []
-            for val in row:
-                hex_color = get_correlation_color(val)
-                row_colors.append(hex_color)
-            colors_grid.append(row_colors)
+                mask &= unassigned
+                buckets[mask] = bucket
+                unassigned &= ~mask
 
-        output_path = os.path.join(output_folder, f"correlation_table_{datetime.now().strftime('%Y%m%d_%H%M%S')}.xlsx")
-        with pd.ExcelWriter(output_path, engine='openpyxl') as writer:
-            corr_matrix.to_excel(writer, sheet_name='Корреляция')
-
-            worksheet = writer.sheets['Корреляция']
-
-            for row_idx, row_colors in enumerate(colors_grid):
-                for col_idx, hex_color in enumerate(row_colors):
-                    cell_row = row_idx + 2  
-                    cell_col = col_idx + 2
-                    fill = openpyxl.styles.PatternFill(
-                        start_color=hex_color,
-                        end_color=hex_color,
-                        fill_type="solid"
-                    )
-                    worksheet.cell(row=cell_row, column=cell_col).fill = fill   
+        return buckets, palette
 
-        return True
+    # Формула условного форматирования Excel для одного интервала, относительно левой верхней ячейки
+    @staticmethod
+    def _correlation_rule_formula(key: tuple, cell: str) -> str:
+        key_type, min_val, max_val = key
+        if key_type == "point":
+            return f"AND(ISNUMBER({cell}),{cell}={min_val})"
+        if key_type == "left_parenthesis_right_bracket":
+            return f"AND(ISNUMBER({cell}),{cell}>{min_val},{cell}<={max_val})"
+        return f"AND(ISNUMBER({cell}),{cell}>={min_val},{cell}<{max_val})"
+
+    def _write_correlation_workbook(self, corr_matrix: pd.DataFrame, output_path: str,
+                                    conditional_formatting: bool) -> None:
+        """
+        Записывает матрицу потоково (write-only книга openpyxl), строка за строкой. Заливки и стили
+        заголовков общие на весь лист. В режиме conditional_formatting ячейки пишутся без стилей,
+        а окраску задают правила Excel по одному на интервал
+        """
+        workbook = openpyxl.Workbook(write_only=True)
+        worksheet = workbook.create_sheet('Корреляция')
+
+        # Оформление заголовков как у DataFrame.to_excel
+        header_font = openpyxl.styles.Font(bold=True)
+        thin = openpyxl.styles.Side(style="thin")
+        header_border = openpyxl.styles.Border(left=thin, right=thin, top=thin, bottom=thin)
+        header_alignment = openpyxl.styles.Alignment(horizontal="center", vertical="top")
+
+        def header_cell(value):
+            cell = openpyxl.cell.WriteOnlyCell(worksheet, value=value)
+            cell.font = header_font
+            cell.border = header_border
+            cell.alignment = header_alignment
+            return cell
+
+        worksheet.append([None] + [header_cell(str(col)) for col in corr_matrix.columns])
+
+        values = corr_matrix.to_numpy()
+        labels = [str(idx) for idx in corr_matrix.index]
+
+        if conditional_formatting:
+            for label, row in zip(labels, values):
+                worksheet.append([header_cell(label)] + [None if v != v else v for v in row.tolist()])  # NaN -> пустая
+
+            last_cell = f"{openpyxl.utils.get_column_letter(values.shape[1] + 1)}{values.shape[0] + 1}"
+            for key, hex_color in self._CORRELATION_COLOR_MAP.items():
+                fill = openpyxl.styles.PatternFill(start_color=hex_color, end_color=hex_color, fill_type="solid")
+                rule = openpyxl.formatting.rule.FormulaRule(
+                    formula=[self._correlation_rule_formula(key, "B2")], fill=fill, stopIfTrue=True)
+                worksheet.conditional_formatting.add(f"B2:{last_cell}", rule)
+        else:
+            buckets, palette = self.correlation_color_buckets(values)
+            fills = [
+                openpyxl.styles.PatternFill(start_color=hex_color, end_color=hex_color, fill_type="solid")
+                for hex_color in palette
+            ]
+
+            for label, row, row_buckets in zip(labels, values, buckets):
+                cells = [header_cell(label)]
+                for v, bucket in zip(row.tolist(), row_buckets.tolist()):
+                    cell = openpyxl.cell.WriteOnlyCell(worksheet, value=None if v != v else v)  # NaN -> пустая
+                    cell.fill = fills[bucket]
+                    cells.append(cell)
+                worksheet.append(cells)
+
+        workbook.save(output_path)
  
 
-    def build_scatter_charts(self, output_folder: str, threshold: float = 0.6) -> bool:
+    def build_scatter_charts(self, output_folder: str, threshold: float = 0.6, density_rows: int = 100_000,
+                             max_charts: Optional[int] = None, export: Optional[ExportOptions] = None) -> bool:
+        """
+        Scatter-графики для пар с |cor| >= threshold, не больше max_charts самых сильных пар.
+        Пары ищутся блочным перемножением стандартизованных столбцов (find_correlated_pairs) без полной
+        матрицы корреляции, точное значение cor считается только для найденных пар.
+        Если строк больше density_rows, вместо точек строится карта плотности: точки заранее сводятся
+        в сетку _DENSITY_GRID, и время отрисовки и размер PNG не растут с числом строк
+        """
 
+        # Точкам нужны сами строки, в потоковом режиме их нет
         if self.data is None:
             return False
 
@@ -180,27 +608,21 @@ class DataAnalyzer:
         if len(numeric_cols) < 2:
             return False
 
-        corr_matrix = self.data[numeric_cols].corr()
         scatter_dir = os.path.join(output_folder, f"scatter_plot_{datetime.now().strftime('%Y%m%d_%H%M%S')}")
         os.makedirs(scatter_dir, exist_ok=True)
 
+        def scatter_jobs(pairs):
+            for x_col, y_col, corr in pairs:
+                yield self._scatter_job(scatter_dir, x_col, y_col, corr, density_rows)
 
         try:
             with self.check_cancel():
-                
-                for i in range(len(numeric_cols)):
-                    for j in range(i + 1, len(numeric_cols)):                        
-                        if abs(corr_matrix.iloc[i, j]) >= threshold:  # модуль корреляции
-                            x_col, y_col = numeric_cols[i], numeric_cols[j]
-                            plt.figure(figsize=(8, 6))
-                            plt.scatter(self.data[x_col], self.data[y_col], alpha=0.6, color='blue')
-                            plt.title(f'Scatter Plot: {x_col} vs {y_col} (cor={corr_matrix.iloc[i, j]:.2f})')
-                            plt.xlabel(x_col)
-                            plt.ylabel(y_col)
-                            plt.grid(True, linestyle='--', alpha=0.7)
-                            save_path = os.path.join(scatter_dir, f"{self.sanitize_filename(x_col)}_vs_{self.sanitize_filename(y_col)}.png")
-                            plt.savefig(save_path, dpi=150, bbox_inches='tight')
-                            plt.close()
+                # Точные cor для кандидатов заранее, чтобы знать число графиков для индикатора хода
+                pairs = self._scatter_pairs(numeric_cols, threshold, max_charts)
+                manifest = self.render_jobs(scatter_jobs(pairs), "scatter", total=len(pairs), export=export)
+                write_manifest(scatter_dir, manifest, {"threshold": threshold, "density_rows": density_rows,
+                                                       "max_charts": max_charts,
+                                                       "export": (export or ExportOptions()).resolved()._asdict()})
        
         except KeyboardInterrupt:
             # print("Процесс прерван пользователем.")
@@ -211,25 +633,65 @@ class DataAnalyzer:
         
         return True
 
-    def build_pie_charts(self, output_folder: str) -> bool:
-
-        if self.data is None:
+    def _scatter_pairs(self, numeric_cols: List[str], threshold: float,
+                       max_charts: Optional[int]) -> List[Tuple[str, str, float]]:
+        candidates = self.stats.get(
+            ("correlated_pairs", tuple(numeric_cols), threshold, max_charts),
+            lambda: find_correlated_pairs(self.data[numeric_cols].to_numpy(dtype=np.float64, na_value=np.nan),
+                                          threshold, top_k=max_charts))
+
+        pairs = []
+        for i, j in self.guarded_iter(candidates, "Scatter-графики прерваны"):
+            x_col, y_col = numeric_cols[i], numeric_cols[j]
+            corr = self.data[x_col].corr(self.data[y_col])
+            if abs(corr) >= threshold:  # модуль корреляции
+                pairs.append((x_col, y_col, corr))
+        return pairs
+
+    def _scatter_job(self, chart_dir: str, x_col: str, y_col: str, corr: float, density_rows: int) -> ChartJob:
+        save_path = os.path.join(chart_dir, f"{self.sanitize_filename(x_col)}_vs_{self.sanitize_filename(y_col)}.png")
+        if len(self.data) > density_rows:
+            return ChartJob("density", save_path, self._density_params(x_col, y_col, corr))
+        return ChartJob("scatter", save_path, {
+            "x": self.data[x_col].to_numpy(),
+            "y": self.data[y_col].to_numpy(),
+            "x_col": x_col,
+            "y_col": y_col,
+            "corr": corr,
+        })
+
+    # Сводит пары точек в двумерную сетку частот; в задание попадает только сетка
+    def _density_params(self, x_col: str, y_col: str, corr: float) -> dict:
+        x = self.data[x_col].to_numpy(dtype=np.float64, na_value=np.nan)
+        y = self.data[y_col].to_numpy(dtype=np.float64, na_value=np.nan)
+        valid = ~(np.isnan(x) | np.isnan(y))
+        counts, x_edges, y_edges = np.histogram2d(x[valid], y[valid], bins=self._DENSITY_GRID)
+        return {
+            "counts": counts,
+            "x_edges": x_edges,
+            "y_edges": y_edges,
+            "x_col": x_col,
+            "y_col": y_col,
+            "corr": corr,
+        }
+
+    def build_pie_charts(self, output_folder: str, export: Optional[ExportOptions] = None) -> bool:
+
+        if not self.has_data():
             return False
 
         cat_cols = self.get_categorical_columns()
         pie_dir = os.path.join(output_folder, f"pie_chart_{datetime.now().strftime('%Y%m%d_%H%M%S')}")
         os.makedirs(pie_dir, exist_ok=True)
+
+        def pie_jobs():
+            for col in self.guarded_iter(cat_cols, "Круговые диаграммы прерваны"):
+                yield self._pie_job(pie_dir, col)
         
         try:
             with self.check_cancel():
-                for col in self.guarded_iter(cat_cols, "Круговые диаграммы прерваны"):
-                    counts = self.data[col].value_counts()
-                    plt.figure(figsize=(8, 6))
-                    plt.pie(counts.values, labels=counts.index, autopct='%1.1f%%', startangle=90)
-                    plt.title(f'Распределение: {col}')
-                    save_path = os.path.join(pie_dir, f"{self.sanitize_filename(col)}.png")
-                    plt.savefig(save_path, dpi=150, bbox_inches='tight')
-                    plt.close()
+                write_manifest(pie_dir, self.render_jobs(pie_jobs(), "pie", total=len(cat_cols), export=export),
+                               {"export": (export or ExportOptions()).resolved()._asdict()})
 
         except KeyboardInterrupt:
             # print("Процесс прерван пользователем.")
@@ -239,10 +701,20 @@ class DataAnalyzer:
             return False
 
         return True
+
+    def _pie_job(self, chart_dir: str, col: str) -> ChartJob:
+        counts = self.value_counts(col)
+        save_path = os.path.join(chart_dir, f"{self.sanitize_filename(col)}.png")
+        return ChartJob("pie", save_path, {
+            "values": counts.values,
+            "labels": [str(label) for label in counts.index],
+            "col": col,
+        })
     
-    def build_histogram_charts(self, output_folder: str, bins: int = 15) -> bool:
+    def build_histogram_charts(self, output_folder: str, bins: int = 15,
+                               export: Optional[ExportOptions] = None) -> bool:
         
-        if self.data is None:
+        if not self.has_data():
             return False
 
         numeric_cols = self.get_numeric_columns()
@@ -255,78 +727,25 @@ class DataAnalyzer:
         hist_dir = os.path.join(output_folder, f"histogram_by_category_{datetime.now().strftime('%Y%m%d_%H%M%S')}")
         os.makedirs(hist_dir, exist_ok=True)
 
-        colors = plt.cm.Set1.colors
+        def histogram_jobs():
+            # Гистограммы числовых столбцов разделенные по категориальным
+            # Общие границы корзин на числовой столбец: столбики разных категорий совпадают
+            for num_col in self.guarded_iter(numeric_cols, "Гистограммы прерваны"):
+                for group_col in self.guarded_iter(cat_cols, "Гистограммы прерваны"):
+                    yield self._histogram_job(hist_dir, num_col, group_col, bins)
+
+            # Столбчатые диаграммы: распределение одной категориальной переменной по другой
+            for target_col in self.guarded_iter(cat_cols, "Диаграммы прерваны"):
+                for group_col in self.guarded_iter(cat_cols, "Диаграммы прерваны"):
+                    if target_col == group_col:
+                        continue
+                    yield self._bar_job(hist_dir, target_col, group_col)
         
         try:
             with self.check_cancel():
-        
-                # Гистограммы числовых столбцов разделенные по категориальным
-                for num_col in self.guarded_iter(numeric_cols, "Гистограммы прерваны"):
-                    for group_col in self.guarded_iter(cat_cols, "Гистограммы прерваны"):
-                
-                        plt.figure(figsize=(10, 6))
-                        categories = self.data[group_col].dropna().unique()
-
-                        for i, cat_val in enumerate(categories):
-                            subset = self.data[(self.data[group_col] == cat_val) & (self.data[num_col].notna())][num_col]
-                            if len(subset) == 0:
-                                continue
-                            plt.hist(
-                                subset,
-                                alpha=0.7,
-                                label=str(cat_val),
-                                color=colors[i % len(colors)],
-                                edgecolor='black',
-                                bins=bins
-                            )
-
-                        plt.xlabel(num_col)
-                        plt.ylabel('Частота')
-                        plt.title(f'Распределение {num_col} по {group_col}')
-                        plt.legend(title=group_col, bbox_to_anchor=(1.05, 1), loc='upper left')
-                        plt.grid(True, linestyle='--', alpha=0.6)
-                        plt.tight_layout()
-
-                        safe_num = self.sanitize_filename(num_col)
-                        safe_group = self.sanitize_filename(group_col)
-                        save_path = os.path.join(hist_dir, f"{safe_num}_by_{safe_group}.png")
-                        plt.savefig(save_path, dpi=150, bbox_inches='tight')
-                        plt.close()
-                        # print(f" Сохранена гистограмма: {save_path}")
-
-                # Столбчатые диаграммы: распределение одной категориальной переменной по другой
-                for target_col in self.guarded_iter(cat_cols, "Диаграммы прерваны"):
-                    for group_col in self.guarded_iter(cat_cols, "Диаграммы прерваны"):
-                        if target_col == group_col:
-                            continue
-
-                        cross_tab = pd.crosstab(self.data[target_col], self.data[group_col])
-                        cross_tab_normalized = cross_tab.div(cross_tab.sum(axis=1), axis=0)
-
-                        x = range(len(cross_tab.index))
-                        width = 0.8 / len(cross_tab.columns)
-
-                        plt.figure(figsize=(10, 6))
-
-                        for i, group_val in enumerate(cross_tab.columns):
-                            values = cross_tab_normalized[group_val].values
-                            positions = [x_i + i * width for x_i in x]
-                            plt.bar(positions, values, width=width, label=str(group_val),
-                                    color=colors[i % len(colors)], edgecolor='black', alpha=0.7)
-
-                        plt.xticks([x_i + width * (len(cross_tab.columns)-1)/2 for x_i in x], cross_tab.index, rotation=45, ha='right')
-                        plt.ylabel('Доля')
-                        plt.title(f'Распределение {target_col} по {group_col}')
-                        plt.legend(title=group_col, bbox_to_anchor=(1.05, 1), loc='upper left')
-                        plt.grid(axis='y', linestyle='--', alpha=0.6)
-                        plt.tight_layout()
-
-                        safe_target = self.sanitize_filename(target_col)
-                        safe_group = self.sanitize_filename(group_col)
-                        save_path = os.path.join(hist_dir, f"{safe_target}_by_{safe_group}.png")
-                        plt.savefig(save_path, dpi=150, bbox_inches='tight')
-                        plt.close()
-                        # print(f" Сохранена столбчатая диаграмма: {save_path}")
+                total = len(numeric_cols) * len(cat_cols) + len(cat_cols) * (len(cat_cols) - 1)
+                manifest = self.render_jobs(histogram_jobs(), "histogram", total=total, export=export)
+                write_manifest(hist_dir, manifest, {"bins": bins, "export": (export or ExportOptions()).resolved()._asdict()})
 
         except KeyboardInterrupt:
             # print("Процесс прерван пользователем.")
@@ -336,14 +755,315 @@ class DataAnalyzer:
             return False
         
         return True
-    
 
-    def analyze_dataset(self, output_folder: str) -> bool:
-        if self.data is None:
+    def _histogram_job(self, chart_dir: str, num_col: str, group_col: str, bins: int) -> ChartJob:
+        counts, edges, categories = self.histogram_counts(num_col, group_col, bins)
+
+        safe_num = self.sanitize_filename(num_col)
+        safe_group = self.sanitize_filename(group_col)
+        save_path = os.path.join(chart_dir, f"{safe_num}_by_{safe_group}.png")
+        return ChartJob("histogram", save_path, {
+            "counts": counts,
+            "edges": edges,
+            "labels": [str(cat_val) for cat_val in categories],
+            "num_col": num_col,
+            "group_col": group_col,
+        })
+
+    def _bar_job(self, chart_dir: str, target_col: str, group_col: str) -> ChartJob:
+        cross_tab = self.crosstab(target_col, group_col)
+        counts = cross_tab.to_numpy()
+
+        safe_target = self.sanitize_filename(target_col)
+        safe_group = self.sanitize_filename(group_col)
+        save_path = os.path.join(chart_dir, f"{safe_target}_by_{safe_group}.png")
+        return ChartJob("bar", save_path, {
+            "index": [str(val) for val in cross_tab.index],
+            "columns": [str(val) for val in cross_tab.columns],
+            "proportions": counts / counts.sum(axis=1, keepdims=True),
+            "target_col": target_col,
+            "group_col": group_col,
+        })
+
+    def chart_previews(self, graphs: Iterable[str], threshold: float = 0.6, max_charts: Optional[int] = None,
+                       bins: int = 15, density_rows: int = 100_000) -> List[Tuple[str, Callable[[], ChartJob]]]:
+        """
+        Список графиков для галереи без отрисовки: (подпись, функция, создающая ChartJob).
+        Данные графика считаются только при вызове функции, т.е. когда его миниатюра видна или его открыли.
+        save_path в заданиях - только имя файла, папку задаёт тот, кто сохраняет.
+        Виды графиков те же, что у build_*_charts: scatter, pie, histogram
+        """
+        previews = []
+        numeric_cols = self.get_numeric_columns()
+        cat_cols = self.get_categorical_columns()
+
+        with self.check_cancel():
+            if "scatter" in graphs and self.data is not None and len(numeric_cols) >= 2:
+                for x_col, y_col, corr in self._scatter_pairs(numeric_cols, threshold, max_charts):
+                    previews.append((f"{x_col} vs {y_col} (cor={corr:.2f})",
+                                     lambda x=x_col, y=y_col, c=corr: self._scatter_job("", x, y, c, density_rows)))
+
+            if "pie" in graphs:
+                for col in cat_cols:
+                    previews.append((f"Распределение: {col}", lambda col=col: self._pie_job("", col)))
+
+            if "histogram" in graphs:
+                for num_col in numeric_cols:
+                    for group_col in cat_cols:
+                        previews.append((f"{num_col} по {group_col}",
+                                         lambda n=num_col, g=group_col: self._histogram_job("", n, g, bins)))
+                for target_col in cat_cols:
+                    for group_col in cat_cols:
+                        if target_col != group_col:
+                            previews.append((f"{target_col} по {group_col}",
+                                             lambda t=target_col, g=group_col: self._bar_job("", t, g)))
+
+        note = self.sample_note()
+        if note:
+            previews = [(caption, lambda factory=factory: factory()._replace(note=note))
+                        for caption, factory in previews]
+        return previews
+
+    def build_html_report(self, output_folder: str, graphs: Iterable[str] = ("scatter", "pie", "histogram"),
+                          threshold: float = 0.6, max_charts: Optional[int] = None, bins: int = 15,
+                          max_points: int = 2000, full: Optional["DataAnalyzer"] = None) -> bool:
+        """
+        Один HTML-файл вместо папок с PNG. В него один раз записываются уже сведённые данные: матрица
+        корреляции с окраской _CORRELATION_COLOR_MAP, частоты гистограмм, таблицы сопряжённости
+        (одна на пару столбцов, второе направление - транспонирование) и не больше max_points строк
+        для scatter-графиков (одна выборка на все пары). Графики рисует браузер, когда их прокручивают в вид.
+        Виды графиков те же, что у build_*_charts. Матрица корреляции строится только по всей таблице:
+        если загружена выборка, она берётся из full (снимок той же таблицы без выборки), а без него
+        в отчёт не попадает
+        """
+        if not self.has_data():
             return False
 
-        df = self.data.copy()
-        df.columns = df.columns.astype(str)
+        exact = self if self.sample_info is None else full
+        numeric_cols = self.get_numeric_columns()
+        cat_cols = self.get_categorical_columns()
+        report = {
+            "file": os.path.basename(self.source_path),
+            "rows": len(self.data) if self.data is not None else self.aggregates.n_rows,
+            "note": self.sample_note(),
+            "created": datetime.now().strftime('%Y-%m-%d %H:%M:%S'),
+        }
+
+        try:
+            with self.check_cancel():
+                exact_cols = exact.get_numeric_columns() if exact is not None else []
+                if len(exact_cols) >= 2:
+                    corr_matrix = exact.correlation_matrix(exact_cols).to_numpy()
+                    buckets, palette = self.correlation_color_buckets(corr_matrix)
+                    report["correlation"] = {
+                        "columns": [str(col) for col in exact_cols],
+                        "values": [numbers(row, 4) for row in corr_matrix],
+                        "colors": buckets.tolist(),
+                        "palette": [f"#{hex_color}" for hex_color in palette],
+                    }
+
+                if "scatter" in graphs and self.data is not None and len(numeric_cols) >= 2:
+                    pairs = self._scatter_pairs(numeric_cols, threshold, max_charts)
+                    report["scatter"] = [[str(x_col), str(y_col), float(corr)] for x_col, y_col, corr in pairs]
+                    report["points"] = self._report_points(pairs, max_points)
+
+                if "pie" in graphs:
+                    report["pie"] = []
+                    for col in self.guarded_iter(cat_cols, "Отчёт прерван"):
+                        value_counts = self.value_counts(col)
+                        report["pie"].append({"col": str(col), "labels": [str(label) for label in value_counts.index],
+                                              "counts": counts(value_counts.to_numpy())})
+
+                if "histogram" in graphs and cat_cols:
+                    report.update(histograms=[], edges={}, categories={}, bars=[])
+                    for num_col in self.guarded_iter(numeric_cols, "Отчёт прерван"):
+                        for group_col in cat_cols:
+                            hist_counts, edges, categories = self.histogram_counts(num_col, group_col, bins)
+                            report["edges"][str(num_col)] = numbers(edges)
+                            report["categories"][str(group_col)] = [str(cat_val) for cat_val in categories]
+                            report["histograms"].append({"num_col": str(num_col), "group_col": str(group_col),
+                                                         "counts": counts(hist_counts)})
+
+                    for i, target_col in enumerate(self.guarded_iter(cat_cols, "Отчёт прерван")):
+                        for group_col in cat_cols[i + 1:]:
+                            cross_tab = self.crosstab(target_col, group_col)
+                            report["bars"].append({
+                                "rows": str(target_col),
+                                "cols": str(group_col),
+                                "index": [str(val) for val in cross_tab.index],
+                                "columns": [str(val) for val in cross_tab.columns],
+                                "counts": counts(cross_tab.to_numpy()),
+                            })
+
+                path = os.path.join(output_folder, f"report_{datetime.now().strftime('%Y%m%d_%H%M%S')}.html")
+                write_html_report(path, f"Отчёт: {report['file']}", report)
+
+        except KeyboardInterrupt:
+            # print("Процесс прерван пользователем.")
+            return False
+        except Exception as e:
+            # print(f"Ошибка при построении отчёта: {e}")
+            return False
+
+        return True
+
+    # Значения столбцов scatter-пар в одних и тех же max_points случайных строках
+    def _report_points(self, pairs: List[Tuple[str, str, float]], max_points: int) -> dict:
+        columns = list(dict.fromkeys(col for x_col, y_col, _ in pairs for col in (x_col, y_col)))
+        rows = len(self.data)
+        picks = np.sort(np.random.default_rng(0).choice(rows, size=max_points, replace=False)) \
+            if rows > max_points else np.arange(rows)
+        return {
+            "rows": rows,
+            "size": len(picks),
+            "columns": {str(col): numbers(self.data[col].to_numpy(dtype=np.float64, na_value=np.nan)[picks])
+                        for col in columns},
+        }
+
+    def render_jobs(self, jobs: Iterable[ChartJob], stage: str = "charts", total: Optional[int] = None,
+                    export: Optional[ExportOptions] = None) -> List[dict]:
+        """
+        Отрисовывает задания по очереди (workers <= 1 или меньше _POOL_MIN_JOBS графиков - запуск процессов
+        дороже их отрисовки) или в пуле процессов, общем для всех построений этого экземпляра.
+        Имена файлов задаются в самих заданиях, поэтому результат не зависит от порядка завершения;
+        расширение файла заменяется на формат из export.
+        При export.bundle все графики пишутся страницами одного PDF <stage>.pdf в папке графиков -
+        последовательно в этом процессе и без output_cache, т.к. PDF пишется одним потоком.
+        Флаг отмены проверяется перед каждым заданием, поэтому СТОП срабатывает за время одного графика.
+        Графики, уже нарисованные с теми же данными и параметрами, берутся из output_cache.
+        О каждом графике сообщается в progress_callback (см. _emit_progress), total - ожидаемое число графиков.
+        Возвращает записи для манифеста: файл, вид, ключ, reused/rendered и время отрисовки/сохранения
+        """
+        export = (export or ExportOptions()).resolved()
+        output_cache = None if export.bundle else self.output_cache
+        note = self.sample_note()
+        bundle = None
+        manifest = []
+        finished_count = 0
+        started = time.perf_counter()
+        self._emit_progress("stage_start", stage, total=total)
+
+        def finished(entry, timings=None):
+            nonlocal finished_count
+            finished_count += 1
+            entry.update(timings or {"draw_seconds": 0.0, "save_seconds": 0.0})
+            elapsed = time.perf_counter() - started
+            # Оценка по среднему времени уже готовых графиков (включая взятые из кэша)
+            eta = elapsed / finished_count * max(total - finished_count, 0) if total else None
+            self._emit_progress("chart_finish", stage, chart=entry["chart"], status=entry["status"],
+                                draw_seconds=entry["draw_seconds"], save_seconds=entry["save_seconds"],
+                                done=finished_count, total=total, elapsed=elapsed, eta=eta)
+
+        def cached_jobs():
+            for job in jobs:
+                if self.is_canceled:
+                    raise KeyboardInterrupt("Отмена пользователем")
+                job = job._replace(save_path=f"{os.path.splitext(job.save_path)[0]}.{export.format}",
+                                   export=export, note=note)
+                chart = os.path.basename(job.save_path)
+                entry = {"file": chart, "chart": chart, "kind": job.kind, "key": None, "status": "rendered"}
+                if export.bundle:
+                    entry["file"] = f"{stage}.pdf"
+                    entry["page"] = len(manifest) + 1
+                manifest.append(entry)
+                self._emit_progress("chart_start", stage, chart=chart, done=finished_count, total=total)
+                if output_cache is not None:
+                    entry["key"] = output_cache.job_key(job)
+                    if output_cache.fetch(entry["key"], job.save_path):
+                        entry["status"] = "reused"
+                        finished(entry)
+                        continue
+                yield job, entry
+
+        def rendered(job, entry, timings):
+            if entry["key"] is not None:
+                output_cache.store(entry["key"], job.save_path)
+            finished(entry, timings)
+
+        if export.bundle:
+            try:
+                for job, entry in cached_jobs():
+                    if bundle is None:
+                        bundle = PdfPages(os.path.join(os.path.dirname(job.save_path), entry["file"]))
+                    rendered(job, entry, render_page(job, bundle))
+            finally:
+                # Уже записанные страницы остаются читаемым PDF и при отмене
+                if bundle is not None:
+                    bundle.close()
+        elif self.workers <= 1 or total is not None and total < self._POOL_MIN_JOBS:
+            for job, entry in cached_jobs():
+                rendered(job, entry, render_job(job))
+        else:
+            executor = self._render_executor()
+            pending = {}
+            try:
+                for job, entry in cached_jobs():
+                    # Ограничиваем число заданий в очереди, чтобы не держать в памяти данные всех графиков сразу
+                    if len(pending) >= self.workers * 2:
+                        done, _ = wait(pending, return_when=FIRST_COMPLETED)
+                        for future in done:
+                            rendered(*pending.pop(future), future.result())
+
+                    pending[executor.submit(render_job, job)] = (job, entry)
+
+                while pending:
+                    if self.is_canceled:
+                        raise KeyboardInterrupt("Отмена пользователем")
+                    done, _ = wait(pending, timeout=0.2, return_when=FIRST_COMPLETED)
+                    for future in done:
+                        rendered(*pending.pop(future), future.result())
+            except BrokenProcessPool:
+                self.shutdown_render_pool()
+                raise
+            finally:
+                # Пул остаётся для следующих построений, отменяются только ещё не начатые задания
+                for future in pending:
+                    future.cancel()
+
+        self._emit_progress("stage_finish", stage, done=len(manifest), total=total,
+                            elapsed=time.perf_counter() - started)
+        return manifest
+
+    def _render_executor(self) -> ProcessPoolExecutor:
+        if self._render_pool is not None and self._render_pool_workers != self.workers:
+            self.shutdown_render_pool()
+        if self._render_pool is None:
+            self._render_pool = ProcessPoolExecutor(max_workers=self.workers,
+                                                    mp_context=multiprocessing.get_context("spawn"))
+            self._render_pool_workers = self.workers
+        return self._render_pool
+
+    def shutdown_render_pool(self) -> None:
+        """
+        Останавливает процессы отрисовки; следующее построение в пуле запустит их заново
+        """
+        if self._render_pool is not None:
+            self._render_pool.shutdown(wait=not self.is_canceled, cancel_futures=True)
+            self._render_pool = None
+
+    def _emit_progress(self, event: str, stage: str, **fields) -> None:
+        """
+        Событие хода работы для progress_callback: словарь с event (stage_start, chart_start, chart_finish,
+        stage_finish), stage (scatter, pie, histogram) и полями события - chart, status, done, total,
+        draw_seconds/save_seconds, elapsed и eta в секундах (None, если число графиков неизвестно).
+        Вызывается из потока, в котором идёт построение
+        """
+        if self.progress_callback is not None:
+            self.progress_callback({"event": event, "stage": stage, **fields})
+
+
+    def analyze_dataset(self, output_folder: str, approximate: bool = False) -> bool:
+        """
+        Сводка по столбцам без копирования таблицы. Для каждого столбца один проход value_counts
+        (у категориальных общий с круговыми диаграммами, у числовых временный) даёт число уникальных,
+        Non-Null и моду.
+        approximate=True - для огромных таблиц: проход блоками по _APPROX_CHUNK_ROWS строк,
+        уникальные оцениваются KMV-скетчем, медиана и мода - по равномерной выборке.
+        Приближённый анализ работает и с потоковой загрузкой: категориальные столбцы берутся из точных
+        агрегатов, числовые читаются из CSV блоками, в памяти только скетчи
+        """
+        if self.data is None and not (approximate and self.aggregates is not None):
+            return False
 
         COLUMNS = [
             'Column', 'Type', 'Unique Values', 'Non-Null',
@@ -351,35 +1071,23 @@ class DataAnalyzer:
         ]
 
         summary = []
-        for col in df.columns:
-            dtype = str(df[col].dtype)
-            values = df[col].dropna()
-            unique_count = len(values.unique())
-            non_null = len(values)
-
+        if self.data is None:
+            columns = self._summarize_streaming_approx()
+        else:
+            columns = (
+                (col, str(self.data[col].dtype),
+                 self._summarize_column_approx(self.data[col]) if approximate
+                 else self._summarize_column(col, self.data[col]))
+                for col in self.data.columns
+            )
+
+        for col, dtype, stats in columns:
             row = {col_name: "N/A" for col_name in COLUMNS}
             row.update({
-                'Column': col,
+                'Column': str(col),
                 'Type': dtype,
-                'Unique Values': unique_count,
-                'Non-Null': non_null,
             })
-
-            if pd.api.types.is_numeric_dtype(df[col]):
-                row.update({
-                    'Min': values.min(),
-                    'Max': values.max(),
-                    'Mean': round(values.mean(), 4),
-                    'Median': round(values.median(), 4),
-                    'Mode': values.mode().iloc[0] if len(values.mode()) > 0 else "N/A",
-                    'Examples': str(values.sample(n=5, random_state=None).tolist())
-                })
-            else:
-                row.update({
-                    'Mode': values.value_counts().idxmax() if not values.empty else "N/A",
-                    'Examples': str(values.unique().tolist())
-                })
-
+            row.update(stats)
             summary.append(row)
 
         path = os.path.join(output_folder, f"dataset_analysis_{datetime.now().strftime('%Y%m%d_%H%M%S')}.xlsx")
@@ -389,6 +1097,98 @@ class DataAnalyzer:
 
         return True
 
+    # Мода по уже посчитанным частотам: для чисел - наименьшее из самых частых, как Series.mode()
+    @staticmethod
+    def _mode_from_counts(counts: pd.Series, is_numeric: bool):
+        if counts.empty:
+            return "N/A"
+        if is_numeric:
+            return counts.index[counts.to_numpy() == counts.iloc[0]].min()
+        return counts.idxmax()
+
+    def _summarize_counts(self, counts: pd.Series, is_numeric: bool) -> dict:
+        counts = counts[counts > 0]  # у категориальных value_counts включает неиспользуемые категории
+        stats = {
+            'Unique Values': len(counts),
+            'Non-Null': int(counts.sum()),
+            'Mode': self._mode_from_counts(counts, is_numeric),
+        }
+        if not is_numeric:
+            stats['Examples'] = str(counts.index.tolist())
+        return stats
+
+    def _summarize_column(self, col, series: pd.Series) -> dict:
+        is_numeric = pd.api.types.is_numeric_dtype(series)
+        stats = self._summarize_counts(self.value_counts(col), is_numeric)
+
+        if is_numeric:
+            valid = np.flatnonzero(series.notna().to_numpy())
+            picks = np.random.default_rng().choice(valid, size=min(5, len(valid)), replace=False)
+            stats.update({
+                'Min': series.min(),
+                'Max': series.max(),
+                'Mean': round(series.mean(), 4),
+                'Median': round(series.median(), 4),
+                'Examples': str(series.iloc[picks].tolist()),
+            })
+
+        return stats
+
+    def _summarize_column_approx(self, series: pd.Series) -> dict:
+        sketch = ColumnSketch(pd.api.types.is_numeric_dtype(series), self._APPROX_SAMPLE_SIZE)
+        for start in range(0, len(series), self._APPROX_CHUNK_ROWS):
+            sketch.update(series.iloc[start:start + self._APPROX_CHUNK_ROWS])
+        return self._sketch_stats(sketch)
+
+    def _summarize_streaming_approx(self) -> List[Tuple[str, str, dict]]:
+        """
+        Приближённая сводка при потоковой загрузке: частоты категориальных столбцов уже есть в агрегатах,
+        числовые столбцы читаются из файла одним проходом блоками и попадают только в скетчи
+        """
+        numeric_cols = self.get_numeric_columns()
+        sample_size = min(self._APPROX_SAMPLE_SIZE,
+                          max(1_000, self._APPROX_STREAM_SAMPLE_VALUES // max(1, len(numeric_cols))))
+        sketches = {col: ColumnSketch(True, sample_size) for col in numeric_cols}
+        if numeric_cols:
+            for chunk in self.aggregates.read_columns(self.source_path, numeric_cols,
+                                                      is_canceled=lambda: self.is_canceled):
+                for col, sketch in sketches.items():
+                    sketch.update(pd.to_numeric(chunk[col], errors='coerce'))
+
+        summary = []
+        for col in self.aggregates.columns:
+            if col in sketches:
+                sketch = sketches[col]
+                summary.append((col, str(sketch.dtype), self._sketch_stats(sketch)))
+            elif col in self.aggregates.categorical_columns:
+                # Порядковые столбцы в агрегатах с подписями, как category в таблице в памяти
+                dtype = "category" if col in self.aggregates.ordinal_columns else "object"
+                summary.append((col, dtype, self._summarize_counts(self.value_counts(col), is_numeric=False)))
+            else:
+                summary.append((col, "N/A", {}))
+        return summary
+
+    def _sketch_stats(self, sketch: ColumnSketch) -> dict:
+        sample_counts = pd.Series(sketch.sample.values).value_counts()
+        stats = {
+            'Unique Values': sketch.distinct_count(),
+            'Non-Null': sketch.non_null,
+            'Mode': self._mode_from_counts(sample_counts, sketch.numeric),
+        }
+
+        if sketch.numeric and sketch.non_null > 0:
+            stats.update({
+                'Min': sketch.min,
+                'Max': sketch.max,
+                'Mean': round(sketch.sum / sketch.non_null, 4),
+                'Median': round(sketch.sample.quantile(0.5), 4),
+                'Examples': str(sketch.sample.values[:5].tolist()),
+            })
+        elif not sketch.numeric:
+            stats['Examples'] = str(sample_counts.index[:self._APPROX_EXAMPLES].tolist())
+
+        return stats
+
 
     @contextmanager
     def check_cancel(self):
@@ -404,7 +1204,8 @@ class DataAnalyzer:
         for item in iterable:
             if self.is_canceled:
                 # print(f"{msg}")
-                raise StopIteration()
+                # StopIteration внутри генератора превратилась бы в RuntimeError
+                raise KeyboardInterrupt(msg)
             yield item
 
     # Сбрасывает флаг отмены перед новым запуском
@@ -414,3 +1215,25 @@ class DataAnalyzer:
     # Устанавливает флаг отмены
     def cancel(self) -> None:
         self.is_canceled = True
+
+    def snapshot(self, fresh: bool = False) -> "DataAnalyzer":
+        """
+        Копия для отдельного задания: те же загруженные данные, агрегаты и кэши (после загрузки они
+        только читаются), но свои флаг отмены, число процессов и обработчик хода работы.
+        fresh=True - пустая копия с теми же настройками и дисковыми кэшами, для новой загрузки
+        """
+        clone = copy.copy(self)
+        clone.is_canceled = False
+        clone._render_pool = None
+        clone.progress_callback = None
+        clone.last_error = None
+        if fresh:
+            clone.data = None
+            clone.aggregates = None
+            clone._aggregates_lock = threading.Lock()
+            clone.source_path = None
+            clone.memory_report = None
+            clone.sample_info = None
+            clone.schema = None
+            clone.stats = StatsCache()
+        return clone
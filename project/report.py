@@ -0,0 +1,375 @@
+import html
+import json
+import math
+from typing import Iterable
+
+import matplotlib
+import numpy as np
+
+
+def numbers(values: Iterable, digits: int = 6) -> list:
+    """
+    Числа для JSON отчёта: digits значащих цифр (файл меньше, точность графиков та же), NaN и inf -> null
+    """
+    return [float(f"{v:.{digits}g}") if math.isfinite(v) else None
+            for v in np.asarray(values, dtype=np.float64).tolist()]
+
+
+def counts(values: np.ndarray) -> list:
+    return np.asarray(values).astype(np.int64).tolist()
+
+
+def write_html_report(path: str, title: str, report: dict) -> None:
+    """
+    Записывает отчёт одним HTML-файлом без внешних зависимостей: данные report - один JSON внутри
+    страницы, графики рисуются на canvas скриптом страницы, когда их карточка прокручивается в вид.
+    Цвета - те же, что у PNG-графиков (Set1 для категорий, цикл matplotlib для круговых)
+    """
+    report = dict(report, colors=[matplotlib.colors.to_hex(c) for c in matplotlib.colormaps["Set1"].colors],
+                  pie_colors=matplotlib.rcParams['axes.prop_cycle'].by_key()['color'])
+    # "</" внутри JSON закрыл бы тег script
+    data = json.dumps(report, ensure_ascii=False, allow_nan=False, separators=(",", ":")).replace("</", "<\\/")
+    page = _TEMPLATE.replace("__TITLE__", html.escape(title)).replace("__DATA__", data)
+    with open(path, "w", encoding="utf-8") as f:
+        f.write(page)
+
+
+_TEMPLATE = """<!DOCTYPE html>
+<html lang="ru">
+<head>
+<meta charset="utf-8">
+<title>__TITLE__</title>
+<style>
+body { font-family: Helvetica, Arial, sans-serif; margin: 0 24px 40px; color: #222; }
+h1 { font-size: 22px; margin: 20px 0 4px; }
+h2 { font-size: 18px; margin: 28px 0 10px; padding-bottom: 4px; border-bottom: 1px solid #ccc; }
+.meta { color: #666; font-size: 13px; }
+#filter { margin: 14px 0 0; padding: 4px 8px; width: 320px; }
+.grid { display: flex; flex-wrap: wrap; gap: 12px; }
+figure { margin: 0; padding: 6px; border: 1px solid #ddd; }
+figcaption { font-size: 12px; margin-bottom: 4px; }
+canvas { display: block; }
+#tip { position: fixed; display: none; pointer-events: none; background: #fff; border: 1px solid #999;
+       padding: 2px 6px; font-size: 12px; }
+</style>
+</head>
+<body>
+<h1>__TITLE__</h1>
+<div class="meta" id="meta"></div>
+<input id="filter" type="search" placeholder="Фильтр по имени столбца">
+<div id="sections"></div>
+<div id="tip"></div>
+<script type="application/json" id="report-data">__DATA__</script>
+<script>
+(function () {
+  "use strict";
+  var R = JSON.parse(document.getElementById("report-data").textContent);
+  var W = 460, H = 320, FONT = "11px Helvetica, Arial, sans-serif";
+  var cards = [];
+  var tip = document.getElementById("tip");
+
+  function el(tag, parent, text) {
+    var node = document.createElement(tag);
+    if (text !== undefined) node.textContent = text;
+    if (parent) parent.appendChild(node);
+    return node;
+  }
+
+  function fmt(v) {
+    if (v === null) return "-";
+    var a = Math.abs(v);
+    return a !== 0 && (a >= 1e5 || a < 1e-3) ? v.toExponential(2) : String(+v.toFixed(3));
+  }
+
+  function short(text, n) {
+    text = String(text);
+    return text.length > n ? text.slice(0, n - 1) + "\\u2026" : text;
+  }
+
+  // Canvas с учётом плотности пикселей экрана
+  function canvas(parent, width, height) {
+    var c = el("canvas", parent), ratio = window.devicePixelRatio || 1;
+    c.width = width * ratio;
+    c.height = height * ratio;
+    c.style.width = width + "px";
+    c.style.height = height + "px";
+    var ctx = c.getContext("2d");
+    ctx.scale(ratio, ratio);
+    ctx.font = FONT;
+    return {node: c, ctx: ctx};
+  }
+
+  // "Круглые" деления оси
+  function ticks(lo, hi, n) {
+    if (!(hi > lo)) return [lo];
+    var step = Math.pow(10, Math.floor(Math.log10((hi - lo) / n))), err = (hi - lo) / n / step;
+    step *= err >= 7.5 ? 10 : err >= 3.5 ? 5 : err >= 1.5 ? 2 : 1;
+    var out = [];
+    for (var t = Math.ceil(lo / step) * step; t <= hi + step * 1e-9; t += step) out.push(+t.toPrecision(12));
+    return out;
+  }
+
+  // Оси и сетка; возвращает функции перевода значений в пиксели
+  function axes(ctx, x0, x1, y0, y1, right, xLabel, yLabel, xTicks) {
+    var box = {l: 52, r: W - right, t: 10, b: H - 36};
+    if (!(x1 > x0)) { x0 -= 0.5; x1 += 0.5; }
+    if (!(y1 > y0)) { y0 -= 0.5; y1 += 0.5; }
+    var sx = function (v) { return box.l + (v - x0) / (x1 - x0) * (box.r - box.l); };
+    var sy = function (v) { return box.b - (v - y0) / (y1 - y0) * (box.b - box.t); };
+    ctx.strokeStyle = "#ddd";
+    ctx.fillStyle = "#444";
+    ctx.setLineDash([3, 3]);
+    ctx.textAlign = "right";
+    ctx.textBaseline = "middle";
+    ticks(y0, y1, 5).forEach(function (t) {
+      ctx.beginPath(); ctx.moveTo(box.l, sy(t)); ctx.lineTo(box.r, sy(t)); ctx.stroke();
+      ctx.fillText(fmt(t), box.l - 4, sy(t));
+    });
+    ctx.textAlign = "center";
+    ctx.textBaseline = "top";
+    if (xTicks !== false) {
+      ticks(x0, x1, 5).forEach(function (t) {
+        ctx.beginPath(); ctx.moveTo(sx(t), box.t); ctx.lineTo(sx(t), box.b); ctx.stroke();
+        ctx.fillText(fmt(t), sx(t), box.b + 4);
+      });
+    }
+    ctx.setLineDash([]);
+    ctx.strokeStyle = "#444";
+    ctx.strokeRect(box.l, box.t, box.r - box.l, box.b - box.t);
+    ctx.fillText(short(xLabel, 60), (box.l + box.r) / 2, H - 14);
+    ctx.save();
+    ctx.translate(10, (box.t + box.b) / 2);
+    ctx.rotate(-Math.PI / 2);
+    ctx.textBaseline = "middle";
+    ctx.fillText(short(yLabel, 40), 0, 0);
+    ctx.restore();
+    return {x: sx, y: sy, box: box};
+  }
+
+  function legend(ctx, title, labels, colors, x) {
+    var max = Math.floor((H - 40) / 15), y = 14;
+    ctx.textAlign = "left";
+    ctx.textBaseline = "middle";
+    ctx.fillStyle = "#222";
+    ctx.fillText(short(title, 16), x, y);
+    labels.slice(0, max).forEach(function (label, i) {
+      y += 15;
+      ctx.fillStyle = colors[i % colors.length];
+      ctx.fillRect(x, y - 5, 10, 10);
+      ctx.fillStyle = "#222";
+      ctx.fillText(short(label, 14), x + 14, y);
+    });
+    if (labels.length > max) ctx.fillText("\\u2026 ещё " + (labels.length - max), x, y + 15);
+  }
+
+  // Карточки рисуются, только когда попадают в область просмотра
+  var observer = "IntersectionObserver" in window ? new IntersectionObserver(function (entries) {
+    entries.forEach(function (entry) {
+      if (entry.isIntersecting) draw(entry.target.card);
+    });
+  }, {rootMargin: "300px"}) : null;
+
+  function draw(card) {
+    if (card.drawn) return;
+    card.drawn = true;
+    if (observer) observer.unobserve(card.node);
+    card.paint(canvas(card.node, W, H).ctx);
+  }
+
+  function grid(title, count) {
+    var box = el("div", document.getElementById("sections"));
+    el("h2", box, title + " (" + count + ")");
+    var g = el("div", box);
+    g.className = "grid";
+    return g;
+  }
+
+  function card(parent, caption, columns, paint) {
+    var node = el("figure", parent);
+    el("figcaption", node, caption);
+    var c = {node: node, paint: paint, drawn: false, keys: columns.join("\\n").toLowerCase()};
+    node.card = c;
+    node.style.width = W + "px";
+    node.style.minHeight = (H + 24) + "px";
+    cards.push(c);
+    if (observer) observer.observe(node); else draw(c);
+  }
+
+  // Шапка
+  var meta = "Файл: " + R.file + ", строк: " + R.rows + ". Создан: " + R.created;
+  document.getElementById("meta").textContent = R.note ? meta + ". Графики по выборке: " + R.note : meta;
+
+  // Матрица корреляции в цветах _CORRELATION_COLOR_MAP
+  if (R.correlation) {
+    var corr = R.correlation, n = corr.columns.length;
+    var cell = Math.max(3, Math.min(28, Math.floor(900 / n)));
+    var margin = cell >= 10 ? 120 : 0;
+    var box = el("div", document.getElementById("sections"));
+    el("h2", box, "Матрица корреляции (" + n + " \\u00d7 " + n + ")");
+    var cv = canvas(box, margin + n * cell + 1, margin + n * cell + 1), ctx = cv.ctx;
+    for (var i = 0; i < n; i++) {
+      for (var j = 0; j < n; j++) {
+        ctx.fillStyle = corr.palette[corr.colors[i][j]];
+        ctx.fillRect(margin + j * cell, margin + i * cell, cell, cell);
+      }
+    }
+    if (margin) {
+      ctx.fillStyle = "#222";
+      ctx.textBaseline = "middle";
+      ctx.textAlign = "right";
+      corr.columns.forEach(function (name, k) {
+        ctx.fillText(short(name, 18), margin - 4, margin + k * cell + cell / 2);
+        ctx.save();
+        ctx.translate(margin + k * cell + cell / 2, margin - 4);
+        ctx.rotate(-Math.PI / 2);
+        ctx.textAlign = "left";
+        ctx.fillText(short(name, 18), 0, 0);
+        ctx.restore();
+      });
+    }
+    cv.node.addEventListener("mousemove", function (event) {
+      var rect = cv.node.getBoundingClientRect();
+      var col = Math.floor((event.clientX - rect.left - margin) / cell);
+      var row = Math.floor((event.clientY - rect.top - margin) / cell);
+      if (row < 0 || col < 0 || row >= n || col >= n) { tip.style.display = "none"; return; }
+      tip.textContent = corr.columns[row] + " / " + corr.columns[col] + ": " + fmt(corr.values[row][col]);
+      tip.style.left = (event.clientX + 12) + "px";
+      tip.style.top = (event.clientY + 12) + "px";
+      tip.style.display = "block";
+    });
+    cv.node.addEventListener("mouseleave", function () { tip.style.display = "none"; });
+  }
+
+  // Scatter по прореженным точкам
+  if (R.scatter) {
+    var g = grid("Scatter plot", R.scatter.length);
+    R.scatter.forEach(function (pair) {
+      var xs = R.points.columns[pair[0]], ys = R.points.columns[pair[1]];
+      var caption = pair[0] + " vs " + pair[1] + " (cor=" + pair[2].toFixed(2) + ")";
+      if (R.points.size < R.points.rows) caption += ", точек " + R.points.size + " из " + R.points.rows;
+      card(g, caption, [pair[0], pair[1]], function (ctx) {
+        var x0 = Infinity, x1 = -Infinity, y0 = Infinity, y1 = -Infinity, k;
+        for (k = 0; k < xs.length; k++) {
+          if (xs[k] === null || ys[k] === null) continue;
+          x0 = Math.min(x0, xs[k]); x1 = Math.max(x1, xs[k]);
+          y0 = Math.min(y0, ys[k]); y1 = Math.max(y1, ys[k]);
+        }
+        if (x0 > x1) return;
+        var a = axes(ctx, x0, x1, y0, y1, 12, pair[0], pair[1]);
+        ctx.fillStyle = "rgba(0, 0, 255, 0.6)";
+        for (k = 0; k < xs.length; k++) {
+          if (xs[k] === null || ys[k] === null) continue;
+          ctx.beginPath();
+          ctx.arc(a.x(xs[k]), a.y(ys[k]), 2.5, 0, 2 * Math.PI);
+          ctx.fill();
+        }
+      });
+    });
+  }
+
+  // Круговые диаграммы
+  if (R.pie) {
+    var gp = grid("Круговые диаграммы", R.pie.length);
+    R.pie.forEach(function (pie) {
+      card(gp, "Распределение: " + pie.col, [pie.col], function (ctx) {
+        var total = pie.counts.reduce(function (s, v) { return s + v; }, 0);
+        if (!total) return;
+        var cx = 150, cy = H / 2, r = 130, angle = -Math.PI / 2, labels = [], colors = [];
+        pie.counts.forEach(function (v, k) {
+          if (!v) return;
+          var color = R.pie_colors[k % R.pie_colors.length], step = v / total * 2 * Math.PI;
+          ctx.fillStyle = color;
+          ctx.beginPath();
+          ctx.moveTo(cx, cy);
+          ctx.arc(cx, cy, r, angle, angle + step);
+          ctx.closePath();
+          ctx.fill();
+          angle += step;
+          labels.push(pie.labels[k] + " " + (v / total * 100).toFixed(1) + "%");
+          colors.push(color);
+        });
+        legend(ctx, pie.col, labels, colors, 300);
+      });
+    });
+  }
+
+  // Гистограммы по категориям: общие границы корзин, частоты посчитаны заранее
+  if (R.histograms) {
+    var gh = grid("Гистограммы", R.histograms.length);
+    R.histograms.forEach(function (hist) {
+      var edges = R.edges[hist.num_col], labels = R.categories[hist.group_col];
+      card(gh, "Распределение " + hist.num_col + " по " + hist.group_col, [hist.num_col, hist.group_col], function (ctx) {
+        var top = 0, shown = [], colors = [];
+        hist.counts.forEach(function (row) { row.forEach(function (v) { top = Math.max(top, v); }); });
+        var a = axes(ctx, edges[0], edges[edges.length - 1], 0, top * 1.05, 120, hist.num_col, "Частота");
+        ctx.globalAlpha = 0.7;
+        hist.counts.forEach(function (row, k) {
+          if (!row.some(function (v) { return v > 0; })) return;
+          var color = R.colors[k % R.colors.length];
+          ctx.fillStyle = color;
+          row.forEach(function (v, b) {
+            if (v) ctx.fillRect(a.x(edges[b]), a.y(v), a.x(edges[b + 1]) - a.x(edges[b]), a.y(0) - a.y(v));
+          });
+          shown.push(labels[k]);
+          colors.push(color);
+        });
+        ctx.globalAlpha = 1;
+        legend(ctx, hist.group_col, shown, colors, W - 112);
+      });
+    });
+  }
+
+  // Столбчатые диаграммы долей: таблица пары одна, второе направление - её транспонирование
+  if (R.bars) {
+    var charts = [];
+    R.bars.forEach(function (t) {
+      var transposed = t.columns.map(function (_, j) { return t.counts.map(function (row) { return row[j]; }); });
+      charts.push([t.rows, t.cols, t.index, t.columns, t.counts]);
+      charts.push([t.cols, t.rows, t.columns, t.index, transposed]);
+    });
+    var gb = grid("Столбчатые диаграммы", charts.length);
+    charts.forEach(function (c) {
+      var target = c[0], group = c[1], index = c[2], columns = c[3], table = c[4];
+      card(gb, "Распределение " + target + " по " + group, [target, group], function (ctx) {
+        var a = axes(ctx, 0, index.length, 0, 1, 120, "", "Доля", false);
+        var width = 0.8 / columns.length;
+        ctx.globalAlpha = 0.7;
+        table.forEach(function (row, i) {
+          var total = row.reduce(function (s, v) { return s + v; }, 0);
+          row.forEach(function (v, j) {
+            if (!total || !v) return;
+            ctx.fillStyle = R.colors[j % R.colors.length];
+            var x = a.x(i + 0.1 + j * width);
+            ctx.fillRect(x, a.y(v / total), a.x(i + 0.1 + (j + 1) * width) - x, a.y(0) - a.y(v / total));
+          });
+        });
+        ctx.globalAlpha = 1;
+        ctx.fillStyle = "#444";
+        var every = Math.ceil(index.length / 20);
+        index.forEach(function (label, i) {
+          if (i % every) return;
+          ctx.save();
+          ctx.translate(a.x(i + 0.5), a.box.b + 4);
+          ctx.rotate(-Math.PI / 4);
+          ctx.textAlign = "right";
+          ctx.textBaseline = "middle";
+          ctx.fillText(short(label, 10), 0, 0);
+          ctx.restore();
+        });
+        legend(ctx, group, columns, R.colors, W - 112);
+      });
+    });
+  }
+
+  // Фильтр карточек по именам столбцов
+  document.getElementById("filter").addEventListener("input", function (event) {
+    var query = event.target.value.trim().toLowerCase();
+    cards.forEach(function (c) {
+      c.node.style.display = !query || c.keys.indexOf(query) >= 0 ? "" : "none";
+    });
+  });
+})();
+</script>
+</body>
+</html>
+"""
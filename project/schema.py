@@ -0,0 +1,180 @@
+import json
+import os
+from typing import Any, Dict, Iterable, List, Optional
+
+import numpy as np
+import pandas as pd
+
+# Наличие всех ключей отображения проверяется через bincount, если значения столбца лежат в таком диапазоне
+_MAX_BINCOUNT_SPAN = 1 << 16
+
+
+class TableSchema:
+    """
+    Роли и типы столбцов таблицы: для каждого столбца исходный dtype, роль (numeric, categorical
+    или other - даты, bool) и имя порядкового отображения (ordinal), если столбец переводится
+    в упорядоченные категории. mappings - отображения по имени: {значение: подпись}.
+    Схема сохраняется в кэше загрузки (LoadCache.schema_path): при следующих загрузках типы передаются
+    читателю CSV заранее, а определение схемы пропускается
+    """
+
+    _VERSION = 1
+
+    def __init__(self, columns: Dict[str, dict], mappings: Dict[str, Dict[Any, str]]):
+        self.columns = columns
+        self.mappings = mappings
+
+    @classmethod
+    def infer(cls, data: pd.DataFrame, mappings: Dict[str, Dict[Any, str]],
+              explicit: Optional[Dict[str, str]] = None, known: Optional["TableSchema"] = None) -> "TableSchema":
+        """
+        Определяет схему за один проход: роли - по dtype, порядковые столбцы - по min/max всех
+        целочисленных столбцов сразу; значения просматриваются только у столбцов, чьи границы
+        совпали с ключами одного из отображений. explicit - столбцы с заданным пользователем
+        отображением (по имени), known - уже известная схема, её столбцы не определяются заново
+        """
+        explicit = explicit or {}
+        numeric = set(data.select_dtypes(include='number').columns)
+        categorical = set(data.select_dtypes(include=['object', 'category', 'string']).columns)
+
+        columns, unknown_ints = {}, []
+        for col in data.columns:
+            if known is not None and col in known.columns:
+                columns[col] = known.columns[col]
+                continue
+            role = "numeric" if col in numeric else "categorical" if col in categorical else "other"
+            columns[col] = {"dtype": str(data[col].dtype), "role": role, "ordinal": None}
+            if col in explicit:
+                # Значения вне ключей отображения стали бы пропусками - такой столбец остаётся как есть
+                if cls.values_within(data[col], mappings[explicit[col]]):
+                    columns[col].update(role="categorical", ordinal=explicit[col])
+            elif pd.api.types.is_integer_dtype(data[col]) and not isinstance(data[col].dtype, pd.CategoricalDtype):
+                unknown_ints.append(col)
+
+        # Автоматически распознаются только отображения с целыми ключами
+        candidates = {
+            name: sorted(mapping) for name, mapping in mappings.items()
+            if mapping and all(isinstance(key, (int, np.integer)) for key in mapping)
+        }
+        if unknown_ints and candidates:
+            bounds = data[unknown_ints].agg(['min', 'max'])
+            for col in unknown_ints:
+                low, high = bounds.at['min', col], bounds.at['max', col]
+                for name, keys in candidates.items():
+                    # Границы отсеивают почти все столбцы ещё до просмотра значений
+                    if low != keys[0] or high != keys[-1] or high - low > _MAX_BINCOUNT_SPAN:
+                        continue
+                    if cls._has_exactly(data[col], int(low), int(high), keys):
+                        columns[col].update(role="categorical", ordinal=name)
+                        break
+
+        return cls(columns, {name: dict(mapping) for name, mapping in mappings.items()})
+
+    @staticmethod
+    def _has_exactly(series: pd.Series, low: int, high: int, keys: List[int]) -> bool:
+        values = series.dropna().to_numpy(dtype=np.int64)
+        present = np.flatnonzero(np.bincount(values - low, minlength=high - low + 1)) + low
+        return present.tolist() == keys
+
+    @staticmethod
+    def values_within(series: pd.Series, mapping: Dict[Any, str]) -> bool:
+        if isinstance(series.dtype, pd.CategoricalDtype):
+            # Уже переведённый столбец (например, из кэша загрузки): категории - подписи отображения
+            return set(series.cat.categories) <= set(mapping) | set(mapping.values())
+        return bool(series.dropna().isin(list(mapping)).all())
+
+    def stale_columns(self, data: pd.DataFrame) -> List[str]:
+        """
+        Порядковые столбцы схемы, значения которых не укладываются в ключи отображения: схема
+        определена по другим данным. Их нужно определить заново, иначе лишние значения стали бы пропусками
+        """
+        return [col for col, info in self.columns.items()
+                if info["ordinal"] is not None and col in data.columns
+                and not self.values_within(data[col], self.mappings[info["ordinal"]])]
+
+    def without(self, columns: Iterable) -> "TableSchema":
+        dropped = set(columns)
+        return TableSchema({col: info for col, info in self.columns.items() if col not in dropped}, self.mappings)
+
+    def covers(self, columns: Iterable) -> bool:
+        return all(col in self.columns for col in columns)
+
+    def columns_with_role(self, role: str, columns: Iterable) -> List[str]:
+        return [col for col in columns if col in self.columns and self.columns[col]["role"] == role]
+
+    def read_dtypes(self) -> Dict[str, Any]:
+        """
+        dtype для pd.read_csv - как при определении схемы. Порядковые столбцы читаются исходным типом:
+        прежде чем apply переведёт их в категории, stale_columns проверяет значения
+        """
+        return {col: info["dtype"] for col, info in self.columns.items()
+                if info["dtype"] in ("int64", "float64", "object", "bool")}
+
+    def apply(self, data: pd.DataFrame) -> None:
+        """
+        Переводит порядковые столбцы в упорядоченные категории с подписями отображения
+        """
+        for col, info in self.columns.items():
+            if info["ordinal"] is None or col not in data.columns:
+                continue
+            mapping = self.mappings[info["ordinal"]]
+            series = data[col]
+            if isinstance(series.dtype, pd.CategoricalDtype) and list(series.cat.categories) == list(mapping):
+                data[col] = series.cat.rename_categories(list(mapping.values()))
+            elif not (isinstance(series.dtype, pd.CategoricalDtype)
+                      and list(series.cat.categories) == list(mapping.values())):
+                data[col] = pd.Categorical(series.map(mapping), categories=list(mapping.values()), ordered=True)
+
+    # Файл схемы: схемы листов (для CSV - одна, ключ "") и то, от чего они зависят
+
+    @classmethod
+    def _sidecar_header(cls, file_path: str, mappings: Dict[str, Dict[Any, str]],
+                        explicit: Dict[str, str]) -> dict:
+        stat = os.stat(file_path)
+        return {
+            "version": cls._VERSION,
+            "size": stat.st_size,
+            "mtime_ns": stat.st_mtime_ns,
+            # Ключи JSON - строки, поэтому отображения хранятся парами [значение, подпись]
+            "mappings": {name: [[key, label] for key, label in mapping.items()] for name, mapping in mappings.items()},
+            "explicit": explicit,
+        }
+
+    @classmethod
+    def load(cls, path: str, file_path: str, table: str, mappings: Dict[str, Dict[Any, str]],
+             explicit: Dict[str, str]) -> Optional["TableSchema"]:
+        """
+        Схема файла данных file_path из файла схемы path; None, если его нет, файл данных изменился
+        или отображения другие
+        """
+        try:
+            with open(path, encoding="utf-8") as f:
+                sidecar = json.load(f)
+            header = cls._sidecar_header(file_path, mappings, explicit)
+            if any(sidecar.get(key) != value for key, value in header.items()):
+                return None
+            return cls(sidecar["tables"][table], {name: dict(mapping) for name, mapping in mappings.items()})
+        except Exception:
+            return None
+
+    def save(self, path: str, file_path: str, table: str, explicit: Dict[str, str]) -> None:
+        try:
+            header = self._sidecar_header(file_path, self.mappings, explicit)
+            tables = {}
+            try:
+                with open(path, encoding="utf-8") as f:
+                    sidecar = json.load(f)
+                # Схемы других листов той же версии файла сохраняются
+                if all(sidecar.get(key) == value for key, value in header.items()):
+                    tables = sidecar["tables"]
+            except Exception:
+                pass
+            tables[table] = {str(col): info for col, info in self.columns.items()}
+
+            tmp_path = path + ".tmp"
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                json.dump(dict(header, tables=tables), f, ensure_ascii=False, indent=2)
+            os.replace(tmp_path, path)
+        except Exception:
+            # Схема - только ускорение следующих загрузок
+            pass
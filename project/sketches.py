@@ -0,0 +1,210 @@
+from typing import Any, Dict, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+
+
+class DistinctCountSketch:
+    """
+    Оценка числа уникальных значений (KMV, k minimum values) в ограниченной памяти.
+    Хранит k наименьших 64-битных хэшей; пока уникальных значений не больше k, счёт точный
+    """
+
+    def __init__(self, k: int = 4096):
+        self.k = k
+        self._mins = np.empty(0, dtype=np.uint64)
+        self._saturated = False  # встречалось больше k различных хэшей
+
+    def update(self, values: pd.Series) -> None:
+        if len(values) == 0:
+            return
+        hashes = pd.util.hash_pandas_object(values, index=False).to_numpy()
+        largest = hashes.max()
+
+        # Когда скетч заполнен, новые значения больше k-го минимума ничего не меняют
+        if len(self._mins) == self.k:
+            hashes = hashes[hashes < self._mins[-1]]
+
+        # k наименьших различных хэшей лежат среди m наименьших, если среди них есть хотя бы k различных
+        m = 8 * self.k
+        if len(hashes) > m:
+            smallest = np.unique(np.partition(hashes, m)[:m])
+            if len(smallest) >= self.k:
+                hashes = smallest
+
+        merged = np.unique(np.concatenate([self._mins, hashes]))  # np.unique возвращает отсортированные
+        self._mins = merged[:self.k]
+        # Хэш больше k-го минимума - значение, не попавшее в скетч
+        if len(merged) > self.k or largest > self._mins[-1]:
+            self._saturated = True
+
+    def estimate(self, limit: Optional[int] = None) -> int:
+        """
+        limit - верхняя граница (число непустых значений), оценка KMV может её превысить
+        """
+        if not self._saturated:
+            return len(self._mins)
+        kth = float(self._mins[-1]) / float(np.iinfo(np.uint64).max)
+        estimate = int(round((self.k - 1) / kth))
+        return min(estimate, limit) if limit is not None else estimate
+
+
+class ReservoirSample:
+    """
+    Равномерная выборка фиксированного размера из потока значений (priority sampling:
+    каждому значению присваивается случайный ключ, храним size значений с наименьшими ключами).
+    По выборке считаются приближённые квантили и мода
+    """
+
+    def __init__(self, size: int = 100_000, seed: Optional[int] = None):
+        self.size = size
+        self._rng = np.random.default_rng(seed)
+        self._keys = np.empty(0, dtype=np.float64)
+        self._values: Optional[np.ndarray] = None
+
+    def update(self, values: np.ndarray) -> None:
+        if len(values) == 0:
+            return
+        keys = self._rng.random(len(values))
+
+        # Выборка заполнена: новое значение попадает в неё, только если его ключ меньше наибольшего
+        if len(self._keys) == self.size:
+            selected = keys < self._keys.max()
+            keys, values = keys[selected], values[selected]
+
+        if self._values is None:
+            all_keys, all_values = keys, values
+        else:
+            all_keys = np.concatenate([self._keys, keys])
+            all_values = np.concatenate([self._values, values])
+
+        if len(all_keys) > self.size:
+            keep = np.argpartition(all_keys, self.size - 1)[:self.size]
+            all_keys, all_values = all_keys[keep], all_values[keep]
+
+        self._keys, self._values = all_keys, all_values
+
+    @property
+    def values(self) -> np.ndarray:
+        return self._values if self._values is not None else np.empty(0)
+
+    def quantile(self, q: float) -> float:
+        if len(self.values) == 0:
+            return float("nan")
+        return float(np.quantile(self.values, q))
+
+
+class ColumnSketch:
+    """
+    Сводка одного столбца по блокам в ограниченной памяти: число непустых, минимум, максимум и сумма
+    точно, число уникальных - DistinctCountSketch, медиана, мода и примеры - по ReservoirSample
+    """
+
+    def __init__(self, numeric: bool, sample_size: int = 100_000, seed: Optional[int] = None):
+        self.numeric = numeric
+        self.dtype: Optional[np.dtype] = None
+        self.non_null = 0
+        self.min = None
+        self.max = None
+        self.sum = 0.0
+        self.distinct = DistinctCountSketch()
+        self.sample = ReservoirSample(sample_size, seed)
+
+    def update(self, values: pd.Series) -> None:
+        # Целый столбец в блоке с пропусками читается как float, итоговый тип - общий для всех блоков
+        self.dtype = values.dtype if self.dtype is None else np.result_type(self.dtype, values.dtype)
+        values = values[values.notna()]
+        if values.empty:
+            return
+
+        self.non_null += len(values)
+        # Хэши целых и вещественных различаются, поэтому числа хэшируются как float
+        self.distinct.update(values.astype(np.float64) if self.numeric else values)
+        self.sample.update(values.to_numpy())
+
+        if self.numeric:
+            chunk_min, chunk_max = values.min(), values.max()
+            self.min = chunk_min if self.min is None else min(self.min, chunk_min)
+            self.max = chunk_max if self.max is None else max(self.max, chunk_max)
+            self.sum += float(values.sum())
+
+    def distinct_count(self) -> int:
+        return self.distinct.estimate(limit=self.non_null)
+
+
+class RowSample:
+    """
+    Равномерная выборка size строк из потока блоков таблицы (тот же priority sampling, что у ReservoirSample).
+    Со stratify своя выборка ведётся для каждого значения столбца, а итоговые size строк делятся между
+    значениями поровну, чтобы редкие категории не терялись (значению, у которого строк меньше доли,
+    достаются все его строки). Строки выборки идут в том же порядке, что и в файле
+    """
+
+    # Больше значений стратифицирующего столбца - это уже не категории, память выборки росла бы без предела
+    _MAX_STRATA = 1000
+
+    def __init__(self, size: int, stratify: Optional[str] = None, seed: Optional[int] = None):
+        self.size = size
+        self.stratify = stratify
+        self.rows_seen = 0
+        self._rng = np.random.default_rng(seed)
+        self._parts: Dict[Any, Tuple[np.ndarray, pd.DataFrame]] = {}
+
+    def update(self, chunk: pd.DataFrame) -> None:
+        if len(chunk) == 0:
+            return
+        self.rows_seen += len(chunk)
+        keys = self._rng.random(len(chunk))
+
+        if self.stratify is None:
+            self._update_part(None, keys, chunk)
+            return
+
+        if self.stratify not in chunk.columns:
+            raise ValueError(f"Нет столбца для стратификации: {self.stratify}")
+        groups = chunk.groupby(self.stratify, dropna=False, sort=False, observed=True).indices
+        for value, positions in groups.items():
+            # У каждого блока свой объект NaN, а ключ словаря должен совпадать
+            self._update_part(None if pd.isna(value) else value, keys[positions], chunk.iloc[positions])
+        if len(self._parts) > self._MAX_STRATA:
+            raise ValueError(f"У столбца {self.stratify} больше {self._MAX_STRATA} значений, "
+                             f"для стратификации нужен категориальный столбец")
+
+    def _update_part(self, name, keys: np.ndarray, rows: pd.DataFrame) -> None:
+        part = self._parts.get(name)
+        if part is not None:
+            part_keys, part_rows = part
+            # Выборка заполнена: строка попадает в неё, только если её ключ меньше наибольшего
+            if len(part_keys) == self.size:
+                selected = keys < part_keys.max()
+                keys, rows = keys[selected], rows[selected]
+            keys = np.concatenate([part_keys, keys])
+            rows = pd.concat([part_rows, rows])
+
+        if len(keys) > self.size:
+            keep = np.argpartition(keys, self.size - 1)[:self.size]
+            keys, rows = keys[keep], rows.iloc[keep]
+        self._parts[name] = (keys, rows)
+
+    def _quotas(self) -> Dict[Any, int]:
+        if self.stratify is None:
+            return {name: len(keys) for name, (keys, _) in self._parts.items()}
+
+        quotas, remaining = {}, self.size
+        by_size = sorted(self._parts.items(), key=lambda item: len(item[1][0]))
+        for i, (name, (keys, _)) in enumerate(by_size):
+            quotas[name] = min(len(keys), remaining // (len(by_size) - i))
+            remaining -= quotas[name]
+        return quotas
+
+    def result(self) -> pd.DataFrame:
+        frames = []
+        for name, quota in self._quotas().items():
+            keys, rows = self._parts[name]
+            if quota < len(keys):
+                rows = rows.iloc[np.argpartition(keys, quota - 1)[:quota]] if quota > 0 else rows.iloc[:0]
+            frames.append(rows)
+        if not frames:
+            return pd.DataFrame()
+        # Индексы блоков read_csv сквозные, сортировка по ним возвращает порядок файла
+        return pd.concat(frames).sort_index().reset_index(drop=True)
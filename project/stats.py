@@ -0,0 +1,217 @@
+import threading
+from typing import Any, Callable, Dict, Hashable, List, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+
+
+class StatsCache:
+    """
+    Кэш производных статистик набора данных (корреляция, value_counts, crosstab, коды категорий).
+    Каждое значение вычисляется один раз; кэш очищается, когда загружаются другие данные
+    """
+
+    def __init__(self):
+        self._values: dict = {}
+        self._lock = threading.RLock()
+        self.source_key: Optional[Hashable] = None
+
+    # Очищает кэш, если данные поменялись. Без ключа очищает всегда
+    def reset(self, source_key: Optional[Hashable] = None) -> None:
+        with self._lock:
+            if source_key is None or source_key != self.source_key:
+                self._values.clear()
+            self.source_key = source_key
+
+    def get(self, key: Hashable, compute: Callable[[], Any]) -> Any:
+        with self._lock:
+            if key not in self._values:
+                self._values[key] = compute()
+            return self._values[key]
+
+
+# Номер корзины для каждого значения по общим границам, как в np.histogram:
+# корзины [e_i, e_i+1), последняя включает правую границу. Пропуски и значения вне границ получают -1
+def bin_indices(values: np.ndarray, edges: np.ndarray) -> np.ndarray:
+    n_bins = len(edges) - 1
+    idx = np.searchsorted(edges, values, side='right') - 1
+    idx[values == edges[-1]] = n_bins - 1
+    idx[(idx < 0) | (idx >= n_bins) | np.isnan(values)] = -1
+    return idx
+
+
+def grouped_histogram(codes: np.ndarray, n_groups: int, bin_idx: np.ndarray, n_bins: int) -> np.ndarray:
+    """
+    Частоты всех категорий за один проход: матрица n_groups × n_bins из одного bincount
+    по комбинированному коду "категория * n_bins + корзина". Коды < 0 (пропуски) не считаются
+    """
+    keep = (codes >= 0) & (bin_idx >= 0)
+    combined = codes[keep].astype(np.int64) * n_bins + bin_idx[keep]
+    return np.bincount(combined, minlength=n_groups * n_bins).reshape(n_groups, n_bins)
+
+
+class CategoryIndex:
+    """
+    Целочисленные коды категориальных столбцов: каждый столбец хешируется один раз (pd.factorize),
+    дальше частоты и таблицы сопряжённости любых пар считаются bincount по кодам.
+    Результаты совпадают с Series.value_counts и pd.crosstab
+    """
+
+    # Таблица пары столбцов считается плотным bincount, пока в ней не больше стольких ячеек,
+    # иначе (много уникальных значений) - по встретившимся комбинациям
+    _DENSE_MAX_CELLS = 1 << 22
+
+    def __init__(self, data: pd.DataFrame, columns: List[Hashable]):
+        self.columns = list(columns)
+        self._codes: Dict[Hashable, np.ndarray] = {}
+        self._uniques: Dict[Hashable, pd.Index] = {}
+        self._counts: Dict[Hashable, np.ndarray] = {}
+        self._order: Dict[Hashable, np.ndarray] = {}
+        self._complete: Dict[Hashable, bool] = {}
+
+        for col in self.columns:
+            # Коды в порядке первого появления значений (-1 - пропуск)
+            codes, uniques = pd.factorize(data[col])
+            self._codes[col] = codes
+            self._uniques[col] = uniques
+            self._complete[col] = not (codes < 0).any()
+            self._counts[col] = np.bincount(codes if self._complete[col] else codes[codes >= 0],
+                                            minlength=len(uniques))
+            # Порядок строк и столбцов pd.crosstab: отсортированные значения (у категорий - порядок категорий)
+            self._order[col] = self._sort_order(uniques)
+
+    @staticmethod
+    def _sort_order(uniques: pd.Index) -> np.ndarray:
+        try:
+            return uniques.argsort()
+        except TypeError:
+            # Строки вперемешку с числами: как pd.crosstab, сначала числа, потом строки
+            values = np.asarray(uniques, dtype=object)
+            is_str = np.array([isinstance(value, str) for value in values], dtype=bool)
+            numbers, strings = np.flatnonzero(~is_str), np.flatnonzero(is_str)
+            return np.concatenate([numbers[np.argsort(values[numbers])], strings[np.argsort(values[strings])]])
+
+    def __contains__(self, col: Hashable) -> bool:
+        return col in self._codes
+
+    def codes(self, col: Hashable) -> Tuple[np.ndarray, List[Any]]:
+        return self._codes[col], list(self._uniques[col])
+
+    def value_counts(self, col: Hashable) -> pd.Series:
+        uniques, counts = self._uniques[col], self._counts[col]
+        if isinstance(uniques, pd.CategoricalIndex):
+            # Как у Series.value_counts категориального столбца: все категории, и неиспользуемые тоже
+            full = np.zeros(len(uniques.categories), dtype=np.int64)
+            full[uniques.codes] = counts
+            uniques, counts = pd.CategoricalIndex(uniques.categories, dtype=uniques.dtype), full
+        return pd.Series(counts.astype(np.int64), index=uniques.rename(col), name="count") \
+            .sort_values(ascending=False)
+
+    def crosstab(self, row_col: Hashable, col_col: Hashable) -> pd.DataFrame:
+        """
+        Таблица сопряжённости из одного bincount по комбинированному коду "строка * n_столбцов + столбец".
+        Как в pd.crosstab, строки с пропуском в любом из столбцов не считаются, а в таблице остаются
+        только встретившиеся значения
+        """
+        row_codes, col_codes = self._codes[row_col], self._codes[col_col]
+        n_rows, n_cols = len(self._uniques[row_col]), len(self._uniques[col_col])
+        if not (self._complete[row_col] and self._complete[col_col]):
+            keep = (row_codes >= 0) & (col_codes >= 0)
+            row_codes, col_codes = row_codes[keep], col_codes[keep]
+        combined = row_codes.astype(np.int64) * n_cols + col_codes
+
+        if n_rows * n_cols <= self._DENSE_MAX_CELLS:
+            table = np.bincount(combined, minlength=n_rows * n_cols).reshape(n_rows, n_cols)
+            table = table[np.ix_(self._order[row_col], self._order[col_col])]
+            used_rows, used_cols = table.any(axis=1), table.any(axis=0)
+            table = table[np.ix_(used_rows, used_cols)]
+            rows = self._order[row_col][used_rows]
+            cols = self._order[col_col][used_cols]
+        else:
+            keys, counts = np.unique(combined, return_counts=True)
+            # Ранг значения в отсортированном порядке
+            row_rank = np.empty(n_rows, dtype=np.int64)
+            row_rank[self._order[row_col]] = np.arange(n_rows)
+            col_rank = np.empty(n_cols, dtype=np.int64)
+            col_rank[self._order[col_col]] = np.arange(n_cols)
+            row_ranks, row_pos = np.unique(row_rank[keys // n_cols], return_inverse=True)
+            col_ranks, col_pos = np.unique(col_rank[keys % n_cols], return_inverse=True)
+            table = np.zeros((len(row_ranks), len(col_ranks)), dtype=np.int64)
+            table[row_pos, col_pos] = counts
+            rows = self._order[row_col][row_ranks]
+            cols = self._order[col_col][col_ranks]
+
+        return pd.DataFrame(table.astype(np.int64),
+                            index=self._uniques[row_col].take(rows).rename(row_col),
+                            columns=self._uniques[col_col].take(cols).rename(col_col))
+
+
+def find_correlated_pairs(values: np.ndarray, threshold: float, top_k: Optional[int] = None,
+                          block_size: int = 1024, margin: float = 1e-3) -> List[Tuple[int, int]]:
+    """
+    Пары столбцов (i < j) с |r| >= threshold - margin без построения полной матрицы корреляции:
+    столбцы стандартизуются в float32 и перемножаются блоками block_size × block_size
+    (матричное умножение numpy/BLAS многопоточное). При top_k остаются top_k пар с наибольшим |r|.
+    Значения r здесь приближённые, поэтому отбор с запасом margin, точные r считает вызывающий.
+    При пропусках используется попарная формула по маскам заполненных значений, как в DataFrame.corr
+    """
+    values = np.asarray(values, dtype=np.float64)
+    n_cols = values.shape[1]
+    valid = ~np.isnan(values)
+    has_nan = not valid.all()
+
+    # Центрирование в float64, дальше float32: вдвое меньше памяти и быстрее умножение
+    counts = valid.sum(axis=0)
+    means = np.divide(np.where(valid, values, 0.0).sum(axis=0), counts, out=np.zeros(n_cols), where=counts > 0)
+    centered = np.where(valid, values - means, 0.0)
+    norms = np.sqrt((centered * centered).sum(axis=0))
+    usable = norms > 0  # постоянные столбцы (корреляция не определена) не участвуют
+
+    if has_nan:
+        Z = centered.astype(np.float32)
+        Z2 = Z * Z
+        M = valid.astype(np.float32)
+    else:
+        Z = np.divide(centered, norms, out=np.zeros_like(centered), where=usable).astype(np.float32)
+    del centered
+
+    found_pairs: List[np.ndarray] = []
+    found_scores: List[np.ndarray] = []
+
+    for start_i in range(0, n_cols, block_size):
+        stop_i = min(start_i + block_size, n_cols)
+        for start_j in range(start_i, n_cols, block_size):
+            stop_j = min(start_j + block_size, n_cols)
+            Zi, Zj = Z[:, start_i:stop_i], Z[:, start_j:stop_j]
+
+            if has_nan:
+                Mi, Mj = M[:, start_i:stop_i], M[:, start_j:stop_j]
+                n = Mi.T @ Mj
+                sx, sy = Zi.T @ Mj, Mi.T @ Zj
+                sxx, syy = Z2[:, start_i:stop_i].T @ Mj, Mi.T @ Z2[:, start_j:stop_j]
+                with np.errstate(invalid='ignore', divide='ignore'):
+                    r = (n * (Zi.T @ Zj) - sx * sy) / np.sqrt((n * sxx - sx * sx) * (n * syy - sy * sy))
+                r = np.nan_to_num(r, nan=0.0)
+            else:
+                r = Zi.T @ Zj
+
+            score = np.abs(r)
+            rows, cols = np.nonzero(score >= threshold - margin)
+            rows, cols = rows + start_i, cols + start_j
+            keep = (rows < cols) & usable[rows] & usable[cols]
+            rows, cols = rows[keep], cols[keep]
+            block_scores = score[rows - start_i, cols - start_j]
+
+            found_pairs.append(np.column_stack([rows, cols]))
+            found_scores.append(block_scores)
+
+            # Для top_k храним не больше top_k лучших пар, память не растёт с числом блоков
+            if top_k is not None:
+                pairs, scores = np.concatenate(found_pairs), np.concatenate(found_scores)
+                if len(scores) > top_k:
+                    best = np.argpartition(-scores, top_k - 1)[:top_k]
+                    pairs, scores = pairs[best], scores[best]
+                found_pairs, found_scores = [pairs], [scores]
+
+    pairs = np.concatenate(found_pairs) if found_pairs else np.empty((0, 2), dtype=np.int64)
+    return sorted((int(i), int(j)) for i, j in pairs)
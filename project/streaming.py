@@ -0,0 +1,400 @@
+import hashlib
+import io
+import os
+from typing import Any, Callable, Dict, Iterator, List, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+
+from stats import bin_indices, grouped_histogram
+
+
+class _BoundedRaw(io.RawIOBase):
+    """
+    Отдаёт не больше limit байт открытого файла начиная с текущей позиции:
+    читаем только то, что было в файле на момент проверки размера
+    """
+
+    def __init__(self, f, limit: int):
+        self._f = f
+        self._left = limit
+
+    def readable(self) -> bool:
+        return True
+
+    def readinto(self, buffer) -> int:
+        size = min(len(buffer), self._left)
+        data = self._f.read(size)
+        buffer[:len(data)] = data
+        self._left -= len(data)
+        return len(data)
+
+
+class StreamingAggregates:
+    """
+    Точные агрегаты CSV-файла, собранные блоками без загрузки всей таблицы в память:
+    попарные суммы и ко-моменты числовых столбцов (для корреляции Пирсона, как DataFrame.corr),
+    value_counts и таблицы сопряжённости категориальных столбцов, минимумы/максимумы для гистограмм.
+
+    Агрегаты инкрементальные: запоминается, до какого байта файл прочитан, и при дописывании строк
+    в конец файла (update_from_csv) читаются только новые строки.
+    Целочисленные столбцы, которые convert_int_columns_to_categorical сделал бы категориальными,
+    отслеживаются как кандидаты; категориальными они считаются, пока все их значения - ровно ключи ordinal_mapping
+    """
+
+    # Сколько байт перед прочитанной границей хэшируется, чтобы заметить перезапись файла
+    _PREFIX_BYTES = 64 * 1024
+
+    def __init__(self, ordinal_mapping: Dict[Any, str], chunk_rows: int = 200_000):
+        self.ordinal_mapping = ordinal_mapping
+        self.chunk_rows = chunk_rows
+        self.n_rows = 0
+
+        # Прочитанная часть файла
+        self.file_offset = 0
+        self._ends_with_newline = True
+        self._prefix_hash: Optional[str] = None
+
+        self.columns: List[str] = []
+        self._base_numeric: List[str] = []
+        self._base_categorical: List[str] = []
+
+        # Кандидаты в порядковые категории: целочисленные столбцы, все значения которых пока из ordinal_mapping
+        self._ordinal_candidates: Dict[str, set] = {}
+
+        # Суммы по строкам, где заполнены оба столбца пары; данные сдвинуты на _shift для точности
+        self._moment_columns: List[str] = []
+        self._shift: Optional[np.ndarray] = None
+        self._n: Optional[np.ndarray] = None
+        self._sx: Optional[np.ndarray] = None
+        self._sxx: Optional[np.ndarray] = None
+        self._sxy: Optional[np.ndarray] = None
+        self._min: Optional[np.ndarray] = None
+        self._max: Optional[np.ndarray] = None
+
+        self._counts: Dict[str, pd.Series] = {}
+        self._categories: Dict[str, list] = {}
+        self._pairs: Dict[Tuple[str, str], pd.Series] = {}
+
+        # Посчитанные гистограммы по числу корзин: (роли столбцов, границы, частоты)
+        self._histograms: Dict[int, tuple] = {}
+
+    @classmethod
+    def from_csv(cls, file_path: str, ordinal_mapping: Dict[Any, str], chunk_rows: int = 200_000,
+                 is_canceled: Callable[[], bool] = lambda: False) -> "StreamingAggregates":
+        aggregates = cls(ordinal_mapping, chunk_rows)
+
+        # Роли столбцов определяются по первому блоку; категориальные дальше читаются как строки,
+        # чтобы блок, где встретились только цифры, не превратился в числа
+        head = pd.read_csv(file_path, nrows=chunk_rows)
+        aggregates.init_columns(head)
+        aggregates.update_from_csv(file_path, is_canceled)
+        return aggregates
+
+    def can_append_from(self, file_path: str) -> bool:
+        """
+        Файл только дописывался с момента последнего чтения: он не короче, байты перед прочитанной
+        границей не изменились, и последняя прочитанная строка была завершена
+        """
+        size = os.path.getsize(file_path)
+        if size < self.file_offset:
+            return False
+        if self._prefix_hash != self._hash_before(file_path, self.file_offset):
+            return False
+        if not self._ends_with_newline and size > self.file_offset:
+            with open(file_path, "rb") as f:
+                f.seek(self.file_offset)
+                return f.read(1) in (b"\n", b"\r")
+        return True
+
+    def update_from_csv(self, file_path: str, is_canceled: Callable[[], bool] = lambda: False) -> int:
+        """
+        Добавляет в агрегаты строки, дописанные в файл после file_offset. Возвращает число новых строк
+        """
+        size = os.path.getsize(file_path)
+        rows_before = self.n_rows
+
+        for chunk in self._read_range(file_path, self.file_offset, size):
+            if is_canceled():
+                raise KeyboardInterrupt("Отмена пользователем")
+            self.consume(chunk)
+
+        self._drop_stale_histograms()
+
+        with open(file_path, "rb") as f:
+            if size > 0:
+                f.seek(size - 1)
+                self._ends_with_newline = f.read(1) == b"\n"
+        self.file_offset = size
+        self._prefix_hash = self._hash_before(file_path, size)
+        return self.n_rows - rows_before
+
+    @classmethod
+    def _hash_before(cls, file_path: str, offset: int) -> str:
+        start = max(0, offset - cls._PREFIX_BYTES)
+        with open(file_path, "rb") as f:
+            f.seek(start)
+            return hashlib.blake2b(f.read(offset - start), digest_size=16).hexdigest()
+
+    def _read_range(self, file_path: str, start: int, stop: int, usecols: Optional[List[str]] = None):
+        if stop <= start:
+            return
+
+        ordinal = set(self._ordinal_candidates)
+        dtype = {col: object for col in self._base_categorical if col not in ordinal}
+        if usecols is not None:
+            dtype = {col: kind for col, kind in dtype.items() if col in usecols}
+
+        with open(file_path, "rb") as f:
+            f.seek(start)
+            source = io.BufferedReader(_BoundedRaw(f, stop - start))
+            # С начала файла читается заголовок, дописанные строки идут без него
+            header = {} if start == 0 else {"header": None, "names": self.columns}
+            try:
+                yield from pd.read_csv(source, chunksize=self.chunk_rows, dtype=dtype, usecols=usecols, **header)
+            except pd.errors.EmptyDataError:
+                return
+
+    def init_columns(self, head: pd.DataFrame) -> None:
+        self.columns = list(head.columns)
+        self._base_numeric = head.select_dtypes(include='number').columns.tolist()
+        self._base_categorical = head.select_dtypes(include=['object', 'category', 'string']).columns.tolist()
+
+        for col in self._base_numeric:
+            if pd.api.types.is_integer_dtype(head[col]):
+                self._ordinal_candidates[col] = set()
+
+        self._moment_columns = list(self._base_numeric)
+        p = len(self._moment_columns)
+        self._n, self._sx, self._sxx, self._sxy = (np.zeros((p, p)) for _ in range(4))
+        self._min = np.full(p, np.inf)
+        self._max = np.full(p, -np.inf)
+
+    # Роли столбцов, как их определили бы get_numeric_columns/get_categorical_columns для таблицы в памяти
+
+    def _is_ordinal(self, col: str) -> bool:
+        return self._ordinal_candidates.get(col) == set(self.ordinal_mapping)
+
+    @property
+    def numeric_columns(self) -> List[str]:
+        return [col for col in self._base_numeric if not self._is_ordinal(col)]
+
+    @property
+    def categorical_columns(self) -> List[str]:
+        return [col for col in self.columns if col in self._base_categorical or self._is_ordinal(col)]
+
+    @property
+    def ordinal_columns(self) -> List[str]:
+        return [col for col in self._base_numeric if self._is_ordinal(col)]
+
+    # Столбцы, для которых собираются категориальные агрегаты (включая ещё не подтверждённых кандидатов)
+    @property
+    def _tracked_categorical(self) -> List[str]:
+        return [col for col in self.columns if col in self._base_categorical or col in self._ordinal_candidates]
+
+    def consume(self, chunk: pd.DataFrame) -> None:
+        self.n_rows += len(chunk)
+        self._update_ordinal_candidates(chunk)
+        self._update_moments(chunk)
+        self._update_categorical(chunk)
+        self._update_histograms(chunk)
+
+    def _update_ordinal_candidates(self, chunk: pd.DataFrame) -> None:
+        allowed = set(self.ordinal_mapping)
+        for col in list(self._ordinal_candidates):
+            values = chunk[col]
+            # Как в convert_int_columns_to_categorical: столбец должен остаться целочисленным во всём файле
+            seen = self._ordinal_candidates[col] | set(pd.unique(values.dropna()))
+            if not pd.api.types.is_integer_dtype(values) or not seen <= allowed:
+                self._drop_ordinal_candidate(col)
+            else:
+                self._ordinal_candidates[col] = seen
+
+    def _drop_ordinal_candidate(self, col: str) -> None:
+        del self._ordinal_candidates[col]
+        self._counts.pop(col, None)
+        self._categories.pop(col, None)
+        for pair in [pair for pair in self._pairs if col in pair]:
+            del self._pairs[pair]
+
+    def _update_moments(self, chunk: pd.DataFrame) -> None:
+        if not self._moment_columns or chunk.empty:
+            return
+
+        X = self._numeric_block(chunk, self._moment_columns)
+        valid = ~np.isnan(X)
+
+        if self._shift is None:
+            counts = valid.sum(axis=0)
+            sums = np.where(valid, X, 0.0).sum(axis=0)
+            self._shift = np.divide(sums, counts, out=np.zeros_like(sums), where=counts > 0)
+
+        centered = np.where(valid, X - self._shift, 0.0)
+        mask = valid.astype(np.float64)
+
+        self._n += mask.T @ mask
+        self._sx += centered.T @ mask            # [i, j] - сумма x_i по строкам, где заполнены i и j
+        self._sxx += (centered * centered).T @ mask
+        self._sxy += centered.T @ centered
+
+        with np.errstate(invalid='ignore'):
+            self._min = np.fmin(self._min, np.where(valid, X, np.inf).min(axis=0))
+            self._max = np.fmax(self._max, np.where(valid, X, -np.inf).max(axis=0))
+
+    @staticmethod
+    def _numeric_block(chunk: pd.DataFrame, columns: List[str]) -> np.ndarray:
+        return np.column_stack([
+            pd.to_numeric(chunk[col], errors='coerce').to_numpy(dtype=np.float64, na_value=np.nan)
+            for col in columns
+        ])
+
+    def _update_categorical(self, chunk: pd.DataFrame) -> None:
+        tracked = self._tracked_categorical
+        for col in tracked:
+            values = chunk[col]
+            counts = values.value_counts()
+            self._counts[col] = counts if col not in self._counts else self._counts[col].add(counts, fill_value=0)
+
+            # Порядок первого появления - как у pd.factorize для таблицы в памяти
+            known = self._categories.setdefault(col, [])
+            known_set = set(known)
+            known.extend(val for val in pd.unique(values.dropna()) if val not in known_set)
+
+        for i, first in enumerate(tracked):
+            for second in tracked[i + 1:]:
+                sizes = chunk.groupby([first, second], observed=True).size()
+                pair = (first, second)
+                self._pairs[pair] = sizes if pair not in self._pairs else self._pairs[pair].add(sizes, fill_value=0)
+
+    # Категории столбца в исходном виде (для порядковых - числа) в порядке первого появления
+    def raw_categories(self, col: str) -> list:
+        return self._categories.get(col, [])
+
+    def category_labels(self, col: str) -> list:
+        if self._is_ordinal(col):
+            return [self.ordinal_mapping[val] for val in self.raw_categories(col)]
+        return self.raw_categories(col)
+
+    def correlation(self, columns: List[str]) -> pd.DataFrame:
+        idx = [self._moment_columns.index(col) for col in columns]
+        n = self._n[np.ix_(idx, idx)]
+        sx = self._sx[np.ix_(idx, idx)]
+        sxx = self._sxx[np.ix_(idx, idx)]
+        sxy = self._sxy[np.ix_(idx, idx)]
+        sy, syy = sx.T, sxx.T
+
+        with np.errstate(invalid='ignore', divide='ignore'):
+            cov = n * sxy - sx * sy
+            var_x = n * sxx - sx * sx
+            var_y = n * syy - sy * sy
+            corr = cov / np.sqrt(var_x * var_y)
+
+        corr[(n < 1) | (var_x <= 0) | (var_y <= 0)] = np.nan
+        corr = np.clip(corr, -1.0, 1.0)
+        diagonal = np.diag(var_x) > 0
+        corr[np.diag_indices_from(corr)] = np.where(diagonal, 1.0, np.nan)
+
+        return pd.DataFrame(corr, index=columns, columns=columns)
+
+    def value_counts(self, col: str) -> pd.Series:
+        counts = self._counts[col].astype(np.int64)
+        if self._is_ordinal(col):
+            counts = counts.rename(self.ordinal_mapping)
+        return counts.sort_values(ascending=False, kind='stable').rename(col)
+
+    def crosstab(self, target_col: str, group_col: str) -> pd.DataFrame:
+        if (target_col, group_col) not in self._pairs:
+            return self.crosstab(group_col, target_col).T
+
+        table = self._pairs[(target_col, group_col)].astype(np.int64).unstack(fill_value=0)
+        table = table.sort_index().sort_index(axis=1)
+        if self._is_ordinal(target_col):
+            table = table.rename(index=self.ordinal_mapping)
+        if self._is_ordinal(group_col):
+            table = table.rename(columns=self.ordinal_mapping)
+        table.index.name, table.columns.name = target_col, group_col
+        return table
+
+    def histogram_edges(self, col: str, bins: int) -> np.ndarray:
+        i = self._moment_columns.index(col)
+        if not np.isfinite(self._min[i]):
+            return np.histogram_bin_edges(np.empty(0), bins=bins)
+        # Границы np.histogram зависят только от диапазона значений
+        return np.histogram_bin_edges(np.array([self._min[i], self._max[i]]), bins=bins)
+
+    def _column_roles(self) -> tuple:
+        return tuple(self.numeric_columns), tuple(self.categorical_columns)
+
+    def has_histograms(self, bins: int) -> bool:
+        return bins in self._histograms and self._histograms[bins][0] == self._column_roles()
+
+    def histograms(self, file_path: str, bins: int,
+                   is_canceled: Callable[[], bool] = lambda: False) -> Dict[Tuple[str, str], np.ndarray]:
+        """
+        Частоты по категориям для всех пар (числовой, категориальный) столбец. Границы корзин известны
+        только после прохода по всему файлу, поэтому в первый раз это второй проход, читающий лишь нужные
+        столбцы. Дальше частоты дополняются дописанными строками, пока границы и роли столбцов не меняются
+        """
+        if self.has_histograms(bins):
+            return self._histograms[bins][2]
+        roles = self._column_roles()
+
+        numeric_cols, categorical_cols = self.numeric_columns, self.categorical_columns
+        edges = {col: self.histogram_edges(col, bins) for col in numeric_cols}
+        counts = {
+            (num_col, cat_col): np.zeros((len(self.raw_categories(cat_col)), bins), dtype=np.int64)
+            for num_col in numeric_cols for cat_col in categorical_cols
+        }
+
+        for chunk in self.read_columns(file_path, numeric_cols + categorical_cols, is_canceled):
+            self._add_histogram_counts(chunk, edges, counts, bins)
+
+        self._histograms[bins] = (roles, edges, counts)
+        return counts
+
+    def read_columns(self, file_path: str, columns: List[str],
+                     is_canceled: Callable[[], bool] = lambda: False) -> Iterator[pd.DataFrame]:
+        """
+        Блоки уже прочитанной части файла (до file_offset) только с нужными столбцами
+        """
+        for chunk in self._read_range(file_path, 0, self.file_offset, usecols=columns):
+            if is_canceled():
+                raise KeyboardInterrupt("Отмена пользователем")
+            yield chunk
+
+    def _add_histogram_counts(self, chunk: pd.DataFrame, edges: dict, counts: dict, bins: int) -> None:
+        categorical_cols = {cat_col for _, cat_col in counts}
+        codes = {
+            cat_col: pd.Categorical(chunk[cat_col], categories=self.raw_categories(cat_col)).codes
+            for cat_col in categorical_cols
+        }
+        for num_col, num_edges in edges.items():
+            values = pd.to_numeric(chunk[num_col], errors='coerce').to_numpy(dtype=np.float64, na_value=np.nan)
+            bin_idx = bin_indices(values, num_edges)
+            for cat_col in categorical_cols:
+                n_groups = len(self.raw_categories(cat_col))
+                pair = (num_col, cat_col)
+                # Новые категории из дописанных строк - новые строки матрицы частот
+                if counts[pair].shape[0] < n_groups:
+                    counts[pair] = np.vstack([counts[pair], np.zeros((n_groups - counts[pair].shape[0], bins),
+                                                                     dtype=np.int64)])
+                counts[pair] += grouped_histogram(codes[cat_col], n_groups, bin_idx, bins)
+
+    def _update_histograms(self, chunk: pd.DataFrame) -> None:
+        roles = self._column_roles()
+        for bins in list(self._histograms):
+            stored_roles, edges, counts = self._histograms[bins]
+            # Столбец перестал быть порядковой категорией - его частоты больше не ведутся
+            if stored_roles != roles:
+                del self._histograms[bins]
+                continue
+            self._add_histogram_counts(chunk, edges, counts, bins)
+
+    # Если дописанные строки расширили диапазон значений или поменяли роли столбцов, гистограммы считаются заново
+    def _drop_stale_histograms(self) -> None:
+        roles = self._column_roles()
+        for bins in list(self._histograms):
+            stored_roles, edges, _ = self._histograms[bins]
+            if stored_roles != roles or any(
+                    not np.array_equal(num_edges, self.histogram_edges(col, bins)) for col, num_edges in edges.items()):
+                del self._histograms[bins]
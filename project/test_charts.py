@@ -0,0 +1,31 @@
+import os
+
+import numpy as np
+
+from charts import ChartJob, ChartRenderer
+
+
+def _density_job(save_path: str, seed: int) -> ChartJob:
+    rng = np.random.default_rng(seed)
+    return ChartJob("density", save_path, {
+        "counts": rng.integers(0, 50, (20, 20)),
+        "x_edges": np.linspace(0, 1, 21),
+        "y_edges": np.linspace(0, 1, 21),
+        "x_col": f"x{seed}",
+        "y_col": "y",
+        "corr": 0.5,
+    })
+
+
+def test_reused_renderer_matches_fresh_for_density(tmp_path):
+    """
+    Шкала цвета графика плотности не должна сужать оси следующих графиков того же рендерера
+    """
+    reused = ChartRenderer()
+    for seed in range(5):
+        reused_path = os.path.join(tmp_path, f"reused_{seed}.png")
+        fresh_path = os.path.join(tmp_path, f"fresh_{seed}.png")
+        reused.render(_density_job(reused_path, seed))
+        ChartRenderer().render(_density_job(fresh_path, seed))
+        with open(reused_path, "rb") as reused_file, open(fresh_path, "rb") as fresh_file:
+            assert reused_file.read() == fresh_file.read(), seed
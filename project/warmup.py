@@ -0,0 +1,65 @@
+import threading
+import time
+from typing import Dict, Optional
+
+
+class Warmup:
+    """
+    Фоновая подготовка тяжёлых библиотек, пока пользователь выбирает файлы: импорт pandas/numpy/openpyxl
+    (через processor) и matplotlib (через charts), построение кэша шрифтов и первая отрисовка текста Agg.
+    Окно Tk при этом уже показано - в главном потоке импортируется только tkinter.
+    Замеры (секунды от started) собираются в timings: imports, matplotlib, ready, а также window
+    и first_chart, которые отмечает интерфейс
+    """
+
+    def __init__(self, started: Optional[float] = None):
+        self.started = time.perf_counter() if started is None else started
+        self.timings: Dict[str, float] = {}
+        self._ready = threading.Event()
+        self._processor = None
+        self._error: Optional[BaseException] = None
+        self._thread = threading.Thread(target=self._run, name="warmup", daemon=True)
+
+    def start(self) -> "Warmup":
+        self._thread.start()
+        return self
+
+    # Запоминается только первая отметка с таким именем
+    def mark(self, name: str) -> None:
+        self.timings.setdefault(name, round(time.perf_counter() - self.started, 3))
+
+    def _run(self) -> None:
+        try:
+            from processor import DataAnalyzer
+            self.mark("imports")
+
+            self._warm_matplotlib()
+            self.mark("matplotlib")
+
+            self._processor = DataAnalyzer()
+        except BaseException as e:
+            self._error = e
+        finally:
+            self.mark("ready")
+            self._ready.set()
+
+    @staticmethod
+    def _warm_matplotlib() -> None:
+        # Кэш шрифтов (findfont) и загруженные файлы шрифтов общие для всех потоков,
+        # поэтому первый настоящий график их уже не ждёт
+        from matplotlib.backends.backend_agg import FigureCanvasAgg
+        from matplotlib.figure import Figure
+
+        figure = Figure(figsize=(1, 1))
+        canvas = FigureCanvasAgg(figure)
+        figure.add_subplot().set_title("Прогрев")
+        canvas.draw()
+
+    def processor(self):
+        """
+        DataAnalyzer, созданный в фоне; ждёт окончания подготовки, если она ещё идёт
+        """
+        self._ready.wait()
+        if self._error is not None:
+            raise self._error
+        return self._processor